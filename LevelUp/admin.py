@@ -1,5 +1,7 @@
 # LevelUp/admin.py
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
@@ -9,8 +11,9 @@ from .models import (
     Actividad, AsignacionActividad, ReporteProgreso,
     ItemActividad, Submission, Answer,
     Asignatura, Curso, PerfilAlumno, Matricula,
-    AsignacionDocente
+    AsignacionDocente, Tarea
 )
+from .asignaciones import asignar_actividad
 
 Usuario = get_user_model()
 
@@ -64,6 +67,10 @@ class ItemActividadInline(admin.StackedInline):
     fields = ("orden", "tipo", "enunciado", "puntaje", "datos")
     ordering = ("orden",)
 
+class AsignarCursoForm(ActionForm):
+    # Selector junto al desplegable de acciones
+    curso = forms.ModelChoiceField(queryset=Curso.objects.all(), required=False, label="Curso")
+
 @admin.register(Actividad)
 class ActividadAdmin(admin.ModelAdmin):
     list_display  = ("titulo", "tipo", "dificultad", "docente", "xp_total", "es_publicada", "fecha_publicacion")
@@ -72,6 +79,18 @@ class ActividadAdmin(admin.ModelAdmin):
     date_hierarchy = "fecha_publicacion"
     inlines = [ItemActividadInline]
     readonly_fields = ("fecha_publicacion",)
+    action_form = AsignarCursoForm
+    actions = ["asignar_a_curso"]
+
+    @admin.action(description="Asignar las seleccionadas al curso elegido")
+    def asignar_a_curso(self, request, queryset):
+        curso_id = request.POST.get("curso", "")
+        curso = Curso.objects.filter(pk=curso_id).first() if curso_id.isdigit() else None
+        if curso is None:
+            self.message_user(request, "Elige un curso.", level=messages.WARNING)
+            return
+        creadas = sum(asignar_actividad(act, cursos_ids=[curso.pk])["creadas"] for act in queryset)
+        self.message_user(request, f"{creadas} asignación(es) nueva(s) en {curso}.")
 
 # ✅ Registrar ItemActividad con search_fields (requisito para AnswerAdmin.autocomplete_fields)
 @admin.register(ItemActividad)
@@ -103,6 +122,22 @@ class AnswerAdmin(admin.ModelAdmin):
     # ✅ Necesita que ItemActividadAdmin tenga search_fields
     autocomplete_fields = ("submission", "item")
 
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    list_display  = ("clave", "tipo", "estado", "intentos", "creada_en", "terminada_en")
+    list_filter   = ("estado", "tipo")
+    search_fields = ("clave",)
+    readonly_fields = ("tipo", "clave", "datos", "intentos", "error", "creada_en", "terminada_en")
+    actions = ["reintentar"]
+
+    @admin.action(description="Volver a encolar las seleccionadas")
+    def reintentar(self, request, queryset):
+        from django.utils import timezone
+        n = queryset.exclude(estado=Tarea.Estado.HECHA).update(
+            estado=Tarea.Estado.PENDIENTE, intentos=0, disponible_en=timezone.now(),
+        )
+        self.message_user(request, f"{n} tarea(s) reencolada(s).")
+
 # ---------- Catálogos y misceláneos ----------
 admin.site.register([Administrador, Docente, Ranking, Recurso, Recompensa, ReporteProgreso])
 
@@ -0,0 +1,340 @@
+"""
+Análisis clásico de ítems a partir de Answer.respuesta.
+
+Por actividad (y opcionalmente por curso) se toma el último intento
+finalizado de cada estudiante y se arma la matriz estudiantes × ítems con
+el puntaje de cada respuesta (correctas / total del minijuego, 0..1). Las
+respuestas se leen en UNA consulta recorrida con iterator(), sin
+instanciar modelos.
+
+Por ítem:
+- p_valor: puntaje medio (facilidad; 1 = todos aciertan).
+- discriminacion: correlación de Pearson entre el puntaje del ítem y el
+  del resto de la prueba (punto-biserial corregida). Vacía si el ítem o
+  el resto no varían.
+- distractores (trivia): veces que se eligió cada opción de cada pregunta,
+  desde meta.detail = [{"q": índice de la pregunta, "opcion": índice}, ...].
+
+Por actividad, el alfa de Cronbach (faltantes cuentan 0).
+
+Las operaciones de matriz usan NumPy si está instalado; si no, un cálculo
+equivalente en Python puro (mismo resultado, bastante más lento con
+muchos estudiantes).
+
+Los resultados quedan en AnalisisActividad / AnalisisItem.
+`analizar_pendientes()` recalcula solo lo desfasado: actividades con
+intentos finalizados después del último análisis
+(ResumenActividad.ultima_entrega, LevelUp/tableros.py) o con el
+contenido editado (version_contenido).
+"""
+import math
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Max
+
+from .diagnostico import obtener_logger
+from .models import (
+    Actividad, AnalisisActividad, AnalisisItem, Answer, AsignacionActividad, ResumenActividad, Submission,
+)
+from .resultados import detalle_respuesta
+
+try:
+    import numpy as np
+except ImportError:  # dependencia opcional
+    np = None
+
+log = obtener_logger(__name__)
+
+MOTORES = ("numpy", "python")
+
+
+# --------------------------------------------------------------------
+# Lectura de respuestas
+# --------------------------------------------------------------------
+
+def puntaje_respuesta(datos_item, respuesta, es_correcta) -> float:
+    """Puntaje 0..1 de una respuesta (mismo criterio que la pantalla de resultados)."""
+    d = detalle_respuesta(datos_item, respuesta, es_correcta)
+    if d["correctas"] is not None and d["total"]:
+        return min(1.0, max(0.0, d["correctas"] / d["total"]))
+    return 1.0 if d["correcto"] else 0.0
+
+
+def respuestas_finales(actividad_id, curso_id=None):
+    """
+    (estudiante_id, item_id, respuesta, es_correcta) del último intento
+    finalizado de cada estudiante de la actividad (o solo los matriculados
+    en `curso_id`).
+    """
+    qs = Answer.objects.filter(submission__actividad_id=actividad_id, submission__finalizado=True)
+    if curso_id is not None:
+        qs = qs.filter(submission__estudiante__usuario__matriculas__curso_id=curso_id)
+    filas = (
+        qs.order_by("submission__estudiante_id", "-submission__intento")
+        .values_list("submission__estudiante_id", "submission_id", "item_id", "respuesta", "es_correcta")
+    )
+
+    vigente = None  # (estudiante, submission) del último intento
+    for estudiante_id, submission_id, item_id, respuesta, es_correcta in filas.iterator(chunk_size=2000):
+        if vigente is None or vigente[0] != estudiante_id:
+            vigente = (estudiante_id, submission_id)
+        elif vigente[1] != submission_id:
+            continue  # intento anterior del mismo estudiante
+        yield estudiante_id, item_id, respuesta, es_correcta
+
+
+def _contar_elecciones(contador: Counter, respuesta) -> None:
+    meta = respuesta.get("meta") if isinstance(respuesta, dict) else None
+    detalle = meta.get("detail") if isinstance(meta, dict) else None
+    if not isinstance(detalle, list):
+        return
+    for e in detalle:
+        try:
+            contador[(int(e["q"]), int(e["opcion"]))] += 1
+        except (KeyError, TypeError, ValueError):
+            continue
+
+
+def _distractores(datos_item, contador: Counter) -> list:
+    """Opciones de cada pregunta de la trivia con las veces que se eligieron."""
+    if not contador:
+        return []
+    datos_item = datos_item or {}
+    preguntas = datos_item.get("questions") or datos_item.get("trivia") or []
+    salida = []
+    for i, p in enumerate(preguntas):
+        if not isinstance(p, dict):
+            continue
+        opciones = p.get("opts") or p.get("options") or []
+        veces = [contador.get((i, k), 0) for k in range(len(opciones))]
+        salida.append({
+            "pregunta": p.get("q") or p.get("question") or f"Pregunta {i + 1}",
+            "correcta": p.get("ans", p.get("answer", 0)),
+            "respuestas": sum(veces),
+            "opciones": [{"texto": str(o), "veces": v} for o, v in zip(opciones, veces)],
+        })
+    return salida
+
+
+# --------------------------------------------------------------------
+# Estadística
+# --------------------------------------------------------------------
+
+def _numero(v):
+    """float redondeado, o None si no es finito."""
+    if v is None:
+        return None
+    v = float(v)
+    return round(v, 4) if math.isfinite(v) else None
+
+
+def _alfa(suma_var_items, var_total, k):
+    if k < 2 or not var_total:
+        return None
+    return k / (k - 1) * (1 - suma_var_items / var_total)
+
+
+def _estadisticas_numpy(filas, columnas, puntajes, n_alumnos, n_items) -> dict:
+    X = np.full((n_alumnos, n_items), np.nan)
+    X[np.asarray(filas, dtype=np.intp), np.asarray(columnas, dtype=np.intp)] = np.asarray(puntajes, dtype=float)
+    M = ~np.isnan(X)
+    X0 = np.where(M, X, 0.0)
+
+    n = M.sum(axis=0)
+    total = X0.sum(axis=1)
+    resto = total[:, None] - X0
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = X0.sum(axis=0) / n
+        media_resto = np.where(M, resto, 0.0).sum(axis=0) / n
+        dx = np.where(M, X0 - media, 0.0)
+        dr = np.where(M, resto - media_resto, 0.0)
+        disc = (dx * dr).sum(axis=0) / np.sqrt((dx ** 2).sum(axis=0) * (dr ** 2).sum(axis=0))
+
+    return {
+        "n": n.tolist(),
+        "p": media.tolist(),
+        "d": disc.tolist(),
+        "alfa": _alfa(X0.var(axis=0).sum(), total.var(), n_items),
+    }
+
+
+def _estadisticas_python(filas, columnas, puntajes, n_alumnos, n_items) -> dict:
+    X = [[None] * n_items for _ in range(n_alumnos)]
+    for f, c, s in zip(filas, columnas, puntajes):
+        X[f][c] = s
+    total = [sum(v for v in fila if v is not None) for fila in X]
+
+    def varianza(valores):
+        m = sum(valores) / len(valores)
+        return sum((v - m) ** 2 for v in valores) / len(valores)
+
+    ns, medias, discs, suma_var = [], [], [], 0.0
+    for j in range(n_items):
+        pares = [(fila[j], total[i] - fila[j]) for i, fila in enumerate(X) if fila[j] is not None]
+        n = len(pares)
+        ns.append(n)
+        suma_var += varianza([fila[j] or 0.0 for fila in X])
+        if not n:
+            medias.append(None)
+            discs.append(None)
+            continue
+        mx = sum(x for x, _ in pares) / n
+        mr = sum(r for _, r in pares) / n
+        cov = sum((x - mx) * (r - mr) for x, r in pares)
+        vx = sum((x - mx) ** 2 for x, _ in pares)
+        vr = sum((r - mr) ** 2 for _, r in pares)
+        medias.append(mx)
+        discs.append(cov / math.sqrt(vx * vr) if vx > 0 and vr > 0 else None)
+
+    return {
+        "n": ns,
+        "p": medias,
+        "d": discs,
+        "alfa": _alfa(suma_var, varianza(total), n_items),
+    }
+
+
+def estadisticas_items(filas, columnas, puntajes, n_alumnos, n_items, motor=None) -> dict:
+    """
+    Estadística de la matriz dispersa (filas[i], columnas[i]) = puntajes[i].
+
+    Devuelve {"n", "p", "d": [por ítem], "alfa"} con None donde no se
+    puede calcular. `motor` fuerza "numpy" o "python".
+    """
+    motor = motor or ("numpy" if np is not None else "python")
+    if motor == "numpy" and np is None:
+        raise ImportError("El motor numpy requiere instalar NumPy")
+    if not n_alumnos or not n_items:
+        return {"n": [0] * n_items, "p": [None] * n_items, "d": [None] * n_items, "alfa": None}
+
+    calcular = _estadisticas_numpy if motor == "numpy" else _estadisticas_python
+    res = calcular(filas, columnas, puntajes, n_alumnos, n_items)
+    return {
+        "n": [int(v) for v in res["n"]],
+        "p": [_numero(v) for v in res["p"]],
+        "d": [_numero(v) for v in res["d"]],
+        "alfa": _numero(res["alfa"]),
+    }
+
+
+# --------------------------------------------------------------------
+# Análisis y guardado
+# --------------------------------------------------------------------
+
+def analizar_actividad(actividad, curso_id=None, motor=None) -> AnalisisActividad:
+    """Recalcula y guarda el análisis de `actividad` (todos o un curso)."""
+    items = list(actividad.items.filter(tipo="game").order_by("orden", "id").values_list("id", "datos"))
+    columna = {item_id: j for j, (item_id, _) in enumerate(items)}
+    datos = dict(items)
+    # Marca de agua antes de leer: lo que llegue después queda desfasado
+    marca = (
+        Submission.objects.filter(actividad=actividad, finalizado=True)
+        .aggregate(m=Max("enviado_en"))["m"]
+    )
+
+    alumnos = {}
+    filas, columnas, puntajes = [], [], []
+    elecciones = defaultdict(Counter)
+    for estudiante_id, item_id, respuesta, es_correcta in respuestas_finales(actividad.pk, curso_id):
+        j = columna.get(item_id)
+        if j is None:
+            continue
+        filas.append(alumnos.setdefault(estudiante_id, len(alumnos)))
+        columnas.append(j)
+        puntajes.append(puntaje_respuesta(datos[item_id], respuesta, es_correcta))
+        _contar_elecciones(elecciones[item_id], respuesta)
+
+    res = estadisticas_items(filas, columnas, puntajes, len(alumnos), len(items), motor=motor)
+
+    with transaction.atomic():
+        analisis, _ = AnalisisActividad.objects.update_or_create(
+            actividad=actividad,
+            curso_id=curso_id,
+            defaults={
+                "alumnos": len(alumnos),
+                "respuestas": len(puntajes),
+                "confiabilidad": res["alfa"],
+                "ultima_entrega": marca,
+                "version_contenido": actividad.version_contenido,
+            },
+        )
+        analisis.items.all().delete()
+        AnalisisItem.objects.bulk_create([
+            AnalisisItem(
+                analisis=analisis,
+                item_id=item_id,
+                respuestas=res["n"][j],
+                p_valor=res["p"][j],
+                discriminacion=res["d"][j],
+                distractores=_distractores(datos[item_id], elecciones.get(item_id)),
+            )
+            for j, (item_id, _) in enumerate(items)
+        ])
+
+    log.info(
+        "analitica.actividad", actividad=actividad.pk, curso=curso_id,
+        alumnos=len(alumnos), respuestas=len(puntajes),
+    )
+    return analisis
+
+
+def analizar_curso(curso_id, motor=None) -> list:
+    """Analiza, solo con los matriculados en el curso, cada actividad asignada a ellos."""
+    actividad_ids = (
+        AsignacionActividad.objects
+        .filter(estudiante__usuario__matriculas__curso_id=curso_id)
+        .order_by().values_list("actividad_id", flat=True).distinct()
+    )
+    return [
+        analizar_actividad(actividad, curso_id, motor=motor)
+        for actividad in Actividad.objects.filter(pk__in=actividad_ids).order_by("pk")
+    ]
+
+
+def esta_desfasado(analisis, actividad) -> bool:
+    """El análisis no incluye las últimas entregas o el contenido cambió."""
+    if analisis.version_contenido != actividad.version_contenido:
+        return True
+    resumen = ResumenActividad.objects.filter(pk=actividad.pk).only("ultima_entrega").first()
+    ultima = resumen.ultima_entrega if resumen else None
+    return bool(ultima and (analisis.ultima_entrega is None or ultima > analisis.ultima_entrega))
+
+
+def desfasados() -> list:
+    """
+    [(actividad_id, curso_id)] a recalcular: análisis con entregas más
+    nuevas o contenido editado, más las actividades con entregas y sin
+    análisis global.
+    """
+    entregas = {
+        act: (marca, version)
+        for act, marca, version in ResumenActividad.objects
+        .filter(ultima_entrega__isnull=False)
+        .values_list("actividad_id", "ultima_entrega", "actividad__version_contenido")
+    }
+    pendientes, con_global = [], set()
+    for act, curso, marca, version in AnalisisActividad.objects.values_list(
+        "actividad_id", "curso_id", "ultima_entrega", "version_contenido"
+    ):
+        if curso is None:
+            con_global.add(act)
+        actual = entregas.get(act)
+        if actual is None:
+            continue
+        if marca is None or actual[0] > marca or actual[1] != version:
+            pendientes.append((act, curso))
+    pendientes.extend((act, None) for act in entregas if act not in con_global)
+    return pendientes
+
+
+def analizar_pendientes(motor=None) -> list:
+    """Recalcula solo los análisis desfasados. Devuelve los AnalisisActividad."""
+    pendientes = desfasados()
+    actividades = Actividad.objects.in_bulk({act for act, _ in pendientes})
+    return [
+        analizar_actividad(actividades[act], curso, motor=motor)
+        for act, curso in pendientes
+        if act in actividades
+    ]
@@ -1,3 +1,5 @@
+from importlib import import_module
+
 from django.apps import AppConfig
 
 
@@ -6,4 +8,7 @@ class LevelUpConfig(AppConfig):
     name = 'LevelUp'
 
     def ready(self):
-        from . import signals  # noqa: F401
+        import_module(f"{self.name}.signals")
+        # Manejadores @tarea de la cola (LevelUp/tareas.py): registrados en
+        # cualquier proceso, también en el worker `procesar_tareas`
+        import_module(f"{self.name}.services")
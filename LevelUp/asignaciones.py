@@ -0,0 +1,88 @@
+"""
+Asignación masiva de actividades a cursos / estudiantes.
+
+La selección (cursos + alumnos sueltos) se resuelve en UNA consulta y el
+conjunto de AsignacionActividad se reconcilia con un bulk_create
+(ignore_conflicts) y un solo DELETE, sin importar cuántos estudiantes
+sean. Lo usan actividad_crear / actividad_editar, el comando
+`asignar_actividad` y una acción del admin de Actividad.
+"""
+from django.db import transaction
+from django.db.models import Q
+
+from .models import AsignacionActividad, Estudiante
+from .signals import sincronizar_intentos
+from .tableros import recalcular_actividades
+
+
+def _ids(valores) -> list:
+    """Enteros de una lista de strings/ints (p. ej. request.POST.getlist)."""
+    ids = []
+    for v in valores or ():
+        try:
+            ids.append(int(str(v).strip()))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+def resolver_estudiantes(cursos_ids=(), usuarios_ids=()) -> set:
+    """
+    PKs de Estudiante matriculados en `cursos_ids` o cuyo usuario está en
+    `usuarios_ids` (los checkboxes "alumnos" usan el id del usuario).
+    """
+    cursos_ids = _ids(cursos_ids)
+    usuarios_ids = _ids(usuarios_ids)
+    if not cursos_ids and not usuarios_ids:
+        return set()
+
+    filtro = Q()
+    if cursos_ids:
+        filtro |= Q(usuario__matriculas__curso_id__in=cursos_ids)
+    if usuarios_ids:
+        filtro |= Q(usuario_id__in=usuarios_ids)
+
+    return set(Estudiante.objects.filter(filtro).values_list("pk", flat=True).distinct())
+
+
+def sincronizar_asignaciones(actividad, estudiantes_pks, quitar=True) -> dict:
+    """
+    Deja asignada `actividad` a `estudiantes_pks`. Con `quitar`, borra las
+    asignaciones de quienes ya no están en el conjunto.
+
+    Devuelve {"creadas", "quitadas", "total"}.
+    """
+    estudiantes_pks = set(estudiantes_pks)
+
+    with transaction.atomic():
+        asig_qs = AsignacionActividad.objects.filter(actividad=actividad)
+        actuales = set(asig_qs.order_by().values_list("estudiante_id", flat=True))
+
+        quitadas = 0
+        if quitar and actuales - estudiantes_pks:
+            quitadas, _ = asig_qs.filter(estudiante_id__in=actuales - estudiantes_pks).delete()
+
+        nuevas = estudiantes_pks - actuales
+        if nuevas:
+            AsignacionActividad.objects.bulk_create(
+                [AsignacionActividad(actividad=actividad, estudiante_id=pk) for pk in nuevas],
+                ignore_conflicts=True,
+                batch_size=500,
+            )
+            # Reasignar a quien ya tenía intentos: el resumen parte de lo que hay
+            sincronizar_intentos(asig_qs.filter(estudiante_id__in=nuevas))
+
+        if quitadas or nuevas:
+            recalcular_actividades([actividad.pk])
+
+    total = len(estudiantes_pks) if quitar else len(actuales | estudiantes_pks)
+    return {"creadas": len(nuevas), "quitadas": quitadas, "total": total}
+
+
+def asignar_actividad(actividad, cursos_ids=(), usuarios_ids=(), quitar=False) -> dict:
+    """resolver_estudiantes + sincronizar_asignaciones."""
+    return sincronizar_asignaciones(
+        actividad,
+        resolver_estudiantes(cursos_ids, usuarios_ids),
+        quitar=quitar,
+    )
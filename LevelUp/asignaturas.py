@@ -0,0 +1,56 @@
+"""
+Registro en memoria de las asignaturas (cambian casi nunca).
+
+Se construye con UNA consulta la primera vez que se usa en el proceso y
+se invalida con las señales post_save / post_delete de Asignatura
+(LevelUp/signals.py), también en los demás procesos (LevelUp/registros.py).
+Resolver una asignatura por id, slug o slugify(nombre) pasa a ser una
+búsqueda en diccionario.
+
+Las instancias son compartidas entre peticiones: tratarlas como de solo
+lectura (para editar, volver a pedirla con Asignatura.objects.get).
+"""
+from django.utils.text import slugify
+
+from .models import Asignatura
+from .registros import RegistroEnMemoria
+
+
+class RegistroAsignaturas(RegistroEnMemoria):
+
+    clave_generacion = "levelup:registro:asignaturas"
+
+    def _construir(self):
+        todas = list(Asignatura.objects.all().order_by("nombre"))
+        por_slug = {}
+        # slugify(nombre) primero para que un slug explícito gane
+        for a in todas:
+            por_slug.setdefault(slugify(a.nombre), a)
+        for a in todas:
+            if a.slug:
+                por_slug[a.slug] = a
+        return {
+            "todas": todas,
+            "por_id": {a.pk: a for a in todas},
+            "por_slug": por_slug,
+        }
+
+    def todas(self) -> list:
+        """Todas, ordenadas por nombre (el mismo orden del navbar)."""
+        return self._cargar()["todas"]
+
+    def primera(self):
+        todas = self.todas()
+        return todas[0] if todas else None
+
+    def por_id(self, pk):
+        return self._cargar()["por_id"].get(pk)
+
+    def por_slug(self, slug):
+        """Por campo slug o, si no hay, por slugify(nombre)."""
+        if not slug:
+            return None
+        return self._cargar()["por_slug"].get(slug)
+
+
+registro_asignaturas = RegistroAsignaturas()
@@ -0,0 +1,496 @@
+"""
+Herramientas para los comandos benchmark_*.
+
+- bd_temporal(): base de datos de pruebas desechable (la misma que crea
+  `manage.py test`; en SQLite es en memoria), para no tocar la BD real.
+- sembrar_colegio(): colegio sintético con bulk_create (cursos, alumnos,
+  docentes, actividades con ítems de todos los minijuegos, asignaciones,
+  intentos con respuestas y recompensas). Los bulk_create no disparan
+  señales, así que los resúmenes mantenidos por señales se recalculan al
+  final en bloque.
+- medir(): latencias (p50 / p95 / máx) y consultas por llamada.
+- jugar_actividad(): el recorrido real de un estudiante por el Client
+  (lista, play, respuestas, cierre, resultados, ranking), con tiempo y
+  consultas por endpoint. La cola de tareas (LevelUp/tareas.py) se drena
+  al final y se mide aparte ("tarea_cola"), como la procesaría el worker.
+- escrituras_por_get(): INSERT / UPDATE / DELETE (y cuántas van a
+  django_session) de las páginas GET que un estudiante visita a diario.
+"""
+import random
+import re
+import statistics
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import slugify
+
+from gamificacion.logros import registro_reglas
+from gamificacion.models import PerfilGamificacion, Recompensa, RecompensaUsuario
+from gamificacion.ranking import reconstruir_ranking
+
+from .models import (
+    Actividad, Answer, AsignacionActividad, Asignatura, Curso, Docente, Estudiante, ItemActividad, Matricula,
+    Submission, Tarea, Usuario, NIVELES,
+)
+from .signals import sincronizar_intentos
+from .tableros import reconciliar
+from .tareas import esperar_hilos, procesar_una
+
+PASSWORD_BENCHMARK = "benchmark"
+
+ASIGNATURAS = ["Matemáticas", "Lenguaje", "Historia", "Ciencias"]
+LETRAS = "ABCDEFGH"
+
+# Un payload de ejemplo por minijuego (forms.GAME_KIND_CHOICES)
+DATOS_POR_KIND = {
+    "trivia": {"kind": "trivia", "questions": [{"q": "¿2 + 2?", "opts": ["3", "4", "5"], "ans": 1}]},
+    "vf": {"kind": "vf", "items": [{"text": "El sol es una estrella", "answer": True}]},
+    "dragmatch": {"kind": "dragmatch", "pairs": [["perro", "dog"], ["gato", "cat"]]},
+    "memory": {"kind": "memory", "pairs": [["2x3", "6"], ["4x2", "8"]]},
+    "classify": {"kind": "classify", "categories": ["Par", "Impar"], "items": [["2", "Par"], ["3", "Impar"]]},
+    "cloze": {"kind": "cloze", "text": "La capital de Chile es [[Santiago]]"},
+    "ordering": {"kind": "ordering", "steps": ["Leer", "Pensar", "Responder"]},
+}
+KINDS = list(DATOS_POR_KIND)
+
+
+# --------------------------------------------------------------------
+# BD temporal
+# --------------------------------------------------------------------
+
+@contextmanager
+def bd_temporal(verbosity=0):
+    """
+    Crea la BD de pruebas, la deja activa en `connection` y la destruye al
+    salir (aunque haya error). También prepara el entorno de pruebas
+    (ALLOWED_HOSTS, correo en memoria) para usar el Client de Django.
+    """
+    nombre_original = connection.settings_dict["NAME"]
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        esperar_hilos()  # la cola de tareas usa la BD temporal
+        connection.creation.destroy_test_db(nombre_original, verbosity=verbosity)
+        teardown_test_environment()
+
+
+def cliente_de(usuario) -> Client:
+    """Client de Django con la sesión de `usuario` ya iniciada."""
+    cliente = Client()
+    cliente.force_login(usuario)
+    return cliente
+
+
+# --------------------------------------------------------------------
+# Colegio sintético
+# --------------------------------------------------------------------
+
+def _rut(n: int) -> str:
+    s, m, x = 1, 0, n
+    while x:
+        s = (s + x % 10 * (9 - m % 6)) % 11
+        x //= 10
+        m += 1
+    return f"{n}-{'K' if s == 10 else s}"
+
+
+def _usuarios(prefijo, desde, cantidad, rol, password):
+    return Usuario.objects.bulk_create(
+        [
+            Usuario(
+                username=f"{prefijo}{n}",
+                email=f"{prefijo}{n}@bench.levelup",
+                first_name=prefijo.capitalize(),
+                last_name=str(n),
+                rut=_rut(desde + n),
+                rol=rol,
+                password=password,
+            )
+            for n in range(cantidad)
+        ],
+        batch_size=500,
+    )
+
+
+def sembrar_colegio(cursos=40, alumnos_por_curso=45, actividades=300, asignadas_por_curso=15,
+                    items_por_actividad=4, tasa_intentos=0.6, semilla=1) -> dict:
+    """
+    Llena la BD activa con un colegio sintético. Devuelve un resumen con
+    conteos y algunos ids de ejemplo para los benchmarks.
+    """
+    rnd = random.Random(semilla)
+    ahora = timezone.now()
+    password = make_password(PASSWORD_BENCHMARK)  # un solo hash para todos
+
+    Asignatura.objects.bulk_create([Asignatura(nombre=n) for n in ASIGNATURAS])
+    asignaturas = list(Asignatura.objects.filter(nombre__in=ASIGNATURAS))
+
+    # Docentes (uno por asignatura)
+    _usuarios("docente", 70000000, len(asignaturas), Usuario.Rol.DOCENTE, password)
+    docentes_u = list(Usuario.objects.filter(rol=Usuario.Rol.DOCENTE, username__startswith="docente").order_by("id"))
+    Docente.objects.bulk_create(
+        [Docente(usuario=u, asignatura=a.nombre) for u, a in zip(docentes_u, asignaturas)]
+    )
+    docentes = list(Docente.objects.filter(usuario__in=docentes_u).order_by("usuario_id"))
+
+    # Cursos
+    combos = [(nivel, letra) for nivel, _ in NIVELES for letra in LETRAS][:cursos]
+    Curso.objects.bulk_create([Curso(nivel=n, letra=l) for n, l in combos], ignore_conflicts=True)
+    cursos_db = list(Curso.objects.filter(nivel__in={n for n, _ in combos}).order_by("nivel", "letra"))[:cursos]
+
+    # Alumnos + perfiles + matrículas
+    total_alumnos = len(cursos_db) * alumnos_por_curso
+    _usuarios("alumno", 20000000, total_alumnos, Usuario.Rol.ESTUDIANTE, password)
+    alumnos_u = list(
+        Usuario.objects.filter(rol=Usuario.Rol.ESTUDIANTE, username__startswith="alumno").order_by("id")
+    )[:total_alumnos]
+    curso_de = {u.pk: cursos_db[i // alumnos_por_curso] for i, u in enumerate(alumnos_u)}
+    Estudiante.objects.bulk_create(
+        [Estudiante(usuario=u, curso=str(curso_de[u.pk])) for u in alumnos_u], batch_size=500,
+    )
+    PerfilGamificacion.objects.bulk_create(
+        [PerfilGamificacion(usuario=u, actividades_completadas=rnd.randint(0, 12)) for u in alumnos_u],
+        batch_size=500,
+    )
+    Matricula.objects.bulk_create(
+        [Matricula(estudiante=u, curso=curso_de[u.pk]) for u in alumnos_u], batch_size=500,
+    )
+
+    # Actividades con ítems de todos los minijuegos
+    Actividad.objects.bulk_create(
+        [
+            Actividad(
+                titulo=f"Actividad {n}",
+                descripcion="Actividad generada para benchmark",
+                tipo="quiz",  # quiz de minijuegos ("game" es misión y redirige al mapa)
+                docente=docentes[n % len(docentes)],
+                asignatura=asignaturas[n % len(asignaturas)],
+                es_publicada=rnd.random() < 0.85,
+                fecha_publicacion=ahora - timedelta(days=rnd.randint(0, 300)),
+                intentos_max=3,
+                version_contenido=uuid.uuid4().hex,
+            )
+            for n in range(actividades)
+        ],
+        batch_size=500,
+    )
+    acts = list(Actividad.objects.filter(titulo__startswith="Actividad ").order_by("id"))
+    ItemActividad.objects.bulk_create(
+        [
+            ItemActividad(
+                actividad=a, tipo="game", enunciado=f"Ítem {i}", puntaje=10, orden=i,
+                datos=DATOS_POR_KIND[KINDS[(a.pk + i) % len(KINDS)]],
+            )
+            for a in acts
+            for i in range(1, items_por_actividad + 1)
+        ],
+        batch_size=1000,
+    )
+    items_de = {}
+    for item_id, act_id in ItemActividad.objects.filter(actividad__in=acts).values_list("id", "actividad_id"):
+        items_de.setdefault(act_id, []).append(item_id)
+
+    # Asignaciones: cada curso recibe `asignadas_por_curso` actividades publicadas
+    publicadas = [a for a in acts if a.es_publicada]
+    alumnos_por = {}
+    for u in alumnos_u:
+        alumnos_por.setdefault(curso_de[u.pk].pk, []).append(u.pk)
+    asignaciones = []
+    for curso in cursos_db:
+        for act in rnd.sample(publicadas, min(asignadas_por_curso, len(publicadas))):
+            asignaciones.extend(
+                AsignacionActividad(estudiante_id=est_pk, actividad=act)
+                for est_pk in alumnos_por.get(curso.pk, [])
+            )
+    AsignacionActividad.objects.bulk_create(asignaciones, batch_size=1000, ignore_conflicts=True)
+
+    # Intentos: uno finalizado para una fracción de las asignaciones
+    subs = [
+        Submission(
+            actividad_id=a.actividad_id, estudiante_id=a.estudiante_id, intento=1,
+            enviado_en=ahora - timedelta(minutes=rnd.randint(0, 60 * 24 * 200)),
+            finalizado=True, calificacion=round(rnd.uniform(1.0, 7.0), 1),
+        )
+        for a in asignaciones
+        if rnd.random() < tasa_intentos
+    ]
+    Submission.objects.bulk_create(subs, batch_size=1000)
+    subs = Submission.objects.values_list("id", "actividad_id")
+    answers = []
+    for sub_id, act_id in subs.iterator(chunk_size=2000):
+        for item_id in items_de.get(act_id, []):
+            correctas = rnd.randint(0, 3)
+            answers.append(Answer(
+                submission_id=sub_id, item_id=item_id, es_correcta=correctas == 3, puntaje_obtenido=correctas * 3,
+                respuesta={"completado": True, "score": correctas / 3, "meta": {"correctas": correctas, "total": 3}},
+            ))
+            if len(answers) >= 5000:
+                Answer.objects.bulk_create(answers, batch_size=1000)
+                answers = []
+    Answer.objects.bulk_create(answers, batch_size=1000)
+
+    # Resúmenes que normalmente mantienen las señales
+    sincronizar_intentos(AsignacionActividad.objects.all())
+    AsignacionActividad.objects.filter(intentos_finalizados__gt=0).update(
+        estado=AsignacionActividad.Estado.COMPLETADA, fecha_completada=ahora.date(),
+    )
+    reconstruir_ranking()
+
+    # Recompensas y desbloqueos
+    Recompensa.objects.bulk_create(
+        [Recompensa(nombre=f"Recompensa {n}", slug=f"bench-{n}", xp_requerida=n * 100) for n in range(10)],
+        ignore_conflicts=True,
+    )
+    registro_reglas.invalidar()  # bulk_create no dispara recompensa_cambiada
+    recompensas = list(Recompensa.objects.filter(slug__startswith="bench-"))
+    perfiles = list(PerfilGamificacion.objects.filter(usuario__in=alumnos_u).values_list("id", flat=True))
+    RecompensaUsuario.objects.bulk_create(
+        [
+            RecompensaUsuario(perfil_id=p, recompensa=r, notificada=rnd.random() < 0.9)
+            for p in perfiles
+            for r in rnd.sample(recompensas, 3)
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+    reconciliar()  # resúmenes de los tableros (la siembra usa bulk_create)
+
+    # Estadísticas para el planificador (como en una BD en uso)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+    return {
+        "cursos": len(cursos_db),
+        "alumnos": len(alumnos_u),
+        "docentes": len(docentes),
+        "actividades": len(acts),
+        "asignaciones": len(asignaciones),
+        "intentos": Submission.objects.count(),
+        "respuestas": Answer.objects.count(),
+        "alumno_ejemplo": alumnos_u[len(alumnos_u) // 2].pk if alumnos_u else None,
+        "docente_ejemplo": docentes[0].pk if docentes else None,
+    }
+
+
+# --------------------------------------------------------------------
+# Medición
+# --------------------------------------------------------------------
+
+def percentil(ordenados, p: float) -> float:
+    """Percentil `p` (0-100, vecino más cercano) de una lista ya ordenada."""
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def medir(funcion, repeticiones=20) -> dict:
+    """
+    Ejecuta `funcion` `repeticiones` veces.
+    {"p50_ms", "p95_ms", "max_ms", "consultas"} (consultas de la última llamada).
+    """
+    tiempos = []
+    consultas = 0
+    for _ in range(max(1, repeticiones)):
+        with CaptureQueriesContext(connection) as ctx:
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        consultas = len(ctx)
+
+    tiempos.sort()
+    return {
+        "p50_ms": statistics.median(tiempos),
+        "p95_ms": percentil(tiempos, 95),
+        "max_ms": tiempos[-1],
+        "consultas": consultas,
+    }
+
+
+# --------------------------------------------------------------------
+# Ciclo de juego del estudiante
+# --------------------------------------------------------------------
+
+def payload_para(item, rnd) -> dict:
+    """Resultado de minijuego como lo manda el front (score al azar)."""
+    correctas = rnd.randint(0, 3)
+    return {
+        "completado": True,
+        "score": correctas / 3,
+        "kind": (item.datos or {}).get("kind", "trivia"),
+        "meta": {"correctas": correctas, "total": 3},
+    }
+
+
+class Recorrido:
+    """
+    Acumula, por endpoint, las latencias (ms), las consultas de cada
+    llamada y las respuestas con status inesperado.
+    """
+
+    def __init__(self):
+        self.tiempos = {}
+        self.consultas = {}
+        self.errores = []
+
+    def llamar(self, endpoint, funcion, esperado=200):
+        """Mide `funcion()`; con `esperado=None` no se revisa el status."""
+        with CaptureQueriesContext(connection) as ctx:
+            inicio = time.perf_counter()
+            respuesta = funcion()
+            ms = (time.perf_counter() - inicio) * 1000
+        self.tiempos.setdefault(endpoint, []).append(ms)
+        self.consultas.setdefault(endpoint, []).append(len(ctx))
+        if esperado is not None and respuesta.status_code != esperado:
+            self.errores.append((endpoint, respuesta.status_code))
+        return respuesta
+
+    def resumen(self) -> dict:
+        """
+        {endpoint: {"llamadas", "p50_ms", "p95_ms", "p99_ms", "max_ms",
+        "consultas_max"}} en el orden del recorrido.
+        """
+        res = {}
+        for endpoint, tiempos in self.tiempos.items():
+            ordenados = sorted(tiempos)
+            res[endpoint] = {
+                "llamadas": len(ordenados),
+                "p50_ms": statistics.median(ordenados),
+                "p95_ms": percentil(ordenados, 95),
+                "p99_ms": percentil(ordenados, 99),
+                "max_ms": ordenados[-1],
+                "consultas_max": max(self.consultas[endpoint]),
+            }
+        return res
+
+
+def jugar_actividad(recorrido, cliente, actividad, items, rnd) -> None:
+    """
+    Un intento completo por las vistas reales: mis actividades → play →
+    una respuesta por ítem → cierre (item 0) → resultados → ranking.
+    """
+    recorrido.llamar("estudiante_lista", lambda: cliente.get(reverse("estudiante_lista")))
+    recorrido.llamar("actividad_play", lambda: cliente.get(reverse("resolver_play", args=[actividad.pk])))
+    for item in items:
+        recorrido.llamar("api_item_answer", lambda: cliente.post(
+            reverse("api_item_answer", args=[actividad.pk, item.pk]),
+            data={"payload": payload_para(item, rnd)},
+            content_type="application/json",
+        ))
+    recorrido.llamar("finalizar", lambda: cliente.post(
+        reverse("api_item_answer", args=[actividad.pk, 0]),
+        data={"payload": {"completado": True, "finalizar": True}},
+        content_type="application/json",
+    ))
+    recorrido.llamar("actividad_resultados", lambda: cliente.get(reverse("resolver_resultado", args=[actividad.pk])))
+    recorrido.llamar("ranking", lambda: cliente.get(reverse("ranking")))
+
+
+def recorrer_colegio(jugadores=20, partidas_por_jugador=2, semilla=1) -> Recorrido:
+    """
+    Elige `jugadores` alumnos del colegio sembrado (de forma determinista
+    con `semilla`) y juega `partidas_por_jugador` actividades asignadas de
+    cada uno, prefiriendo las que aún tienen intentos disponibles.
+
+    Las tareas encoladas se procesan al final, una por una: así el tiempo
+    de las vistas no incluye el de la cola y se ve lo que cuesta cada tarea.
+    """
+    with override_settings(LEVELUP_TAREAS_MODO="worker"):
+        recorrido = _jugar_colegio(jugadores, partidas_por_jugador, semilla)
+
+    pendientes = Tarea.objects.filter(estado=Tarea.Estado.PENDIENTE).count()
+    for _ in range(pendientes):
+        recorrido.llamar("tarea_cola", procesar_una, esperado=None)
+    recorrido.errores.extend(
+        ("tarea_cola", f"{t.tipo} {t.estado}: {t.error}")
+        for t in Tarea.objects.exclude(estado=Tarea.Estado.HECHA)
+    )
+    return recorrido
+
+
+def _jugar_colegio(jugadores, partidas_por_jugador, semilla) -> Recorrido:
+    rnd = random.Random(semilla)
+    recorrido = Recorrido()
+
+    alumnos = list(
+        Usuario.objects.filter(rol=Usuario.Rol.ESTUDIANTE, estudiante__isnull=False).order_by("id")
+    )
+    for usuario in rnd.sample(alumnos, min(jugadores, len(alumnos))):
+        asignaciones = list(
+            AsignacionActividad.objects
+            .filter(estudiante_id=usuario.pk, actividad__es_publicada=True)
+            .select_related("actividad")
+            .order_by("intentos_finalizados", "actividad_id")[:partidas_por_jugador]
+        )
+        cliente = cliente_de(usuario)
+        for asignacion in asignaciones:
+            actividad = asignacion.actividad
+            items = list(ItemActividad.objects.filter(actividad=actividad).order_by("orden", "id"))
+            jugar_actividad(recorrido, cliente, actividad, items, rnd)
+    return recorrido
+
+
+# --------------------------------------------------------------------
+# Escrituras por petición GET
+# --------------------------------------------------------------------
+
+_ESCRITURA = re.compile(r"^\s*(INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+PAGINAS_ESTUDIANTE = ["dashboard", "estudiante_lista", "ranking", "recompensas", "perfil"]
+
+
+def contar_escrituras(ctx) -> tuple[int, int]:
+    """(escrituras, escrituras a django_session) capturadas en `ctx`."""
+    total = sesion = 0
+    for q in ctx.captured_queries:
+        if _ESCRITURA.match(q["sql"]):
+            total += 1
+            sesion += "django_session" in q["sql"]
+    return total, sesion
+
+
+def escrituras_por_get(usuario, rondas=3) -> dict:
+    """
+    Recorre PAGINAS_ESTUDIANTE `rondas` veces con la sesión de `usuario`,
+    vuelve a elegir la asignatura que ya estaba activa y abre "Mis
+    actividades" justo después de un mensaje flash (guardar el perfil).
+    {paso: {"llamadas", "escrituras", "sesion"}}, sumando todas las rondas.
+    """
+    cliente = cliente_de(usuario)
+    res = {}
+
+    def get(paso, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            respuesta = cliente.get(url, params)
+        total, sesion = contar_escrituras(ctx)
+        fila = res.setdefault(paso, {"llamadas": 0, "escrituras": 0, "sesion": 0})
+        fila["llamadas"] += 1
+        fila["escrituras"] += total
+        fila["sesion"] += sesion
+        return respuesta
+
+    asignatura = Asignatura.objects.order_by("nombre").first()
+    for _ in range(rondas):
+        for nombre in PAGINAS_ESTUDIANTE:
+            get(nombre, reverse(nombre))
+        if asignatura is not None:
+            slug = asignatura.slug or slugify(asignatura.nombre)
+            get("asignatura_misma", reverse("estudiante_set_asignatura"), slug=slug)
+
+        cliente.post(reverse("perfil_editar"), {
+            "first_name": usuario.first_name, "last_name": usuario.last_name, "email": usuario.email,
+        })
+        get("lista_con_mensaje", reverse("estudiante_lista"))
+    return res
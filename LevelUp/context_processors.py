@@ -1,83 +1,127 @@
-from django.urls import reverse
-from .models import Asignatura
-from .models import Estudiante
-from gamificacion.services import obtener_o_crear_perfil
-from .models import Usuario
-
-
-def user_home_url(request):
-    user = request.user
-    url = reverse('home')
-    if user.is_authenticated:
-        if getattr(user, 'is_superuser', False) or getattr(user, 'is_staff', False):
-            try: url = reverse('admin:index')
-            except: pass
-        elif getattr(user, 'es_docente', False) or getattr(user, 'is_docente', False) or str(getattr(user, 'rol', '')).lower() == 'docente':
-            url = reverse('dashboard')
-        elif getattr(user, 'es_estudiante', False) or getattr(user, 'is_estudiante', False) or str(getattr(user, 'rol', '')).lower() == 'estudiante':
-            url = reverse('dashboard')
-        elif str(getattr(user, 'rol', '')).lower() in ('administrador','admin'):
-            url = reverse('dashboard')
-    return {"user_home_url": url}
-
-def navbar_asignaturas(request):
-    if not request.user.is_authenticated:
-        return {}
-    # Ajusta el queryset a tu lógica (por curso/rol)
-    qs = Asignatura.objects.all().order_by('nombre')
-    # Puedes decidir la asignatura actual aquí si corresponde
-    actual = getattr(request, "asignatura_actual", None)
-    icono = getattr(request, "asignatura_icono", None)
-    return {
-        "asignaturas": qs,
-        "asignatura_actual": getattr(actual, "nombre", None),
-        "asignatura_icono": icono,
-    }
+"""
+Contexto global de las plantillas en un solo context processor.
 
-def estudiante_actual(request):
-    if not request.user.is_authenticated:
-        return {}
-    try:
-        est = Estudiante.objects.select_related("usuario").get(usuario=request.user)
-    except Estudiante.DoesNotExist:
-        return {}
-    return {"estudiante_actual": est}
+Cada valor es perezoso (SimpleLazyObject): solo se consulta la BD si la
+plantilla lo usa, y se memoiza en el request para que varios render()
+de la misma petición no repitan consultas. Las partes que no dependen
+del request se cachean entre peticiones:
+
+- user_home_url: por rol (solo reverse()).
+- asignaturas: registro en memoria del proceso (LevelUp/asignaturas.py).
+
+Nada de esto escribe en la sesión: la asignatura activa sale de una
+cookie firmada (LevelUp/preferencias.py) y los logros nuevos de
+RecompensaUsuario.notificada.
+"""
+from functools import lru_cache
+
+from django.urls import NoReverseMatch, reverse
+from django.utils.functional import SimpleLazyObject
 
 from gamificacion.models import RecompensaUsuario
+from gamificacion.services import obtener_o_crear_perfil
 
-def gamificacion_context(request):
+from .asignaturas import registro_asignaturas
+from .models import Estudiante, Usuario
+from .preferencias import asignatura_activa
 
-    if not request.user.is_authenticated:
-        return {}
 
-    try:
-        rol = getattr(request.user, "rol", None)
-    except Exception:
-        rol = None
+# --------------------------------------------------------------------
+# Cachés entre peticiones
+# --------------------------------------------------------------------
 
-    ctx = {}
+@lru_cache(maxsize=None)
+def _home_url_para(tipo: str) -> str:
+    if tipo == "staff":
+        try:
+            return reverse('admin:index')
+        except NoReverseMatch:
+            pass
+    elif tipo == "portal":
+        return reverse('dashboard')
+    return reverse('home')
 
-    if rol == Usuario.Rol.ESTUDIANTE:
-        # Estudiante "dueño" de los puntos/XP
-        est = Estudiante.objects.select_related("usuario").filter(usuario=request.user).first()
-        perfil = obtener_o_crear_perfil(request.user)
 
-        ctx["estudiante_actual"] = est
-        ctx["perfil"] = perfil
+def _tipo_de_usuario(user) -> str:
+    if not user.is_authenticated:
+        return "anonimo"
+    if getattr(user, 'is_superuser', False) or getattr(user, 'is_staff', False):
+        return "staff"
+    if getattr(user, 'es_docente', False) or getattr(user, 'is_docente', False):
+        return "portal"
+    if getattr(user, 'es_estudiante', False) or getattr(user, 'is_estudiante', False):
+        return "portal"
+    if str(getattr(user, 'rol', '')).lower() in ('docente', 'estudiante', 'administrador', 'admin'):
+        return "portal"
+    return "anonimo"
 
-        # 🔔 Leer de la sesión los IDs de recompensas nuevas
-        nuevas_ids = request.session.get("nuevas_recompensas_ids") or []
-        if nuevas_ids:
-            nuevas_recompensas = list(
-                RecompensaUsuario.objects
-                .filter(perfil=perfil, recompensa_id__in=nuevas_ids)
-                .select_related("recompensa")
-            )
-            ctx["nuevas_recompensas"] = nuevas_recompensas
 
-            # Limpiar para que no se repita el popup
-            request.session["nuevas_recompensas_ids"] = []
-            request.session.modified = True
+# --------------------------------------------------------------------
+# Valores por petición
+# --------------------------------------------------------------------
 
-    return ctx
+def _memo(request, clave, calcular):
+    """
+    SimpleLazyObject que calcula `calcular()` una sola vez por request.
+    """
+    cache = request.__dict__.setdefault("_levelup_contexto", {})
+
+    def _obtener():
+        if clave not in cache:
+            cache[clave] = calcular()
+        return cache[clave]
+
+    return SimpleLazyObject(_obtener)
+
+
+def _es_estudiante(request) -> bool:
+    return getattr(request.user, "rol", None) == Usuario.Rol.ESTUDIANTE
 
+
+def _estudiante(request):
+    return Estudiante.objects.select_related("usuario").filter(usuario=request.user).first()
+
+
+def _nuevas_recompensas(request):
+    # Popup de base.html: desbloqueos hechos por la cola de tareas
+    # (notificada=False). Solo se escribe cuando hay algo que mostrar.
+    nuevas = list(
+        RecompensaUsuario.objects
+        .filter(perfil__usuario=request.user, notificada=False)
+        .select_related("recompensa")
+        .order_by("id")
+    )
+
+    # Marcar para que no se repita el popup
+    if nuevas:
+        RecompensaUsuario.objects.filter(pk__in=[ru.pk for ru in nuevas]).update(notificada=True)
+    return nuevas
+
+
+def levelup_context(request):
+    """
+    Reemplaza a user_home_url, navbar_asignaturas, estudiante_actual,
+    gamificacion_context y gamificacion.recompensas_nuevas.
+
+    Los logros por notificar salen de una sola fuente (nuevas_recompensas):
+    leerlos los marca como notificados, así que una segunda clave con su
+    propia consulta dejaría vacía a la que la plantilla evalúe después.
+    """
+    ctx = {
+        "user_home_url": _memo(request, "user_home_url", lambda: _home_url_para(_tipo_de_usuario(request.user))),
+    }
+
+    if not request.user.is_authenticated:
+        return ctx
+
+    ctx.update({
+        "asignaturas": _memo(request, "asignaturas", registro_asignaturas.todas),
+        "asignatura_activa": _memo(request, "asignatura_activa", lambda: asignatura_activa(request)),
+        "estudiante_actual": _memo(request, "estudiante_actual", lambda: _estudiante(request)),
+    })
+
+    if _es_estudiante(request):
+        ctx["perfil"] = _memo(request, "perfil", lambda: obtener_o_crear_perfil(request.user))
+        ctx["nuevas_recompensas"] = _memo(request, "nuevas_recompensas", lambda: _nuevas_recompensas(request))
+
+    return ctx
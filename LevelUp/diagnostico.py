@@ -0,0 +1,201 @@
+"""
+Diagnóstico estructurado del app LevelUp (reemplaza los print() de depuración).
+
+- Un logger por módulo:  log = obtener_logger(__name__)
+- Eventos con nombre + campos:  log.debug("play.item", item=item.pk, kind=kind)
+  Con FormatoJSON cada evento sale como UNA línea JSON.
+- Costo ~cero desactivado: se consulta isEnabledFor() antes de armar nada
+  y los campos caros pueden pasarse como callables (se evalúan solo si el
+  evento se emite):  log.debug("mapa.capas", capas=lambda: [...])
+- Muestreo por logger (debug/info; warning y error nunca se muestrean):
+      LEVELUP_LOG_MUESTREO = {"LevelUp.views": 0.1, "LevelUp.forms": 1.0}
+  Gana el prefijo más específico; por defecto 1.0.
+- Contexto por petición (id + tiempo transcurrido) con
+  ContextoPeticionMiddleware; FormatoJSON lo agrega a cada evento.
+"""
+import contextvars
+import json
+import logging
+import random
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+_peticion = contextvars.ContextVar("levelup_peticion", default=None)
+
+
+# --------------------------------------------------------------------
+# Muestreo
+# --------------------------------------------------------------------
+
+def tasa_muestreo(nombre_logger: str) -> float:
+    """
+    Tasa (0..1) configurada para `nombre_logger` o su prefijo más cercano.
+    """
+    tasas = getattr(settings, "LEVELUP_LOG_MUESTREO", None) or {}
+    nombre = nombre_logger
+    while nombre:
+        if nombre in tasas:
+            return float(tasas[nombre])
+        nombre = nombre.rpartition(".")[0]
+    return 1.0
+
+
+# --------------------------------------------------------------------
+# Logger de eventos
+# --------------------------------------------------------------------
+
+class _Campos:
+    """
+    Formatea los campos como `k=v ...` solo si un handler lo pide.
+    """
+    __slots__ = ("campos",)
+
+    def __init__(self, campos):
+        self.campos = campos
+
+    def __str__(self):
+        return " ".join(f"{k}={v!r}" for k, v in self.campos.items())
+
+
+class EventLogger:
+    """
+    Envoltorio liviano sobre logging.Logger que emite eventos con campos.
+    """
+    __slots__ = ("logger",)
+
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+
+    def activo(self, nivel=logging.DEBUG) -> bool:
+        return self.logger.isEnabledFor(nivel)
+
+    def _emitir(self, nivel, evento, campos, muestrear=True, exc_info=None):
+        if not self.logger.isEnabledFor(nivel):
+            return
+        if muestrear:
+            tasa = tasa_muestreo(self.logger.name)
+            if tasa < 1.0 and random.random() >= tasa:
+                return
+        campos = {k: (v() if callable(v) else v) for k, v in campos.items()}
+        self.logger.log(
+            nivel, "%s %s", evento, _Campos(campos),
+            extra={"evento": evento, "campos": campos},
+            exc_info=exc_info,
+            stacklevel=3,
+        )
+
+    def debug(self, evento, **campos):
+        self._emitir(logging.DEBUG, evento, campos)
+
+    def info(self, evento, **campos):
+        self._emitir(logging.INFO, evento, campos)
+
+    def warning(self, evento, **campos):
+        self._emitir(logging.WARNING, evento, campos, muestrear=False)
+
+    def error(self, evento, **campos):
+        self._emitir(logging.ERROR, evento, campos, muestrear=False)
+
+    def exception(self, evento, **campos):
+        self._emitir(logging.ERROR, evento, campos, muestrear=False, exc_info=True)
+
+    @contextmanager
+    def medir(self, evento, nivel=logging.DEBUG, **campos):
+        """
+        Mide el bloque y emite `evento` con duracion_ms. El dict entregado
+        permite agregar campos desde dentro del bloque.
+        """
+        if not self.logger.isEnabledFor(nivel):
+            yield campos
+            return
+        inicio = time.perf_counter()
+        try:
+            yield campos
+        finally:
+            campos["duracion_ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+            self._emitir(nivel, evento, campos)
+
+
+def obtener_logger(nombre: str) -> EventLogger:
+    return EventLogger(logging.getLogger(nombre))
+
+
+# --------------------------------------------------------------------
+# Contexto por petición
+# --------------------------------------------------------------------
+
+def contexto_peticion():
+    """
+    {"id", "metodo", "ruta", "inicio"} de la petición en curso, o None.
+    """
+    return _peticion.get()
+
+
+class ContextoPeticionMiddleware:
+    """
+    Asigna un id a cada petición (o respeta X-Request-ID) para correlacionar
+    sus eventos y emite `peticion` con estado y duración al terminar.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.log = obtener_logger("LevelUp.peticiones")
+
+    def __call__(self, request):
+        ctx = {
+            "id": request.META.get("HTTP_X_REQUEST_ID") or uuid.uuid4().hex[:12],
+            "metodo": request.method,
+            "ruta": request.path,
+            "inicio": time.perf_counter(),
+        }
+        token = _peticion.set(ctx)
+        try:
+            response = self.get_response(request)
+            self.log.info(
+                "peticion",
+                metodo=ctx["metodo"],
+                ruta=ctx["ruta"],
+                estado=response.status_code,
+                duracion_ms=round((time.perf_counter() - ctx["inicio"]) * 1000, 2),
+            )
+            response["X-Request-ID"] = ctx["id"]
+            return response
+        finally:
+            _peticion.reset(token)
+
+
+# --------------------------------------------------------------------
+# Formato
+# --------------------------------------------------------------------
+
+class FormatoJSON(logging.Formatter):
+    """
+    Una línea JSON por evento: ts, nivel, logger, evento, campos y, si hay
+    petición en curso, su id y los ms transcurridos.
+    """
+
+    def format(self, record):
+        data = {
+            "ts": round(record.created, 3),
+            "nivel": record.levelname,
+            "logger": record.name,
+        }
+        evento = getattr(record, "evento", None)
+        if evento:
+            data["evento"] = evento
+            data.update(getattr(record, "campos", None) or {})
+        else:
+            data["msg"] = record.getMessage()
+
+        ctx = _peticion.get()
+        if ctx:
+            data["peticion"] = ctx["id"]
+            data["t_ms"] = round((time.perf_counter() - ctx["inicio"]) * 1000, 2)
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+
+        return json.dumps(data, ensure_ascii=False, default=str)
@@ -0,0 +1,140 @@
+"""
+Guardado en bloque de los ítems del editor de actividades.
+
+El builder manda TODOS los ítems en el POST (prefijo "items"). En vez de un
+get/save/create por ítem, se cargan los existentes una vez, se compara en
+memoria y se aplican:
+
+  - un bulk_create con los nuevos,
+  - un bulk_update con los existentes (contenido + `orden` según la
+    posición en el formulario, en la misma sentencia),
+  - un DELETE con los marcados para borrar,
+
+todo en una transacción. bulk_* no dispara señales: al final se renueva
+la version_contenido de la actividad una sola vez.
+"""
+import json
+
+from django.db import transaction
+
+from .diagnostico import obtener_logger
+from .models import ItemActividad
+from .signals import renovar_version_contenido
+
+log = obtener_logger(__name__)
+
+VALORES_SI = ("1", "true", "True", "on")
+
+
+def _entero(valor, defecto=None):
+    try:
+        return int(valor) if valor not in (None, "", "None", "none") else defecto
+    except (TypeError, ValueError):
+        return defecto
+
+
+def leer_items_post(data, prefix="items") -> list:
+    """
+    Filas del formset tal como llegan en request.POST:
+    [{"form", "id", "eliminar", "enunciado", "puntaje", "datos"}, ...]
+
+    Se omiten las filas sin contenido (salvo las marcadas para borrar que
+    traen id).
+    """
+    filas = []
+    for i in range(_entero(data.get(f"{prefix}-TOTAL_FORMS"), 0)):
+        item_id = _entero(data.get(f"{prefix}-{i}-id", "").strip())
+        eliminar = data.get(f"{prefix}-{i}-DELETE", "") in VALORES_SI
+        enun = data.get(f"{prefix}-{i}-enunciado", "").strip()
+        punt = _entero(data.get(f"{prefix}-{i}-puntaje", "").strip(), 0)
+        payload = data.get(f"{prefix}-{i}-game_pairs", "").strip()
+        item_kind = data.get(f"{prefix}-{i}-item_kind", "trivia").strip()
+        time_limit = _entero(data.get(f"{prefix}-{i}-game_time_limit", ""))
+
+        if eliminar:
+            if item_id:
+                filas.append({"form": i, "id": item_id, "eliminar": True})
+            continue
+
+        if not (payload or enun or punt):
+            continue
+
+        try:
+            datos = json.loads(payload) if payload else {"kind": item_kind, "questions": []}
+        except ValueError as e:
+            log.warning("editor_items.json_invalido", form=i, error=str(e))
+            datos = {"kind": item_kind, "questions": []}
+
+        if time_limit:
+            datos["timeLimit"] = time_limit
+
+        filas.append({
+            "form": i,
+            "id": item_id,
+            "eliminar": False,
+            "enunciado": enun,
+            "puntaje": punt,
+            "datos": datos,
+        })
+    return filas
+
+
+def guardar_items(actividad, filas) -> dict:
+    """
+    Aplica `filas` (de leer_items_post) a los ítems de `actividad`.
+
+    Devuelve {"nuevos", "actualizados", "eliminados", "guardados"}.
+    """
+    with transaction.atomic():
+        existentes = {it.pk: it for it in ItemActividad.objects.filter(actividad=actividad)}
+        a_borrar = {f["id"] for f in filas if f["eliminar"] and f["id"] in existentes}
+
+        nuevos, actualizados = [], []
+        enviados = []       # en el orden del formulario
+        vistos = set(a_borrar)
+
+        for fila in filas:
+            if fila["eliminar"]:
+                continue
+            item = existentes.get(fila["id"]) if fila["id"] else None
+            if fila["id"] and item is None:
+                log.warning("editor_items.item_inexistente", actividad=actividad.pk, item=fila["id"])
+            if item is None or item.pk in vistos:
+                item = ItemActividad(actividad=actividad)
+                nuevos.append(item)
+            else:
+                vistos.add(item.pk)
+                actualizados.append(item)
+            item.enunciado = fila["enunciado"]
+            item.puntaje = fila["puntaje"]
+            item.datos = fila["datos"]
+            item.tipo = "game"
+            enviados.append(item)
+
+        # Orden: lo enviado y después los existentes que el formulario no
+        # mencionó, en su orden actual
+        sin_tocar = sorted(
+            (it for pk, it in existentes.items() if pk not in vistos),
+            key=lambda it: (it.orden, it.pk),
+        )
+        for orden, item in enumerate(enviados + sin_tocar, start=1):
+            item.orden = orden
+
+        if a_borrar:
+            ItemActividad.objects.filter(actividad=actividad, pk__in=a_borrar).delete()
+        if actualizados or sin_tocar:
+            ItemActividad.objects.bulk_update(
+                actualizados + sin_tocar, ["enunciado", "puntaje", "datos", "tipo", "orden"], batch_size=500,
+            )
+        if nuevos:
+            ItemActividad.objects.bulk_create(nuevos, batch_size=500)
+
+        if a_borrar or actualizados or sin_tocar or nuevos:
+            renovar_version_contenido(actividad.pk)
+
+    return {
+        "nuevos": len(nuevos),
+        "actualizados": len(actualizados),
+        "eliminados": len(a_borrar),
+        "guardados": len(nuevos) + len(actualizados),
+    }
@@ -0,0 +1,258 @@
+"""
+Exportación del libro de notas (CSV / XLSX) en streaming.
+
+Una fila por estudiante y, por cada actividad, tres columnas: mejor nota,
+intentos y fecha en que se completó. Los datos salen del resumen que ya
+mantiene AsignacionActividad (mejor_calificacion, intentos_usados,
+fecha_completada; ver signals.sincronizar_intentos), así que basta UNA
+consulta ordenada por estudiante, recorrida con iterator() (cursor de
+servidor en PostgreSQL, lectura por tramos en SQLite). Cada estudiante
+se escribe apenas termina su grupo de filas: la memoria no crece con el
+tamaño del colegio y los primeros bytes salen de inmediato.
+
+El XLSX se escribe a mano (SpreadsheetML mínimo, celdas en línea) sobre
+un ZipFile que no necesita retroceder en el archivo: no hace falta
+openpyxl y el libro también se entrega por trozos.
+
+Lo usan la vista `exportar_notas` (StreamingHttpResponse) y el comando
+`manage.py exportar_notas` (escribe a disco).
+"""
+import csv
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from .models import Actividad, AsignacionActividad
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+FILAS_POR_TROZO = 200
+
+# Excel / LibreOffice evalúan como fórmula el texto que empieza así
+_INICIO_FORMULA = ("=", "+", "-", "@", "\t", "\r")
+
+
+# --------------------------------------------------------------------
+# Filas
+# --------------------------------------------------------------------
+
+def _texto(valor):
+    """Texto libre (títulos, nombres) sin riesgo de inyección de fórmulas."""
+    if isinstance(valor, str) and valor.startswith(_INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def actividades_exportables(curso_id=None, actividad_id=None, docente_id=None) -> list:
+    """
+    [(id, titulo)] de las columnas: la actividad pedida o las asignadas a
+    los estudiantes del curso; con `docente_id`, solo las suyas.
+    """
+    qs = Actividad.objects.all()
+    if actividad_id is not None:
+        qs = qs.filter(pk=actividad_id)
+    elif curso_id is not None:
+        qs = qs.filter(pk__in=(
+            AsignacionActividad.objects
+            .filter(estudiante__usuario__matriculas__curso_id=curso_id)
+            .values("actividad_id")
+        ))
+    else:
+        return []
+    if docente_id is not None:
+        qs = qs.filter(docente_id=docente_id)
+    return list(qs.order_by("id").values_list("id", "titulo"))
+
+
+def filas_libro(curso_id=None, actividad_id=None, docente_id=None):
+    """Cabecera y después una fila por estudiante (generador)."""
+    actividades = actividades_exportables(curso_id, actividad_id, docente_id)
+    columna = {pk: i for i, (pk, _) in enumerate(actividades)}
+
+    cabecera = ["RUT", "Apellidos", "Nombres"]
+    for _, titulo in actividades:
+        titulo = _texto(titulo)
+        cabecera += [f"{titulo} · nota", f"{titulo} · intentos", f"{titulo} · completada"]
+    yield cabecera
+    if not actividades:
+        return
+
+    asignaciones = AsignacionActividad.objects.filter(actividad_id__in=list(columna))
+    if curso_id is not None:
+        asignaciones = asignaciones.filter(estudiante__usuario__matriculas__curso_id=curso_id)
+    asignaciones = (
+        asignaciones
+        .order_by("estudiante__usuario__last_name", "estudiante__usuario__first_name", "estudiante_id")
+        .values_list(
+            "estudiante_id", "estudiante__usuario__rut", "estudiante__usuario__last_name",
+            "estudiante__usuario__first_name", "actividad_id",
+            "mejor_calificacion", "nota", "intentos_usados", "fecha_completada",
+        )
+    )
+
+    fila, actual = None, None
+    for est, rut, apellidos, nombres, act, mejor, nota, intentos, completada in asignaciones.iterator(chunk_size=2000):
+        if est != actual:
+            if fila is not None:
+                yield fila
+            actual = est
+            fila = [_texto(rut), _texto(apellidos), _texto(nombres)] + [None] * (3 * len(actividades))
+        i = 3 + 3 * columna[act]
+        fila[i] = mejor if mejor is not None else nota
+        fila[i + 1] = intentos
+        fila[i + 2] = completada.isoformat() if completada else None
+    if fila is not None:
+        yield fila
+
+
+# --------------------------------------------------------------------
+# CSV
+# --------------------------------------------------------------------
+
+class _Eco:
+    """csv.writer escribe aquí y writerow() devuelve la línea."""
+    def write(self, valor):
+        return valor
+
+
+def csv_en_trozos(filas):
+    """Bytes UTF-8 (con BOM, para que Excel lea bien los acentos)."""
+    escritor = csv.writer(_Eco())
+    lote = ["\ufeff"]
+    for fila in filas:
+        lote.append(escritor.writerow(["" if v is None else v for v in fila]))
+        if len(lote) >= FILAS_POR_TROZO:
+            yield "".join(lote).encode("utf-8")
+            lote = []
+    yield "".join(lote).encode("utf-8")
+
+
+# --------------------------------------------------------------------
+# XLSX
+# --------------------------------------------------------------------
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{hoja}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+_HOJA_INICIO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetData>'
+)
+_HOJA_FIN = '</sheetData></worksheet>'
+
+# Caracteres de control que XML 1.0 no admite
+_NO_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+class _Tubo:
+    """
+    Destino de ZipFile sin seek(): acumula lo escrito hasta que el
+    generador lo entrega (ZipFile usa descriptores de datos en ese caso).
+    """
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self) -> bytes:
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def _columna(n: int) -> str:
+    """0 → A, 25 → Z, 26 → AA..."""
+    letras = ""
+    n += 1
+    while n:
+        n, resto = divmod(n - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _celda(ref: str, valor) -> str:
+    if valor is None:
+        return ""
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return f'<c r="{ref}"><v>{valor}</v></c>'
+    texto = escape(_NO_XML.sub("", str(valor)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila_xml(n: int, fila) -> str:
+    celdas = "".join(_celda(f"{_columna(i)}{n}", v) for i, v in enumerate(fila))
+    return f'<row r="{n}">{celdas}</row>'
+
+
+def xlsx_en_trozos(filas, hoja="Notas"):
+    """Libro de una hoja, entregado por trozos a medida que se comprime."""
+    tubo = _Tubo()
+    with zipfile.ZipFile(tubo, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _RELS)
+        zf.writestr("xl/workbook.xml", _WORKBOOK.format(hoja=escape(hoja[:31])))
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        yield tubo.vaciar()
+
+        with zf.open("xl/worksheets/sheet1.xml", "w") as xml:
+            xml.write(_HOJA_INICIO.encode("utf-8"))
+            for n, fila in enumerate(filas, start=1):
+                xml.write(_fila_xml(n, fila).encode("utf-8"))
+                if n % FILAS_POR_TROZO == 0:
+                    datos = tubo.vaciar()
+                    if datos:
+                        yield datos
+            xml.write(_HOJA_FIN.encode("utf-8"))
+    yield tubo.vaciar()
+
+
+# --------------------------------------------------------------------
+# Punto de entrada
+# --------------------------------------------------------------------
+
+def exportar(formato: str, curso_id=None, actividad_id=None, docente_id=None):
+    """Generador de bytes del libro de notas en `formato` ("csv" / "xlsx")."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}")
+    filas = filas_libro(curso_id, actividad_id, docente_id)
+    return csv_en_trozos(filas) if formato == "csv" else xlsx_en_trozos(filas)
@@ -7,13 +7,17 @@ from django.core.exceptions import ValidationError
 from django.contrib.auth.forms import (
     UserCreationForm, PasswordChangeForm, PasswordResetForm
 )
+from django.db import transaction
 from django.forms import BaseInlineFormSet
 from django.contrib.auth import get_user_model
 from django.utils.text import slugify
 from .models import Actividad, ItemActividad, Curso, Asignatura, AsignacionDocente, Matricula, Estudiante
 from .validators import formatear_rut_usuario
+from .diagnostico import obtener_logger
+from .signals import renovar_version_contenido
 
 Usuario = get_user_model()
+log = obtener_logger(__name__)
 
 # ==============================
 # Registro
@@ -255,7 +259,36 @@ class AdminUsuarioForm(forms.ModelForm):
         if qs.exists():
             raise ValidationError("Este email ya está registrado.")
         return email
-    
+
+
+# =====================================================
+# Carga masiva de alumnos (LevelUp/importacion.py)
+# =====================================================
+class ImportarAlumnosForm(forms.Form):
+    MAX_BYTES = 2 * 1024 * 1024
+
+    archivo = forms.FileField(
+        label="Nómina (CSV)",
+        help_text="Columnas: rut, nombres, apellidos, email, curso y, opcional, password.",
+        widget=forms.ClearableFileInput(attrs={"class": "form-control", "accept": ".csv,text/csv"}),
+    )
+    password_inicial = forms.CharField(
+        label="Contraseña inicial",
+        required=False,
+        strip=False,
+        help_text="Se usa en las filas sin columna password.",
+        widget=forms.PasswordInput(attrs={"class": "form-control", "autocomplete": "new-password"}),
+    )
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data["archivo"]
+        if archivo.size > self.MAX_BYTES:
+            raise ValidationError("El archivo supera los 2 MB.")
+        try:
+            return archivo.read().decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise ValidationError("El archivo debe estar en UTF-8 (en Excel: «CSV UTF-8»).")
+
 # ---------------------------------------------------------
 # Actividad
 # ---------------------------------------------------------
@@ -400,7 +433,6 @@ class ItemInlineFormSet(BaseInlineFormSet):
                     
                     if payload or enun or punt:
                         form.empty_permitted = False
-                        print(f"   🔧 full_clean: Form {i} tiene contenido, forzando validación")
         
         # Llamar al full_clean original
         super().full_clean()
@@ -421,32 +453,25 @@ class ItemInlineFormSet(BaseInlineFormSet):
                 
                 if payload or enun or punt:
                     form.empty_permitted = False
-                    print(f"   🔧 Form {i} ({prefix}): Desactivando empty_permitted")
         
         return form
     
     def clean(self):
         super().clean()
         
-        print(f"\n🔍 ItemInlineFormSet.clean() - Validando formset:")
-        print(f"   Total forms: {len(self.forms)}")
-        print(f"   Errores previos: {any(self.errors)}")
-        
         if any(self.errors):
             # Si ya hay errores de validación individual, no agregar más
-            print(f"   ⚠️ Hay errores previos, abortando clean()")
-            for i, form_errors in enumerate(self.errors):
-                if form_errors:
-                    print(f"      Form {i}: {form_errors}")
+            log.debug(
+                "item_formset.errores_previos",
+                errores=lambda: {i: e for i, e in enumerate(self.errors) if e},
+            )
             return
 
         for i, form in enumerate(self.forms):
             # Si no hay cleaned_data (form ultra vacío) o está marcado para borrar, sáltalo
             if not getattr(form, "cleaned_data", None):
-                print(f"   Form {i}: Sin cleaned_data, saltando")
                 continue
             if form.cleaned_data.get("DELETE"):
-                print(f"   Form {i}: Marcado DELETE, saltando")
                 continue
 
             # Campos del form
@@ -460,15 +485,12 @@ class ItemInlineFormSet(BaseInlineFormSet):
                 payload = (form.cleaned_data.get("datos") or "").strip() if "datos" in form.fields else ""
 
             tiene_algo = bool(payload or enun or (punt not in (None, "")))
-            
-            print(f"   Form {i}: tiene_algo={tiene_algo}, enun={len(enun)}, punt={punt}, payload={len(payload)}")
 
             # Si hay payload del builder, este form no es vacío
             if payload:
                 form.empty_permitted = False
                 # Forzar que Django lo considere válido aunque esté en extra_forms
                 form.has_changed = lambda: True
-                print(f"      → Forzando empty_permitted=False y has_changed=True")
 
             if tiene_algo:
                 # Desactivar empty_permitted para forzar validación
@@ -476,17 +498,18 @@ class ItemInlineFormSet(BaseInlineFormSet):
                 
                 if not enun:
                     form.add_error("enunciado", "Este campo es obligatorio cuando el ítem tiene contenido.")
-                    print(f"      ERROR: Falta enunciado")
                 if punt in (None, ""):
                     form.add_error("puntaje", "Este campo es obligatorio cuando el ítem tiene contenido.")
-                    print(f"      ERROR: Falta puntaje")
                     
     def save(self, commit=True):
         """
         Override save para asegurar que TODOS los forms con contenido se guarden,
-        incluso los que Django considera 'extra_forms'
+        incluso los que Django considera 'extra_forms'.
+
+        Con commit=True escribe en bloque: un DELETE, un bulk_update y un
+        bulk_create (ver LevelUp/editor_items.py).
         """
-        # Primero se guarda normalmente (esto guarda initial forms y algunos extra)
+        # Primero se procesa normalmente (initial forms y algunos extra)
         instances = super().save(commit=False)
         
         # Ahora se "fuerza" el guardado de TODOS los extra_forms que tienen contenido
@@ -503,25 +526,33 @@ class ItemInlineFormSet(BaseInlineFormSet):
             
             tiene_contenido = bool(payload or enun or (punt not in (None, "")))
             
-            if tiene_contenido:
-                # Si no tiene instancia o no fue guardado por super().save()
-                if not form.instance.pk:
-                    instance = form.save(commit=False)
-                    if not instance.datos:
-                        instance.datos = {"kind": "trivia", "questions": []}
-                    instance.actividad = self.instance
-                    
-                    if commit:
-                        instance.save()
-                    
-                    saved_forms.append(instance)
-                    print(f"✅ Form extra guardado manualmente: {instance.pk or 'NUEVO'}")
-        
-        # Agregar las instancias guardadas manualmente a la lista
-        if saved_forms:
-            instances = list(instances) + saved_forms
-        
-        return instances
+            if tiene_contenido and not form.instance.pk and form.instance not in instances:
+                instance = form.save(commit=False)
+                if not instance.datos:
+                    instance.datos = {"kind": "trivia", "questions": []}
+                instance.actividad = self.instance
+                saved_forms.append(instance)
+
+        nuevos = [obj for obj in instances if not obj.pk] + saved_forms
+        existentes = [obj for obj in instances if obj.pk]
+
+        if commit:
+            with transaction.atomic():
+                borrar = [obj.pk for obj in self.deleted_objects if obj.pk]
+                if borrar:
+                    ItemActividad.objects.filter(pk__in=borrar).delete()
+                if existentes:
+                    ItemActividad.objects.bulk_update(
+                        existentes, ["enunciado", "puntaje", "datos", "tipo", "orden"], batch_size=500,
+                    )
+                if nuevos:
+                    for obj in nuevos:
+                        obj.actividad = self.instance
+                    ItemActividad.objects.bulk_create(nuevos, batch_size=500)
+                if borrar or existentes or nuevos:
+                    renovar_version_contenido(self.instance.pk)
+
+        return existentes + nuevos
     
 class ItemForm(forms.ModelForm):
     item_kind = forms.ChoiceField(
@@ -593,10 +624,8 @@ class ItemForm(forms.ModelForm):
                         datos["kind"] = kind
                     
                     self.fields["game_pairs"].initial = json.dumps(datos, ensure_ascii=False, indent=2)
-                    
-                    print(f"✅ Ítem {self.instance.pk} precargado: {kind}, {len(str(datos))} chars")
                 except Exception as e:
-                    print(f"❌ Error serializando datos del ítem {self.instance.pk}: {e}")
+                    log.warning("item_form.datos_no_serializables", item=self.instance.pk, error=str(e))
                     self.fields["game_pairs"].initial = json.dumps({"kind": kind}, ensure_ascii=False)
             else:
                 # Sin no hay datos crea estructura base
@@ -609,7 +638,6 @@ class ItemForm(forms.ModelForm):
 
         # Si el textarea viene vacío pero la instancia tiene datos, los mantiene
         if not raw.strip() and self.instance.pk and self.instance.datos:
-            print(f"⚠️ Textarea vacío, preservando datos existentes del ítem {self.instance.pk}")
             datos = self.instance.datos
             # Actualizar kind por si cambió
             datos["kind"] = kind
@@ -650,9 +678,6 @@ class ItemForm(forms.ModelForm):
         self.instance.datos = datos
         self.instance.tipo = "game"
         
-        # Log para debug
-        print(f"💾 Guardando ítem: kind={datos.get('kind')}, datos={len(str(datos))} chars")
-        
         return cleaned
 
     def save(self, commit=True):
@@ -661,12 +686,12 @@ class ItemForm(forms.ModelForm):
         # Los datos ya están en inst.datos por clean()
         # Verificar que no se perdieron
         if not inst.datos or not isinstance(inst.datos, dict):
-            print(f"⚠️ WARNING: Ítem {inst.pk or 'NUEVO'} sin datos válidos al guardar")
+            log.warning("item_form.sin_datos", item=inst.pk)
             inst.datos = {"kind": "trivia", "questions": []}
         
         if commit:
             inst.save()
-            print(f"✅ Ítem guardado: ID={inst.pk}, kind={inst.datos.get('kind')}")
+            log.debug("item_form.guardado", item=inst.pk, kind=inst.datos.get("kind"))
         
         return inst
 
@@ -0,0 +1,142 @@
+"""
+Claves de idempotencia para las APIs de respuestas.
+
+games/core.js manda una cabecera `Idempotency-Key` por envío lógico y la
+repite en los reintentos. La primera petición con esa clave se procesa y
+su respuesta queda en la BD (ClaveIdempotencia) como un registro compacto
+(status, tipo, cuerpo y huella del body). Las repeticiones devuelven esa
+respuesta tal cual, sin volver a los intentos ni a la cola de tareas:
+
+- Misma clave con otro body: 422 (clave reutilizada por error del cliente).
+- Misma clave mientras la primera sigue en curso: 409 + Retry-After.
+- Sin cabecera: la vista se ejecuta como siempre.
+
+La clave incluye usuario y ruta. Al estar en la BD deduplica entre todos
+los procesos de gunicorn. Es una cabecera propia y no X-Request-Id, que
+es el id de correlación de los logs (LevelUp/diagnostico.py) y un cliente
+puede repetirlo entre peticiones distintas.
+
+Las filas vencidas cuentan como inexistentes; `manage.py procesar_tareas
+--purgar-dias N` las borra (purgar_vencidas).
+"""
+import hashlib
+import re
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .diagnostico import obtener_logger
+from .models import ClaveIdempotencia
+
+log = obtener_logger(__name__)
+
+CABECERA = "HTTP_IDEMPOTENCY_KEY"
+FORMATO_CLAVE = re.compile(r"^[A-Za-z0-9_.:-]{8,100}$")
+
+TTL_EN_CURSO = 60          # segundos; si el proceso muere, la clave se libera sola
+
+
+def _ttl() -> int:
+    return getattr(settings, "LEVELUP_IDEMPOTENCIA_TTL", 24 * 3600)
+
+
+def _clave(request, clave_cliente: str) -> str:
+    base = f"{request.user.pk}:{request.path}:{clave_cliente}"
+    return hashlib.sha1(base.encode("utf-8")).hexdigest()
+
+
+def _huella(request) -> str:
+    return hashlib.sha1(request.body).hexdigest()[:16]
+
+
+def _repetir(registro) -> HttpResponse:
+    respuesta = HttpResponse(bytes(registro.contenido), status=registro.status, content_type=registro.tipo)
+    respuesta["Idempotent-Replayed"] = "true"
+    return respuesta
+
+
+def _en_curso():
+    respuesta = JsonResponse({"ok": False, "error": "Petición en curso"}, status=409)
+    respuesta["Retry-After"] = "1"
+    return respuesta
+
+
+def _tomar(clave: str, huella: str) -> bool:
+    """Reserva la clave (nueva o vencida). False si otro proceso la tiene."""
+    ahora = timezone.now()
+    vence = ahora + timedelta(seconds=TTL_EN_CURSO)
+    try:
+        with transaction.atomic():
+            ClaveIdempotencia.objects.create(clave=clave, huella=huella, vence_en=vence)
+        return True
+    except IntegrityError:
+        # Vencida: la toma quien logre el UPDATE condicional
+        return bool(
+            ClaveIdempotencia.objects
+            .filter(clave=clave, vence_en__lte=ahora)
+            .update(estado=ClaveIdempotencia.Estado.EN_CURSO, huella=huella, status=None,
+                    tipo="", contenido=b"", vence_en=vence)
+        )
+
+
+def idempotente(vista):
+    """
+    Decorador para vistas POST que escriben: deduplica por Idempotency-Key.
+    Solo se guardan las respuestas < 500 (un error del servidor se puede
+    reintentar con la misma clave).
+    """
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        clave_cliente = request.META.get(CABECERA, "").strip()
+        if not clave_cliente:
+            return vista(request, *args, **kwargs)
+        if not FORMATO_CLAVE.match(clave_cliente):
+            return JsonResponse({"ok": False, "error": "Idempotency-Key inválida"}, status=400)
+
+        clave = _clave(request, clave_cliente)
+        huella = _huella(request)
+
+        registro = ClaveIdempotencia.objects.filter(clave=clave, vence_en__gt=timezone.now()).first()
+        if registro is not None:
+            if registro.huella != huella:
+                log.info("idempotencia.conflicto", ruta=request.path, clave=clave_cliente)
+                return JsonResponse(
+                    {"ok": False, "error": "Idempotency-Key reutilizada con otro contenido"}, status=422,
+                )
+            if registro.estado == ClaveIdempotencia.Estado.EN_CURSO:
+                return _en_curso()
+            log.debug("idempotencia.repetida", ruta=request.path, clave=clave_cliente)
+            return _repetir(registro)
+
+        if not _tomar(clave, huella):
+            return _en_curso()
+
+        try:
+            respuesta = vista(request, *args, **kwargs)
+        except Exception:
+            ClaveIdempotencia.objects.filter(clave=clave).delete()
+            raise
+
+        if respuesta.status_code >= 500 or respuesta.streaming:
+            ClaveIdempotencia.objects.filter(clave=clave).delete()
+        else:
+            ClaveIdempotencia.objects.filter(clave=clave).update(
+                estado=ClaveIdempotencia.Estado.HECHA,
+                status=respuesta.status_code,
+                tipo=respuesta["Content-Type"],
+                contenido=respuesta.content,
+                vence_en=timezone.now() + timedelta(seconds=_ttl()),
+            )
+        return respuesta
+
+    return envoltura
+
+
+def purgar_vencidas() -> int:
+    """Borra los registros vencidos. Devuelve cuántos."""
+    borradas, _ = ClaveIdempotencia.objects.filter(vence_en__lte=timezone.now()).delete()
+    return borradas
@@ -0,0 +1,329 @@
+"""
+Carga masiva de alumnos desde una nómina CSV.
+
+Columnas (cabecera obligatoria, sin importar mayúsculas ni el orden):
+rut, nombres, apellidos, email, curso y, opcional, password. El curso se
+escribe como "5A", "5° A" o "5° Básico A" y debe existir. Si la fila no
+trae contraseña se usa la contraseña inicial común del formulario/comando.
+
+Por qué no se usa RegistrationForm fila a fila: cada alta paga un hash
+PBKDF2 completo (cientos de ms) y las señales post_save de Usuario y
+PerfilGamificacion hacen otras ~10 consultas. Aquí:
+
+1. Se valida todo en memoria: RUT normalizado con formatear_rut_usuario,
+   email, curso y duplicados dentro del archivo; los duplicados contra la
+   BD salen de dos consultas `__in` (RUT y email).
+2. Los hashes se calculan en un pool de procesos (make_password es CPU
+   puro y no suelta el GIL); con pocas filas, en serie.
+3. Usuario, Estudiante, PerfilGamificacion, Matricula, la recompensa de
+   bienvenida y la fila del ranking se insertan con bulk_create por lotes,
+   cada lote en su transacción.
+
+Una fila con errores no detiene la carga: queda en `Resultado.errores`
+con su número de línea. Si un lote choca al guardar (p. ej. alguien creó
+el mismo RUT entre medio) solo ese lote se marca como fallido.
+
+Lo usan la vista `adm_importar_alumnos` y `manage.py importar_alumnos`.
+"""
+import csv
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DatabaseError, transaction
+from django.db.models.functions import Lower
+
+from gamificacion.models import PerfilGamificacion, PuestoRanking, Recompensa, RecompensaUsuario
+from gamificacion.ranking import nombre_para_ranking
+
+from . import tableros
+from .diagnostico import obtener_logger
+from .models import Curso, Estudiante, Matricula, Usuario
+from .validators import formatear_rut_usuario
+
+log = obtener_logger(__name__)
+
+COLUMNAS = {
+    "rut": "rut",
+    "nombres": "nombres", "nombre": "nombres",
+    "apellidos": "apellidos", "apellido": "apellidos",
+    "email": "email", "correo": "email",
+    "curso": "curso",
+    "password": "password", "contraseña": "password", "clave": "password",
+}
+OBLIGATORIAS = ("rut", "nombres", "apellidos", "email", "curso")
+
+TAM_LOTE = 500
+MIN_FILAS_POOL = 16        # por debajo, arrancar procesos cuesta más que hashear en serie
+
+_CURSO = re.compile(r"^\s*(\d)\s*°?\s*(?:b[aá]sico)?\s*([a-z]{1,2})\s*$", re.IGNORECASE)
+
+
+@dataclass
+class Resultado:
+    creados: int = 0
+    filas: int = 0
+    errores: list = field(default_factory=list)   # [(línea, mensaje)]
+
+    def error(self, linea, mensaje):
+        self.errores.append((linea, mensaje))
+
+
+# --------------------------------------------------------------------
+# Lectura y validación
+# --------------------------------------------------------------------
+
+def leer_csv(contenido) -> tuple[list, list]:
+    """
+    (filas, faltantes): filas como [(línea, {columna: valor})] con las
+    columnas canónicas de COLUMNAS; `faltantes` lista las obligatorias que
+    no vienen en la cabecera. Acepta bytes (UTF-8, con o sin BOM) o texto
+    y separador "," o ";" (Excel en español).
+    """
+    if isinstance(contenido, bytes):
+        contenido = contenido.decode("utf-8-sig")
+    contenido = contenido.lstrip("\ufeff")
+    muestra = contenido[:4096]
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+    except csv.Error:
+        dialecto = csv.excel
+
+    lector = csv.reader(io.StringIO(contenido), dialecto)
+    cabecera = next(lector, [])
+    nombres = [COLUMNAS.get(c.strip().lower()) for c in cabecera]
+    faltantes = [c for c in OBLIGATORIAS if c not in nombres]
+
+    filas = []
+    for valores in lector:
+        if not any(v.strip() for v in valores):
+            continue
+        fila = {
+            nombre: valor.strip()
+            for nombre, valor in zip(nombres, valores)
+            if nombre is not None
+        }
+        filas.append((lector.line_num, fila))
+    return filas, faltantes
+
+
+def _cursos() -> dict:
+    return {(c.nivel, c.letra.upper()): c for c in Curso.objects.all()}
+
+
+def _curso_de(texto, cursos):
+    m = _CURSO.match(texto or "")
+    if not m:
+        raise ValidationError(f"Curso «{texto}» no reconocido (usa p. ej. 5A o 5° Básico A).")
+    curso = cursos.get((int(m.group(1)), m.group(2).upper()))
+    if curso is None:
+        raise ValidationError(f"El curso «{texto}» no existe.")
+    return curso
+
+
+def _mensaje(error: ValidationError) -> str:
+    return " ".join(str(m) for m in error.messages)
+
+
+def validar_filas(filas, password_inicial=None, resultado=None) -> list:
+    """
+    Normaliza y valida las filas. Devuelve las válidas como dicts listos
+    para insertar; las demás quedan en `resultado.errores`.
+    """
+    resultado = resultado if resultado is not None else Resultado()
+    cursos = _cursos()
+    vistos_rut, vistos_email = {}, {}
+    validas = []
+
+    for linea, fila in filas:
+        resultado.filas += 1
+        try:
+            rut = formatear_rut_usuario(fila.get("rut"))
+            email = (fila.get("email") or "").lower()
+            validate_email(email)
+            nombres, apellidos = fila.get("nombres") or "", fila.get("apellidos") or ""
+            if not nombres or not apellidos:
+                raise ValidationError("Faltan nombres o apellidos.")
+            if len(nombres) > 150 or len(apellidos) > 150:
+                raise ValidationError("Nombres y apellidos admiten hasta 150 caracteres.")
+            curso = _curso_de(fila.get("curso"), cursos)
+            password = fila.get("password") or password_inicial
+            if not password:
+                raise ValidationError("Sin contraseña (agrega la columna password o una contraseña inicial).")
+            validate_password(password, Usuario(
+                username=email.split("@")[0], email=email, first_name=nombres, last_name=apellidos,
+            ))
+        except ValidationError as e:
+            resultado.error(linea, _mensaje(e))
+            continue
+
+        if rut in vistos_rut:
+            resultado.error(linea, f"RUT {rut} repetido (ya está en la línea {vistos_rut[rut]}).")
+            continue
+        if email in vistos_email:
+            resultado.error(linea, f"Email {email} repetido (ya está en la línea {vistos_email[email]}).")
+            continue
+        vistos_rut[rut], vistos_email[email] = linea, linea
+        validas.append({
+            "linea": linea, "rut": rut, "email": email,
+            "nombres": nombres, "apellidos": apellidos,
+            "curso": curso, "password": password,
+        })
+
+    # Duplicados contra la BD: dos consultas para todo el archivo
+    ruts_bd = set(Usuario.objects.filter(rut__in=list(vistos_rut)).values_list("rut", flat=True))
+    emails_bd = set(
+        Usuario.objects.annotate(email_min=Lower("email"))
+        .filter(email_min__in=list(vistos_email)).values_list("email_min", flat=True)
+    )
+    libres = []
+    for fila in validas:
+        if fila["rut"] in ruts_bd:
+            resultado.error(fila["linea"], f"El RUT {fila['rut']} ya está registrado.")
+        elif fila["email"] in emails_bd:
+            resultado.error(fila["linea"], f"El email {fila['email']} ya está registrado.")
+        else:
+            libres.append(fila)
+    return libres
+
+
+def _usernames(bases) -> list:
+    """
+    Usernames libres (base, base1, base2...) como RegistrationForm, pero
+    resolviendo todos los choques con una consulta `__in` por ronda.
+    """
+    elegidos = list(bases)
+    sufijo = [0] * len(bases)
+    pendientes = list(range(len(bases)))
+    tomados = set()
+    while pendientes:
+        candidatos = {elegidos[i] for i in pendientes}
+        ocupados = set(Usuario.objects.filter(username__in=candidatos).values_list("username", flat=True))
+        siguiente = []
+        for i in pendientes:
+            if elegidos[i] in ocupados or elegidos[i] in tomados:
+                sufijo[i] += 1
+                elegidos[i] = f"{bases[i]}{sufijo[i]}"
+                siguiente.append(i)
+            else:
+                tomados.add(elegidos[i])
+        pendientes = siguiente
+    return elegidos
+
+
+# --------------------------------------------------------------------
+# Hash de contraseñas
+# --------------------------------------------------------------------
+
+def _iniciar_proceso(modulo_settings):
+    # Con "spawn" (macOS / Windows) el hijo arranca sin Django configurado
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", modulo_settings)
+    django.setup()
+
+
+def hashear(passwords, procesos=None) -> list:
+    """
+    make_password de cada contraseña, en orden. Reparte el trabajo entre
+    `procesos` (LEVELUP_IMPORTACION_PROCESOS, por defecto os.cpu_count());
+    si el pool no se puede crear, sigue en serie.
+    """
+    passwords = list(passwords)
+    if procesos is None:
+        procesos = getattr(settings, "LEVELUP_IMPORTACION_PROCESOS", None) or os.cpu_count() or 1
+    procesos = min(procesos, len(passwords))
+    if procesos <= 1 or len(passwords) < MIN_FILAS_POOL:
+        return [make_password(p) for p in passwords]
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=procesos,
+            initializer=_iniciar_proceso,
+            initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", ""),),
+        ) as pool:
+            return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (procesos * 4))))
+    except (OSError, NotImplementedError) as e:
+        log.warning("importacion.pool_no_disponible", error=str(e))
+        return [make_password(p) for p in passwords]
+
+
+# --------------------------------------------------------------------
+# Inserción
+# --------------------------------------------------------------------
+
+def _insertar_lote(filas, bienvenida) -> None:
+    usuarios = [
+        Usuario(
+            username=f["username"], email=f["email"], rut=f["rut"],
+            first_name=f["nombres"], last_name=f["apellidos"],
+            password=f["hash"], rol=Usuario.Rol.ESTUDIANTE,
+        )
+        for f in filas
+    ]
+    with transaction.atomic():
+        Usuario.objects.bulk_create(usuarios)
+        # No todos los motores devuelven las pk del bulk_create: se releen por RUT
+        pk_de = dict(Usuario.objects.filter(rut__in=[u.rut for u in usuarios]).values_list("rut", "pk"))
+        for u in usuarios:
+            u.pk = pk_de[u.rut]
+        curso_de = {u.pk: f["curso"] for u, f in zip(usuarios, filas)}
+
+        Estudiante.objects.bulk_create([Estudiante(usuario=u, curso=str(curso_de[u.pk])) for u in usuarios])
+        PerfilGamificacion.objects.bulk_create([PerfilGamificacion(usuario=u) for u in usuarios])
+        Matricula.objects.bulk_create([Matricula(estudiante=u, curso=curso_de[u.pk]) for u in usuarios])
+
+        perfiles = dict(
+            PerfilGamificacion.objects.filter(usuario__in=usuarios).values_list("usuario_id", "pk")
+        )
+        # Lo que harían obtener_o_crear_perfil y sincronizar_puesto por señal
+        if bienvenida is not None:
+            RecompensaUsuario.objects.bulk_create(
+                [RecompensaUsuario(perfil_id=perfiles[u.pk], recompensa=bienvenida) for u in usuarios]
+            )
+        puestos = []
+        for u in usuarios:
+            nombre, nombre_orden = nombre_para_ranking(u)
+            puestos.append(PuestoRanking(perfil_id=perfiles[u.pk], nombre=nombre, nombre_orden=nombre_orden))
+        PuestoRanking.objects.bulk_create(puestos)
+
+
+def importar_alumnos(contenido, password_inicial=None, procesos=None, tam_lote=TAM_LOTE) -> Resultado:
+    """Importa la nómina `contenido` (bytes o texto CSV). Nunca lanza por una fila."""
+    resultado = Resultado()
+    filas, faltantes = leer_csv(contenido)
+    if faltantes:
+        resultado.error(1, f"Faltan columnas: {', '.join(faltantes)}.")
+        return resultado
+
+    validas = validar_filas(filas, password_inicial, resultado)
+    if validas:
+        nombres = _usernames([f["email"].split("@")[0] for f in validas])
+        hashes = hashear([f["password"] for f in validas], procesos=procesos)
+        for f, username, hash_ in zip(validas, nombres, hashes):
+            f["username"], f["hash"] = username, hash_
+
+        bienvenida = Recompensa.objects.filter(slug="bienvenido-levelup").first()
+        for i in range(0, len(validas), tam_lote):
+            lote = validas[i:i + tam_lote]
+            try:
+                _insertar_lote(lote, bienvenida)
+            except DatabaseError as e:
+                log.warning("importacion.lote_fallido", desde=lote[0]["linea"], error=str(e))
+                for f in lote:
+                    resultado.error(f["linea"], "No se pudo guardar el lote de esta fila; vuelve a importarla.")
+                continue
+            resultado.creados += len(lote)
+
+        tableros.invalidar_global()
+
+    resultado.errores.sort()
+    log.info("importacion.alumnos", filas=resultado.filas, creados=resultado.creados,
+             errores=len(resultado.errores))
+    return resultado
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from LevelUp.analitica import MOTORES, analizar_actividad, analizar_curso, analizar_pendientes
+from LevelUp.models import Actividad, Curso
+
+
+class Command(BaseCommand):
+    help = (
+        "Análisis de ítems (facilidad, discriminación, distractores) desde las respuestas. "
+        "Sin opciones recalcula solo las actividades con entregas nuevas (para cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--actividad", type=int, action="append", default=[], help="Id de actividad (repetible)")
+        parser.add_argument("--curso", type=int, help="Limita a los matriculados en el curso")
+        parser.add_argument("--todas", action="store_true", help="Recalcula todas las actividades con entregas")
+        parser.add_argument("--motor", choices=MOTORES, help="Fuerza numpy o python (por defecto numpy si está)")
+
+    def handle(self, *args, **options):
+        motor, curso_id = options["motor"], options["curso"]
+        if curso_id is not None and not Curso.objects.filter(pk=curso_id).exists():
+            raise CommandError(f"No existe el curso {curso_id}")
+
+        inicio = time.perf_counter()
+        try:
+            if options["actividad"]:
+                actividades = Actividad.objects.filter(pk__in=options["actividad"]).order_by("pk")
+                hechos = [analizar_actividad(a, curso_id, motor=motor) for a in actividades]
+            elif curso_id is not None:
+                hechos = analizar_curso(curso_id, motor=motor)
+            elif options["todas"]:
+                actividades = Actividad.objects.filter(resumen__ultima_entrega__isnull=False).order_by("pk")
+                hechos = [analizar_actividad(a, motor=motor) for a in actividades]
+            else:
+                hechos = analizar_pendientes(motor=motor)
+        except ImportError as e:
+            raise CommandError(str(e))
+
+        respuestas = sum(a.respuestas for a in hechos)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(hechos)} análisis, {respuestas} respuestas en {time.perf_counter() - inicio:.2f}s."
+        ))
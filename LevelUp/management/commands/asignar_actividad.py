@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from LevelUp.asignaciones import asignar_actividad
+from LevelUp.models import Actividad
+
+
+class Command(BaseCommand):
+    help = "Asigna una actividad a cursos y/o alumnos (por id de usuario) en bloque."
+
+    def add_arguments(self, parser):
+        parser.add_argument("actividad", type=int, help="ID de la actividad")
+        parser.add_argument("--curso", type=int, action="append", default=[], help="ID de curso (repetible)")
+        parser.add_argument("--alumno", type=int, action="append", default=[], help="ID de usuario alumno (repetible)")
+        parser.add_argument(
+            "--reemplazar",
+            action="store_true",
+            help="Quita las asignaciones de quienes no estén en la selección.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            actividad = Actividad.objects.get(pk=options["actividad"])
+        except Actividad.DoesNotExist:
+            raise CommandError(f"No existe la actividad {options['actividad']}.")
+
+        res = asignar_actividad(
+            actividad,
+            cursos_ids=options["curso"],
+            usuarios_ids=options["alumno"],
+            quitar=options["reemplazar"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"'{actividad.titulo}': {res['creadas']} creada(s), {res['quitadas']} quitada(s), "
+            f"{res['total']} asignada(s) en total."
+        ))
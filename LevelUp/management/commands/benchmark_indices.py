@@ -0,0 +1,140 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import F
+from django.urls import reverse
+
+from gamificacion.models import PerfilGamificacion, RecompensaUsuario
+from LevelUp.benchmark import bd_temporal, cliente_de, medir, sembrar_colegio
+from LevelUp.models import Actividad, AsignacionActividad, Submission, Usuario
+
+# (nombre, modelo, índice que la cubre, queryset a partir de los ids de ejemplo)
+CONSULTAS = [
+    (
+        "intento_abierto", Submission, "sub_un_abierto",
+        # Igual que services._intento_abierto (.first() ordena por pk)
+        lambda d: Submission.objects.filter(
+            actividad_id=d["actividad"], estudiante_id=d["alumno"], finalizado=False,
+        ).order_by("pk")[:1],
+    ),
+    (
+        "avance_actividad", AsignacionActividad, "asig_act_estado_idx",
+        lambda d: AsignacionActividad.objects.filter(
+            actividad_id=d["actividad"], estado=AsignacionActividad.Estado.COMPLETADA,
+        ).order_by().values_list("estudiante_id", flat=True),
+    ),
+    (
+        "popup_recompensas", RecompensaUsuario, "recusr_sin_notificar_idx",
+        lambda d: RecompensaUsuario.objects.filter(perfil_id=d["perfil"], notificada=False),
+    ),
+    (
+        "publicadas_por_asignatura", Actividad, "act_publicadas_idx",
+        lambda d: Actividad.objects.filter(
+            es_publicada=True, asignatura_id=d["asignatura"],
+        ).order_by("-fecha_publicacion")[:20],
+    ),
+]
+
+VISTAS = ["estudiante_lista", "ranking", "recompensas"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Siembra un colegio sintético en una BD temporal y compara planes y "
+        "latencias de las consultas / vistas frecuentes sin y con los índices compuestos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cursos", type=int, default=40)
+        parser.add_argument("--alumnos-por-curso", type=int, default=45)
+        parser.add_argument("--actividades", type=int, default=300)
+        parser.add_argument("--repeticiones", type=int, default=30)
+
+    def handle(self, *args, **options):
+        rep = options["repeticiones"]
+
+        with bd_temporal():
+            self.stdout.write("Sembrando colegio sintético...")
+            resumen = sembrar_colegio(
+                cursos=options["cursos"],
+                alumnos_por_curso=options["alumnos_por_curso"],
+                actividades=options["actividades"],
+            )
+            self.stdout.write(", ".join(
+                f"{k}={v}" for k, v in resumen.items() if not k.endswith("_ejemplo")
+            ))
+
+            alumno = Usuario.objects.get(pk=resumen["alumno_ejemplo"])
+            asign = AsignacionActividad.objects.filter(estudiante_id=alumno.pk).select_related("actividad").first()
+            self._abrir_intentos(asign)
+            datos = {
+                "alumno": alumno.pk,
+                "actividad": asign.actividad_id if asign else 0,
+                "asignatura": asign.actividad.asignatura_id if asign else 0,
+                "perfil": PerfilGamificacion.objects.get(usuario=alumno).pk,
+            }
+            cliente = cliente_de(alumno)
+
+            def medir_todo():
+                res = {}
+                for nombre, _, _, construir in CONSULTAS:
+                    qs = construir(datos)
+                    res[nombre] = (qs.explain(), medir(lambda: list(construir(datos)), rep))
+                for vista in VISTAS:
+                    url = reverse(vista)
+                    res[vista] = (None, medir(lambda: cliente.get(url), max(3, rep // 5)))
+                return res
+
+            con = medir_todo()
+            self._indices("remove_index")
+            sin = medir_todo()
+            self._indices("add_index")
+
+        self.stdout.write("")
+        self.stdout.write(f"{'consulta / vista':<28}{'sin p50':>10}{'con p50':>10}{'sin p95':>10}{'con p95':>10}{'queries':>9}")
+        for nombre in list(con):
+            a, b = sin[nombre][1], con[nombre][1]
+            self.stdout.write(
+                f"{nombre:<28}{a['p50_ms']:>10.2f}{b['p50_ms']:>10.2f}"
+                f"{a['p95_ms']:>10.2f}{b['p95_ms']:>10.2f}{b['consultas']:>9}"
+            )
+        self.stdout.write("")
+        for nombre, *_ in CONSULTAS:
+            self.stdout.write(self.style.MIGRATE_HEADING(nombre))
+            self.stdout.write(f"  sin: {sin[nombre][0]}")
+            self.stdout.write(f"  con: {con[nombre][0]}")
+
+    def _abrir_intentos(self, asign):
+        """
+        La siembra deja todos los intentos finalizados: sin filas en el
+        índice parcial, ANALYZE no le da estadísticas y SQLite sigue usando
+        el de unique_together. Se abre un segundo intento en ~1 de cada 10
+        (y en el del ejemplo), como en un colegio en plena clase.
+        """
+        finalizados = Submission.objects.filter(finalizado=True, intento=1).annotate(par=F("pk") % 10)
+        abiertos = [
+            Submission(actividad_id=a, estudiante_id=e, intento=2)
+            for a, e in finalizados.filter(par=0).values_list("actividad_id", "estudiante_id")
+        ]
+        Submission.objects.bulk_create(abiertos, batch_size=1000)
+        if asign is not None:
+            del_ejemplo = Submission.objects.filter(actividad_id=asign.actividad_id, estudiante_id=asign.estudiante_id)
+            if not del_ejemplo.filter(finalizado=False).exists():
+                Submission.objects.create(
+                    actividad_id=asign.actividad_id, estudiante_id=asign.estudiante_id,
+                    intento=del_ejemplo.count() + 1,
+                )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def _indices(self, operacion):
+        with connection.schema_editor() as editor:
+            for _, modelo, nombre_indice, _ in CONSULTAS:
+                # Índice o restricción única parcial (intento abierto)
+                indice = next(
+                    (i for i in modelo._meta.indexes if i.name == nombre_indice), None
+                )
+                if indice is not None:
+                    getattr(editor, operacion)(modelo, indice)
+                else:
+                    restriccion = next(c for c in modelo._meta.constraints if c.name == nombre_indice)
+                    getattr(editor, operacion.replace("index", "constraint"))(modelo, restriccion)
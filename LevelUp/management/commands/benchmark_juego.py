@@ -0,0 +1,119 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from LevelUp.benchmark import bd_temporal, recorrer_colegio, sembrar_colegio
+
+
+class Command(BaseCommand):
+    help = (
+        "Siembra un colegio sintético en una BD temporal y recorre el ciclo de juego "
+        "del estudiante con el Client de Django (lista, play, respuestas, cierre, "
+        "resultados, ranking), informando percentiles de latencia y consultas por endpoint. "
+        "Con --comparar sirve de control de regresiones (sale con error si empeora)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cursos", type=int, default=12)
+        parser.add_argument("--alumnos-por-curso", type=int, default=35)
+        parser.add_argument("--actividades", type=int, default=120)
+        parser.add_argument("--items", type=int, default=6, help="Ítems por actividad")
+        parser.add_argument("--jugadores", type=int, default=25)
+        parser.add_argument("--partidas", type=int, default=2, help="Actividades jugadas por jugador")
+        parser.add_argument("--semilla", type=int, default=1)
+        parser.add_argument("--guardar", metavar="ARCHIVO", help="Guarda el resumen como línea base (JSON)")
+        parser.add_argument("--comparar", metavar="ARCHIVO", help="Línea base contra la que comparar")
+        parser.add_argument(
+            "--tolerancia",
+            type=float,
+            default=0.5,
+            help="Aumento relativo de p95 admitido frente a la línea base (0.5 = +50%%)",
+        )
+
+    def handle(self, *args, **options):
+        parametros = {
+            k: options[k]
+            for k in ("cursos", "alumnos_por_curso", "actividades", "items", "jugadores", "partidas", "semilla")
+        }
+
+        with bd_temporal():
+            inicio = time.perf_counter()
+            colegio = sembrar_colegio(
+                cursos=options["cursos"],
+                alumnos_por_curso=options["alumnos_por_curso"],
+                actividades=options["actividades"],
+                items_por_actividad=options["items"],
+                semilla=options["semilla"],
+            )
+            self.stdout.write(
+                ", ".join(f"{k}={v}" for k, v in colegio.items() if not k.endswith("_ejemplo"))
+                + f" ({time.perf_counter() - inicio:.1f}s)"
+            )
+            recorrido = recorrer_colegio(
+                jugadores=options["jugadores"],
+                partidas_por_jugador=options["partidas"],
+                semilla=options["semilla"],
+            )
+
+        resumen = recorrido.resumen()
+        self._tabla(resumen)
+
+        if options["guardar"]:
+            with open(options["guardar"], "w", encoding="utf-8") as f:
+                json.dump({"parametros": parametros, "endpoints": resumen}, f, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Línea base guardada en {options['guardar']}")
+
+        problemas = [f"{endpoint}: {error}" for endpoint, error in recorrido.errores]
+        if options["comparar"]:
+            problemas += self._comparar(resumen, parametros, options["comparar"], options["tolerancia"])
+
+        if problemas:
+            raise CommandError("Regresiones:\n  " + "\n  ".join(problemas))
+        self.stdout.write(self.style.SUCCESS("Sin regresiones."))
+
+    def _tabla(self, resumen):
+        self.stdout.write("")
+        self.stdout.write(
+            f"{'endpoint':<22}{'llamadas':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'máx':>9}{'queries':>9}"
+        )
+        for endpoint, r in resumen.items():
+            self.stdout.write(
+                f"{endpoint:<22}{r['llamadas']:>9}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+                f"{r['p99_ms']:>9.2f}{r['max_ms']:>9.2f}{r['consultas_max']:>9}"
+            )
+        self.stdout.write("")
+
+    def _comparar(self, resumen, parametros, archivo, tolerancia) -> list:
+        """
+        Las consultas deben ser las mismas o menos (son deterministas con la
+        misma semilla); la latencia p95 admite `tolerancia` por ruido.
+        """
+        try:
+            with open(archivo, encoding="utf-8") as f:
+                base = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"No se pudo leer la línea base {archivo}: {e}")
+
+        if base.get("parametros") != parametros:
+            self.stderr.write(self.style.WARNING(
+                "La línea base se tomó con otros parámetros; la comparación es orientativa."
+            ))
+
+        problemas = []
+        for endpoint, anterior in base.get("endpoints", {}).items():
+            actual = resumen.get(endpoint)
+            if actual is None:
+                problemas.append(f"{endpoint}: no se midió")
+                continue
+            if actual["consultas_max"] > anterior["consultas_max"]:
+                problemas.append(
+                    f"{endpoint}: {actual['consultas_max']} consultas (antes {anterior['consultas_max']})"
+                )
+            limite = anterior["p95_ms"] * (1 + tolerancia)
+            if actual["p95_ms"] > limite:
+                problemas.append(
+                    f"{endpoint}: p95 {actual['p95_ms']:.2f} ms (antes {anterior['p95_ms']:.2f}, "
+                    f"límite {limite:.2f})"
+                )
+        return problemas
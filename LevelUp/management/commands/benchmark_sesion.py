@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from LevelUp.benchmark import bd_temporal, escrituras_por_get, sembrar_colegio
+from LevelUp.models import Usuario
+
+
+class Command(BaseCommand):
+    help = (
+        "Siembra un colegio pequeño en una BD temporal, recorre con un estudiante las "
+        "páginas GET de uso diario e informa cuántas escrituras hace cada una (y cuántas "
+        "son de la sesión). Con --estricto sale con error si algún GET escribe en la BD."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rondas", type=int, default=3)
+        parser.add_argument("--estricto", action="store_true")
+
+    def handle(self, *args, **options):
+        with bd_temporal():
+            colegio = sembrar_colegio(cursos=2, alumnos_por_curso=10, actividades=20)
+            usuario = Usuario.objects.get(pk=colegio["alumno_ejemplo"])
+            resultado = escrituras_por_get(usuario, rondas=options["rondas"])
+
+        self.stdout.write(f"{'paso':<22}{'llamadas':>9}{'escrituras':>12}{'sesión':>9}")
+        for paso, r in resultado.items():
+            self.stdout.write(f"{paso:<22}{r['llamadas']:>9}{r['escrituras']:>12}{r['sesion']:>9}")
+
+        total = sum(r["escrituras"] for r in resultado.values())
+        llamadas = sum(r["llamadas"] for r in resultado.values())
+        self.stdout.write(f"\n{total / llamadas:.2f} escrituras por GET ({total} en {llamadas}).")
+        if options["estricto"] and total:
+            raise CommandError("Hay GET que escriben en la BD.")
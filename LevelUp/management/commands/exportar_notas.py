@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from LevelUp.exportacion import FORMATOS, exportar
+from LevelUp.models import Actividad, Curso
+
+
+class Command(BaseCommand):
+    help = (
+        "Escribe a disco el libro de notas (estudiantes × actividades) de un curso y/o "
+        "una actividad, en CSV o XLSX, por trozos (para tareas programadas)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--curso", type=int)
+        parser.add_argument("--actividad", type=int)
+        parser.add_argument("--formato", choices=sorted(FORMATOS), default="xlsx")
+        parser.add_argument("--salida", metavar="ARCHIVO", help="Por defecto notas-<curso|actividad>-<fecha>.<formato>")
+
+    def handle(self, *args, **options):
+        curso_id, actividad_id, formato = options["curso"], options["actividad"], options["formato"]
+        if curso_id is None and actividad_id is None:
+            raise CommandError("Indica --curso y/o --actividad")
+        if curso_id is not None and not Curso.objects.filter(pk=curso_id).exists():
+            raise CommandError(f"No existe el curso {curso_id}")
+        if actividad_id is not None and not Actividad.objects.filter(pk=actividad_id).exists():
+            raise CommandError(f"No existe la actividad {actividad_id}")
+
+        sufijo = f"curso{curso_id}" if curso_id is not None else f"actividad{actividad_id}"
+        salida = options["salida"] or f"notas-{sufijo}-{timezone.localdate():%Y%m%d}.{formato}"
+
+        inicio = time.perf_counter()
+        escritos = 0
+        with open(salida, "wb") as f:
+            for trozo in exportar(formato, curso_id=curso_id, actividad_id=actividad_id):
+                f.write(trozo)
+                escritos += len(trozo)
+        self.stdout.write(self.style.SUCCESS(
+            f"{salida}: {escritos} bytes en {time.perf_counter() - inicio:.2f}s."
+        ))
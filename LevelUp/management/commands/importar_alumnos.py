@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from LevelUp.importacion import TAM_LOTE, importar_alumnos
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea alumnos (usuario, perfil, gamificación y matrícula) desde una nómina CSV "
+        "con columnas rut, nombres, apellidos, email, curso y, opcional, password. "
+        "Las filas con errores se informan y el resto se importa."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta del CSV (UTF-8, separado por , o ;)")
+        parser.add_argument("--password-inicial", help="Contraseña para las filas sin columna password")
+        parser.add_argument("--procesos", type=int, help="Procesos para hashear (por defecto, uno por CPU)")
+        parser.add_argument("--lote", type=int, default=TAM_LOTE)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["archivo"], "rb") as f:
+                contenido = f.read()
+        except OSError as e:
+            raise CommandError(f"No se pudo leer {options['archivo']}: {e}")
+        try:
+            contenido = contenido.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise CommandError("El archivo debe estar en UTF-8.")
+
+        inicio = time.perf_counter()
+        res = importar_alumnos(
+            contenido,
+            password_inicial=options["password_inicial"],
+            procesos=options["procesos"],
+            tam_lote=options["lote"],
+        )
+        for linea, mensaje in res.errores:
+            self.stderr.write(f"línea {linea}: {mensaje}")
+        estilo = self.style.SUCCESS if not res.errores else self.style.WARNING
+        self.stdout.write(estilo(
+            f"{res.creados} de {res.filas} alumno(s) creados, {len(res.errores)} error(es), "
+            f"en {time.perf_counter() - inicio:.2f}s."
+        ))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from LevelUp.idempotencia import purgar_vencidas
+from LevelUp.tareas import procesar_pendientes, purgar_hechas
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de la cola de tareas de gamificación (LevelUp/tareas.py). "
+        "Usar con LEVELUP_TAREAS_MODO=worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--una-vez", action="store_true", help="Vacía la cola y termina")
+        parser.add_argument("--intervalo", type=float, default=1.0, help="Segundos entre sondeos con la cola vacía")
+        parser.add_argument("--lote", type=int, default=100, help="Tareas por pasada")
+        parser.add_argument(
+            "--purgar-dias",
+            type=int,
+            default=None,
+            help=(
+                "Borra las tareas hechas hace más de N días (sus claves dejan de deduplicar) "
+                "y las claves de idempotencia vencidas"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["purgar_dias"] is not None:
+            n = purgar_hechas(options["purgar_dias"])
+            self.stdout.write(f"{n} tarea(s) hecha(s) purgada(s).")
+            n = purgar_vencidas()
+            self.stdout.write(f"{n} clave(s) de idempotencia vencida(s) purgada(s).")
+
+        total = 0
+        try:
+            while True:
+                close_old_connections()
+                n = procesar_pendientes(limite=options["lote"])
+                total += n
+                if n < options["lote"]:
+                    if options["una_vez"]:
+                        break
+                    time.sleep(options["intervalo"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"{total} tarea(s) procesada(s)."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from LevelUp.tableros import reconciliar
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los resúmenes de los tableros (global, por docente y por actividad) "
+        "desde las tablas de origen. Pensado para ejecutarse periódicamente (cron)."
+    )
+
+    def handle(self, *args, **options):
+        res = reconciliar()
+        self.stdout.write(self.style.SUCCESS(
+            f"Resúmenes recalculados: {res['actividades']} actividad(es), {res['docentes']} docente(s)."
+        ))
@@ -0,0 +1,260 @@
+"""
+Mapas Tiled de las misiones, compilados y cacheados.
+
+- Mapa base: se lee de static y se corrigen las rutas de tilesets /
+  imágenes UNA vez por proceso; se recarga si cambia el mtime del archivo.
+- Mapa por actividad (preguntas inyectadas + qid de enemigos): se
+  serializa a bytes y se guarda en la caché de Django con clave
+  (actividad, version_contenido, mtime del base). version_contenido cambia
+  al guardar la actividad o sus ítems, así que nunca se sirve un mapa viejo.
+
+misiones_mapa solo resuelve la clave y responde los bytes con ETag.
+"""
+import copy
+import hashlib
+import json
+import os
+import threading
+
+from django.contrib.staticfiles import finders
+from django.core.cache import cache
+from django.templatetags.static import static
+
+MAPA_VACIO = {"name": "default", "questions": []}
+
+# Segundos en caché del mapa compilado por actividad (la clave ya versiona)
+TTL_MAPA_ACTIVIDAD = 60 * 60 * 24
+
+
+# --------------------------------------------------------------------
+# Corrección de rutas
+# --------------------------------------------------------------------
+
+def _fix_tileset_sources(map_data):
+    """
+    Ajusta los 'source' de los tilesets para que apunten a STATIC,
+    por ejemplo: /static/LevelUp/tilesets/bloques.xml
+    """
+    try:
+        tilesets = map_data.get("tilesets") or []
+    except AttributeError:
+        return map_data
+
+    for ts in tilesets:
+        source = (ts.get("source") or "").strip()
+        if not source:
+            continue
+
+        if source.startswith("http://") or source.startswith("https://") or source.startswith("/static/"):
+            continue
+
+        filename = source.split("/")[-1]
+
+        # Construir ruta estática absoluta
+        ts["source"] = static(f"LevelUp/tilesets/{filename}")
+
+    return map_data
+
+
+def _fix_image_layers(map_data):
+    """
+    Ajusta las 'image' de las capas tipo 'imagelayer'
+    para que apunten a /static/LevelUp/img/images_tiled/*.png
+    en vez de rutas relativas como 'img/images_tiled/...'
+    """
+    try:
+        layers = map_data.get("layers") or []
+    except AttributeError:
+        return map_data
+
+    for layer in layers:
+        if not isinstance(layer, dict):
+            continue
+
+        if layer.get("type") != "imagelayer":
+            continue
+
+        img = (layer.get("image") or "").strip()
+        if not img:
+            continue
+
+        if img.startswith("/static/") or img.startswith("http://") or img.startswith("https://"):
+            continue
+
+        filename = img.split("/")[-1]
+
+        # Construir ruta estática absoluta
+        layer["image"] = static(f"LevelUp/img/images_tiled/{filename}")
+
+    return map_data
+
+
+def resumen_mapa(map_data):
+    """Capas, tilesets e imágenes de fondo de un mapa Tiled (para diagnóstico)."""
+    layers = [l for l in map_data.get("layers", []) if isinstance(l, dict)]
+    return {
+        "capas": [l.get("name") for l in layers],
+        "tilesets": [ts.get("source") for ts in map_data.get("tilesets", []) if isinstance(ts, dict)],
+        "imagelayers": [l.get("image") for l in layers if l.get("type") == "imagelayer"],
+    }
+
+
+# --------------------------------------------------------------------
+# Mapa base (por proceso, recarga por mtime)
+# --------------------------------------------------------------------
+
+_bases = {}
+_bases_lock = threading.Lock()
+
+
+def mapa_base(path):
+    """
+    (mapa, mtime) del archivo static `path` con rutas ya corregidas.
+    El dict es compartido: no modificarlo (copiar antes).
+    """
+    real = finders.find(path)
+    try:
+        mtime = os.stat(real).st_mtime if real else None
+    except OSError:
+        mtime = None
+
+    cacheado = _bases.get(path)
+    if cacheado and cacheado[1] == mtime:
+        return cacheado
+
+    mapa = MAPA_VACIO
+    if real:
+        try:
+            with open(real, "r", encoding="utf-8") as f:
+                mapa = json.load(f)
+        except Exception:
+            mapa = MAPA_VACIO
+    mapa = _fix_image_layers(_fix_tileset_sources(copy.deepcopy(mapa)))
+
+    with _bases_lock:
+        _bases[path] = (mapa, mtime)
+    return _bases[path]
+
+
+# --------------------------------------------------------------------
+# Preguntas de la actividad
+# --------------------------------------------------------------------
+
+def _opciones_validas(opts, ans):
+    if not opts or len(opts) < 2:
+        opts = ["Opción 1", "Opción 2"]
+    if not isinstance(ans, int) or ans < 0 or ans >= len(opts):
+        ans = 0
+    return opts, ans
+
+
+def preguntas_de_items(items):
+    """
+    Normaliza ItemActividad(tipo='game') al formato trivia del motor:
+    [{id, item_pk, kind, questions: [{q, options, correct}], q, options, correct}]
+    con id secuencial 1..N (para mapear al qid de los enemigos).
+    """
+    questions = []
+
+    for it in items:
+        datos = it.datos or {}
+        kind = str(datos.get("kind") or "").lower()
+
+        # Paquete de preguntas normalizado
+        paquetes = []
+
+        # ====== TRIVIA con lista "questions" ======
+        if kind == "trivia" and isinstance(datos.get("questions"), list) and datos["questions"]:
+            for sub in datos["questions"]:
+                sub = sub or {}
+                qtxt = (sub.get("q") or it.enunciado or "Pregunta").strip()
+                opts, ans = _opciones_validas(
+                    list(sub.get("opts") or sub.get("options") or []), sub.get("ans", 0),
+                )
+                paquetes.append({"q": qtxt, "options": opts, "correct": ans})
+
+        # ====== TRIVIA "plana" ======
+        elif kind == "trivia":
+            qtxt = (datos.get("question") or it.enunciado or "Pregunta").strip()
+            opts, ans = _opciones_validas(list(datos.get("options") or []), datos.get("answer", 0))
+            paquetes.append({"q": qtxt, "options": opts, "correct": ans})
+
+        # ====== FALLBACK genérico ======
+        else:
+            paquetes.append({
+                "q": it.enunciado or "¿Pregunta?",
+                "options": ["Opción A", "Opción B", "Opción C"],
+                "correct": 1,
+            })
+
+        first = paquetes[0]
+
+        questions.append({
+            "id": len(questions) + 1,
+            "item_pk": it.pk,
+            "kind": "trivia",
+            "questions": paquetes,      # todas las sub-preguntas
+            "q": first["q"],            # compatibilidad: una sola
+            "options": first["options"],
+            "correct": first["correct"],
+        })
+
+    return questions
+
+
+def _asignar_qids(mapa):
+    """Auto-asigna qid 1..N a los enemigos que no lo traen."""
+    idx = 1
+    for layer in mapa.get("layers", []) or []:
+        if not isinstance(layer, dict) or layer.get("type") != "objectgroup":
+            continue
+        for obj in layer.get("objects", []) or []:
+            if not isinstance(obj, dict):
+                continue
+            name = (obj.get("name") or "").lower()
+            if name != "enemy":
+                continue
+            props_list = obj.get("properties") or []
+            has_qid = any(p.get("name") == "qid" for p in props_list if isinstance(p, dict))
+            if not has_qid:
+                props_list.append({"name": "qid", "type": "int", "value": idx})
+                obj["properties"] = props_list
+                idx += 1
+    return mapa
+
+
+# --------------------------------------------------------------------
+# Mapas compilados
+# --------------------------------------------------------------------
+
+def _compilar(mapa):
+    contenido = json.dumps(mapa, ensure_ascii=False).encode("utf-8")
+    etag = '"%s"' % hashlib.sha1(contenido).hexdigest()
+    return contenido, etag
+
+
+def mapa_compilado(path, actividad=None):
+    """
+    (bytes JSON, etag) del mapa `path`, con las preguntas de `actividad`
+    si viene. Solo se recompila cuando cambia la clave de caché.
+    """
+    base, mtime = mapa_base(path)
+
+    if actividad is None:
+        clave = f"levelup:mapa:{path}:{mtime}"
+        compilado = cache.get(clave)
+        if compilado is None:
+            compilado = _compilar(base)
+            cache.set(clave, compilado, None)
+        return compilado
+
+    clave = f"levelup:mapa:{path}:{mtime}:act{actividad.pk}:{actividad.version_contenido}"
+    compilado = cache.get(clave)
+    if compilado is None:
+        items = actividad.items.filter(tipo__iexact="game").order_by("orden", "id")
+        mapa = copy.deepcopy(base)
+        mapa["questions"] = preguntas_de_items(items)
+        mapa["actividad_id"] = actividad.pk
+        compilado = _compilar(_asignar_qids(mapa))
+        cache.set(clave, compilado, TTL_MAPA_ACTIVIDAD)
+    return compilado
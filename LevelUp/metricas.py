@@ -0,0 +1,179 @@
+"""
+Métricas por vista: tiempo total, número de consultas y tiempo en BD.
+
+MetricasVistaMiddleware mide cada petición y la acumula en un almacén en
+memoria del proceso (ventana de las últimas N muestras por vista), que el
+portal de administrador muestra como p50/p95/p99 en la sección de salud.
+
+Configuración (settings):
+- LEVELUP_PRESUPUESTO_CONSULTAS: máximo de consultas por petición (30).
+- LEVELUP_PRESUPUESTO_CONSULTAS_VISTA: {"nombre_url": máximo} por vista.
+- LEVELUP_PRESUPUESTO_ESTRICTO: si True, exceder el presupuesto lanza
+  PresupuestoConsultasExcedido (para tests/CI); si no, solo se registra.
+- LEVELUP_METRICAS_VENTANA: muestras guardadas por vista (500).
+
+Con DEBUG se agregan los encabezados X-View-Time-ms, X-DB-Queries y
+X-DB-Time-ms a cada respuesta.
+"""
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import connection
+
+from .diagnostico import obtener_logger
+
+log = obtener_logger(__name__)
+
+PRESUPUESTO_POR_DEFECTO = 30
+VENTANA_POR_DEFECTO = 500
+
+
+class PresupuestoConsultasExcedido(Exception):
+    pass
+
+
+# --------------------------------------------------------------------
+# Almacén en memoria
+# --------------------------------------------------------------------
+
+def _percentil(ordenados, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not ordenados:
+        return 0
+    k = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[k]
+
+
+class AlmacenMetricas:
+    """
+    Últimas muestras (duracion_ms, consultas, db_ms) por vista. Seguro
+    entre hilos; cada proceso de gunicorn tiene el suyo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._muestras = {}
+        self._excedidas = {}
+
+    def registrar(self, vista, duracion_ms, consultas, db_ms, excedida=False):
+        ventana = getattr(settings, "LEVELUP_METRICAS_VENTANA", VENTANA_POR_DEFECTO)
+        with self._lock:
+            muestras = self._muestras.get(vista)
+            if muestras is None or muestras.maxlen != ventana:
+                muestras = self._muestras[vista] = deque(muestras or (), maxlen=ventana)
+            muestras.append((duracion_ms, consultas, db_ms))
+            if excedida:
+                self._excedidas[vista] = self._excedidas.get(vista, 0) + 1
+
+    def resumen(self, limite=None):
+        """
+        [{vista, n, p50_ms, p95_ms, p99_ms, consultas_p50, consultas_max,
+          db_p95_ms, excedidas}] ordenado por p95 descendente.
+        """
+        with self._lock:
+            copia = {v: list(m) for v, m in self._muestras.items()}
+            excedidas = dict(self._excedidas)
+
+        filas = []
+        for vista, muestras in copia.items():
+            duraciones = sorted(m[0] for m in muestras)
+            consultas = sorted(m[1] for m in muestras)
+            db = sorted(m[2] for m in muestras)
+            filas.append({
+                "vista": vista,
+                "n": len(muestras),
+                "p50_ms": _percentil(duraciones, 50),
+                "p95_ms": _percentil(duraciones, 95),
+                "p99_ms": _percentil(duraciones, 99),
+                "consultas_p50": _percentil(consultas, 50),
+                "consultas_max": consultas[-1],
+                "db_p95_ms": _percentil(db, 95),
+                "excedidas": excedidas.get(vista, 0),
+            })
+        filas.sort(key=lambda f: f["p95_ms"], reverse=True)
+        return filas[:limite] if limite else filas
+
+    def limpiar(self):
+        with self._lock:
+            self._muestras.clear()
+            self._excedidas.clear()
+
+
+metricas = AlmacenMetricas()
+
+
+def presupuesto_para(vista):
+    por_vista = getattr(settings, "LEVELUP_PRESUPUESTO_CONSULTAS_VISTA", None) or {}
+    if vista in por_vista:
+        return por_vista[vista]
+    return getattr(settings, "LEVELUP_PRESUPUESTO_CONSULTAS", PRESUPUESTO_POR_DEFECTO)
+
+
+# --------------------------------------------------------------------
+# Middleware
+# --------------------------------------------------------------------
+
+class _ContadorConsultas:
+    """execute_wrapper que cuenta consultas y acumula su tiempo."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+def _nombre_vista(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "(sin ruta)"
+    return match.view_name or match._func_path
+
+
+class MetricasVistaMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        contador = _ContadorConsultas()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(contador):
+            response = self.get_response(request)
+        duracion_ms = round((time.perf_counter() - inicio) * 1000, 2)
+        db_ms = round(contador.segundos * 1000, 2)
+
+        vista = _nombre_vista(request)
+        presupuesto = presupuesto_para(vista)
+        excedida = contador.consultas > presupuesto
+
+        metricas.registrar(vista, duracion_ms, contador.consultas, db_ms, excedida)
+
+        if settings.DEBUG:
+            response["X-View-Time-ms"] = str(duracion_ms)
+            response["X-DB-Queries"] = str(contador.consultas)
+            response["X-DB-Time-ms"] = str(db_ms)
+
+        if excedida:
+            log.warning(
+                "presupuesto_consultas_excedido",
+                vista=vista,
+                consultas=contador.consultas,
+                presupuesto=presupuesto,
+                duracion_ms=duracion_ms,
+            )
+            if getattr(settings, "LEVELUP_PRESUPUESTO_ESTRICTO", False):
+                raise PresupuestoConsultasExcedido(
+                    f"{vista}: {contador.consultas} consultas (presupuesto {presupuesto})"
+                )
+
+        return response
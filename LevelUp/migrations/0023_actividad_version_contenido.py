@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LevelUp', '0022_remove_actividad_recompensa_remove_actividad_recurso_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actividad',
+            name='version_contenido',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:23
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def poblar_resumen_intentos(apps, schema_editor):
+    AsignacionActividad = apps.get_model("LevelUp", "AsignacionActividad")
+    Submission = apps.get_model("LevelUp", "Submission")
+
+    resumen = {
+        (r["estudiante_id"], r["actividad_id"]): r
+        for r in (
+            Submission.objects
+            .values("estudiante_id", "actividad_id")
+            .annotate(
+                usados=Count("id"),
+                abiertos=Count("id", filter=Q(finalizado=False)),
+                finalizados=Count("id", filter=Q(finalizado=True)),
+                mejor=Max("calificacion", filter=Q(finalizado=True)),
+            )
+        )
+    }
+
+    cambios = []
+    for asign in AsignacionActividad.objects.only("id", "estudiante_id", "actividad_id").iterator(chunk_size=2000):
+        r = resumen.get((asign.estudiante_id, asign.actividad_id))
+        if not r:
+            continue
+        asign.intentos_usados = r["usados"]
+        asign.intentos_abiertos = r["abiertos"]
+        asign.intentos_finalizados = r["finalizados"]
+        asign.mejor_calificacion = r["mejor"]
+        cambios.append(asign)
+
+    AsignacionActividad.objects.bulk_update(
+        cambios,
+        ["intentos_usados", "intentos_abiertos", "intentos_finalizados", "mejor_calificacion"],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LevelUp', '0023_actividad_version_contenido'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asignacionactividad',
+            name='intentos_abiertos',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='asignacionactividad',
+            name='intentos_finalizados',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='asignacionactividad',
+            name='intentos_usados',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='asignacionactividad',
+            name='mejor_calificacion',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(poblar_resumen_intentos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LevelUp', '0024_asignacion_resumen_intentos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='resumen_resultados',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
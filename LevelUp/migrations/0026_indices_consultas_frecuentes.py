@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LevelUp', '0025_submission_resumen_resultados'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='actividad',
+            index=models.Index(condition=models.Q(('es_publicada', True)), fields=['asignatura', '-fecha_publicacion'], name='act_publicadas_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asignacionactividad',
+            index=models.Index(fields=['actividad', 'estado'], name='asig_act_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(('finalizado', False)), fields=['actividad', 'estudiante', '-intento'], name='sub_abierto_idx'),
+        ),
+    ]
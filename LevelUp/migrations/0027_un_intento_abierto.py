@@ -0,0 +1,81 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:50
+
+from django.db import migrations, models
+from django.db.models import Count, FloatField, IntegerField, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def cerrar_abiertos_duplicados(apps, schema_editor):
+    """
+    Antes de la restricción: si un (actividad, estudiante) tiene varios
+    intentos abiertos, queda abierto el más alto. Los demás se borran si
+    no tienen respuestas y, si las tienen, se dan por finalizados (con
+    enviado_en = su última respuesta).
+
+    Sin señales en los modelos históricos: al final se recalcula el resumen
+    de intentos de las asignaciones tocadas (igual que
+    signals.sincronizar_intentos).
+    """
+    Submission = apps.get_model("LevelUp", "Submission")
+    AsignacionActividad = apps.get_model("LevelUp", "AsignacionActividad")
+
+    duplicados = (
+        Submission.objects
+        .filter(finalizado=False)
+        .values("actividad_id", "estudiante_id")
+        .annotate(n=Count("id"))
+        .filter(n__gt=1)
+    )
+    tocados = []
+    for par in duplicados:
+        abiertos = list(
+            Submission.objects
+            .filter(actividad_id=par["actividad_id"], estudiante_id=par["estudiante_id"], finalizado=False)
+            .annotate(respondidas=Count("answers"), ultima=Max("answers__respondido_en"))
+            .order_by("-intento")
+        )
+        sobrantes = abiertos[1:]
+        Submission.objects.filter(pk__in=[s.pk for s in sobrantes if not s.respondidas]).delete()
+        for s in sobrantes:
+            if s.respondidas:
+                Submission.objects.filter(pk=s.pk).update(finalizado=True, enviado_en=s.enviado_en or s.ultima)
+        tocados.append(Q(actividad_id=par["actividad_id"], estudiante_id=par["estudiante_id"]))
+
+    def agregado(expr, output_field, filtro=Q()):
+        return Subquery(
+            Submission.objects
+            .filter(estudiante_id=OuterRef("estudiante_id"), actividad_id=OuterRef("actividad_id"))
+            .filter(filtro)
+            .values("estudiante_id")
+            .annotate(v=expr)
+            .values("v")[:1],
+            output_field=output_field,
+        )
+
+    contar = lambda filtro=Q(): Coalesce(agregado(Count("id"), IntegerField(), filtro), 0)
+    for par in tocados:
+        AsignacionActividad.objects.filter(par).update(
+            intentos_usados=contar(),
+            intentos_abiertos=contar(Q(finalizado=False)),
+            intentos_finalizados=contar(Q(finalizado=True)),
+            mejor_calificacion=agregado(Max("calificacion"), FloatField(), Q(finalizado=True)),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LevelUp', '0026_indices_consultas_frecuentes'),
+    ]
+
+    operations = [
+        migrations.RunPython(cerrar_abiertos_duplicados, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='submission',
+            name='sub_abierto_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='submission',
+            constraint=models.UniqueConstraint(condition=models.Q(('finalizado', False)), fields=('actividad', 'estudiante'), name='sub_un_abierto'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:55
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LevelUp', '0027_un_intento_abierto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=50)),
+                ('clave', models.CharField(max_length=120, unique=True)),
+                ('datos', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('hecha', 'Hecha'), ('fallida', 'Fallida')], default='pendiente', max_length=10)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('creada_en', models.DateTimeField(auto_now_add=True)),
+                ('disponible_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('terminada_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('estado', 'pendiente')), fields=['disponible_en', 'id'], name='tarea_pendiente_idx')],
+            },
+        ),
+    ]
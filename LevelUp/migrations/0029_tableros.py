@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LevelUp', '0028_cola_tareas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenActividad',
+            fields=[
+                ('actividad', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen', serialize=False, to='LevelUp.actividad')),
+                ('asignados', models.PositiveIntegerField(default=0)),
+                ('en_progreso', models.PositiveIntegerField(default=0)),
+                ('completados', models.PositiveIntegerField(default=0)),
+                ('promedio_nota', models.FloatField(blank=True, null=True)),
+                ('ultima_entrega', models.DateTimeField(blank=True, null=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumenDocente',
+            fields=[
+                ('docente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen', serialize=False, to='LevelUp.docente')),
+                ('total_actividades', models.PositiveIntegerField(default=0)),
+                ('total_estudiantes', models.PositiveIntegerField(default=0)),
+                ('eventos', models.JSONField(blank=True, default=list)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumenGlobal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alumnos', models.PositiveIntegerField(default=0)),
+                ('profesores', models.PositiveIntegerField(default=0)),
+                ('cursos', models.PositiveIntegerField(default=0)),
+                ('asignaturas', models.PositiveIntegerField(default=0)),
+                ('estudiantes', models.PositiveIntegerField(default=0)),
+                ('actividades', models.PositiveIntegerField(default=0)),
+                ('generacion', models.PositiveIntegerField(default=1)),
+                ('calculada', models.PositiveIntegerField(default=0)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
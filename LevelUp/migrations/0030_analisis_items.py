@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LevelUp', '0029_tableros'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalisisActividad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alumnos', models.PositiveIntegerField(default=0)),
+                ('respuestas', models.PositiveIntegerField(default=0)),
+                ('confiabilidad', models.FloatField(blank=True, help_text='Alfa de Cronbach', null=True)),
+                ('ultima_entrega', models.DateTimeField(blank=True, null=True)),
+                ('version_contenido', models.CharField(blank=True, max_length=32)),
+                ('calculado_en', models.DateTimeField(auto_now=True)),
+                ('actividad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analisis', to='LevelUp.actividad')),
+                ('curso', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='LevelUp.curso')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AnalisisItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('respuestas', models.PositiveIntegerField(default=0)),
+                ('p_valor', models.FloatField(blank=True, null=True)),
+                ('discriminacion', models.FloatField(blank=True, null=True)),
+                ('distractores', models.JSONField(blank=True, default=list)),
+                ('analisis', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='LevelUp.analisisactividad')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='LevelUp.itemactividad')),
+            ],
+            options={
+                'ordering': ['analisis', 'item__orden', 'item_id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='analisisactividad',
+            constraint=models.UniqueConstraint(fields=('actividad', 'curso'), name='analisis_act_curso_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='analisisactividad',
+            constraint=models.UniqueConstraint(condition=models.Q(('curso__isnull', True)), fields=('actividad',), name='analisis_act_global_uniq'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='analisisitem',
+            unique_together={('analisis', 'item')},
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 21:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LevelUp', '0030_analisis_items'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=40, unique=True)),
+                ('huella', models.CharField(max_length=16)),
+                ('estado', models.CharField(choices=[('en_curso', 'En curso'), ('hecha', 'Hecha')], default='en_curso', max_length=10)),
+                ('status', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('tipo', models.CharField(blank=True, max_length=100)),
+                ('contenido', models.BinaryField(blank=True, default=b'')),
+                ('vence_en', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -1,8 +1,13 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+from gamificacion.curvas import nivel_estudiante
+
 from .validators import validar_formato_rut
 
 USER = settings.AUTH_USER_MODEL
@@ -86,10 +91,7 @@ class Estudiante(models.Model):
 
     def nivel_calculado(self):
         # nivel n cuando xp >= n^2 * 100
-        n = 1
-        while self.xp >= (n * n * 100):
-            n += 1
-        return max(1, n - 1)
+        return nivel_estudiante(self.xp)
 
     def add_xp(self, amount: int):
         self.xp = max(0, self.xp + int(amount))
@@ -204,6 +206,10 @@ class Actividad(models.Model):
         help_text="Número máximo de intentos por estudiante (1–1000).",
     )
 
+    # Cambia en cada guardado de la actividad o de sus ítems (ver signals);
+    # clave de caché del mapa compilado de la misión (LevelUp/mapas.py)
+    version_contenido = models.CharField(max_length=32, blank=True, editable=False)
+
     def intentos_permitidos(self):
         """None = ilimitado; si no, entero 1 - 1000"""
         return None if self.intentos_ilimitados else int(self.intentos_max or 1)
@@ -218,6 +224,16 @@ class Actividad(models.Model):
 
     class Meta:
         ordering = ["-id"]  # más nuevas primero
+        indexes = [
+            # Publicadas por asignatura, más recientes primero. Parcial: un
+            # booleano como primera columna no le sirve al planificador de
+            # SQLite (filtra con `NOT col`), la condición del índice sí.
+            models.Index(
+                fields=["asignatura", "-fecha_publicacion"],
+                condition=models.Q(es_publicada=True),
+                name="act_publicadas_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.titulo} ({self.get_dificultad_display()})"
@@ -235,7 +251,12 @@ class Actividad(models.Model):
           · Si el docente tiene exactamente 1 AsignacionDocente usa esa asignatura.
           · Si no, intenta resolver por el string `docente.asignatura` (nombre o código slug).
         - Sella `fecha_publicacion` la primera vez que se publica.
+        - Renueva `version_contenido`.
         """
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "version_contenido" in update_fields:
+            self.version_contenido = uuid.uuid4().hex
+
         # Sella fecha de publicación si aplica
         if self.es_publicada and not self.fecha_publicacion:
             from django.utils import timezone
@@ -355,13 +376,39 @@ class AsignacionActividad(models.Model):
         help_text="Si se define, reemplaza los intentos máximos de la actividad para este estudiante."
     )
 
+    # Resumen de intentos (Submission) mantenido por signals.sincronizar_intentos_asignacion
+    intentos_usados = models.PositiveIntegerField(default=0)
+    intentos_abiertos = models.PositiveIntegerField(default=0)
+    intentos_finalizados = models.PositiveIntegerField(default=0)
+    mejor_calificacion = models.FloatField(null=True, blank=True)
+
     class Meta:
         unique_together = ("estudiante", "actividad")
         ordering = ["-fecha_asignacion", "actividad_id"]
+        indexes = [
+            # Avance de una actividad (docente); (estudiante, actividad) ya
+            # lo cubre el índice único
+            models.Index(fields=["actividad", "estado"], name="asig_act_estado_idx"),
+        ]
 
     def __str__(self):
         return f"{self.estudiante.usuario.username} -> {self.actividad.titulo} ({self.get_estado_display()})"
 
+    @property
+    def intentos_max_efectivo(self) -> int:
+        """
+        Máximo de intentos para este estudiante (0 = ilimitado): el override
+        de la asignación o, si no hay, el de la actividad.
+        """
+        if self.intentos_permitidos is not None:
+            return int(self.intentos_permitidos)
+        if self.actividad.intentos_ilimitados:
+            return 0
+        try:
+            return int(self.actividad.intentos_max or 0)
+        except (TypeError, ValueError):
+            return 0
+
 
 # ---------------------------------------------------------
 # Preguntas del minijuego (editables por docente)
@@ -460,9 +507,21 @@ class Submission(models.Model):
     xp_obtenido = models.PositiveIntegerField(default=0)
     calificacion = models.FloatField(null=True, blank=True)
 
+    # Desglose de resultados ya calculado (LevelUp/resultados.py); solo intentos finalizados
+    resumen_resultados = JSONField(null=True, blank=True, editable=False)
+
     class Meta:
         unique_together = ("actividad", "estudiante", "intento")
         ordering = ["-intento", "-id"]
+        constraints = [
+            # A lo más UN intento abierto por (actividad, estudiante); el
+            # índice parcial también sirve para buscarlo (ver Actividad)
+            models.UniqueConstraint(
+                fields=["actividad", "estudiante"],
+                condition=models.Q(finalizado=False),
+                name="sub_un_abierto",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.estudiante.usuario.username} → {self.actividad.titulo}"
@@ -648,3 +707,181 @@ class ReporteProgreso(models.Model):
 
     def __str__(self):
         return f"Reporte {self.pk} - {self.estudiante.usuario.username} - {self.fecha}"
+
+
+class Tarea(models.Model):
+    """
+    Efecto diferido (recompensas / cierre de intento) en la cola local de
+    LevelUp/tareas.py. `clave` identifica el efecto (p. ej. "cierre:42"):
+    encolarlo dos veces deja una sola fila.
+    """
+    class Estado(models.TextChoices):
+        PENDIENTE = "pendiente", "Pendiente"
+        HECHA     = "hecha",     "Hecha"
+        FALLIDA   = "fallida",   "Fallida"
+
+    tipo = models.CharField(max_length=50)
+    clave = models.CharField(max_length=120, unique=True)
+    datos = JSONField(default=dict, blank=True)
+
+    estado = models.CharField(max_length=10, choices=Estado.choices, default=Estado.PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    creada_en = models.DateTimeField(auto_now_add=True)
+    disponible_en = models.DateTimeField(default=timezone.now)
+    terminada_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            # Siguiente tarea a procesar (parcial: solo las pendientes)
+            models.Index(
+                fields=["disponible_en", "id"],
+                condition=models.Q(estado="pendiente"),
+                name="tarea_pendiente_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} {self.clave} ({self.estado})"
+
+
+class ClaveIdempotencia(models.Model):
+    """
+    Registro de deduplicación de LevelUp/idempotencia.py: una fila por
+    (usuario, ruta, Idempotency-Key), compartida por todos los procesos.
+    Vencida (`vence_en`) cuenta como inexistente.
+    """
+    class Estado(models.TextChoices):
+        EN_CURSO = "en_curso", "En curso"
+        HECHA    = "hecha",    "Hecha"
+
+    clave = models.CharField(max_length=40, unique=True)   # sha1 de usuario:ruta:key
+    huella = models.CharField(max_length=16)                # sha1 del body
+    estado = models.CharField(max_length=10, choices=Estado.choices, default=Estado.EN_CURSO)
+
+    status = models.PositiveSmallIntegerField(null=True, blank=True)
+    tipo = models.CharField(max_length=100, blank=True)
+    contenido = models.BinaryField(default=b"", blank=True)
+
+    vence_en = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.clave} ({self.estado})"
+
+
+# ---------------------------------------------------------
+# Resúmenes de los tableros (LevelUp/tableros.py)
+# ---------------------------------------------------------
+class ResumenGlobal(models.Model):
+    """
+    Totales del portal admin / reportes en una sola fila (pk=1). Las
+    señales suben `generacion` al crear o borrar usuarios, cursos,
+    asignaturas o actividades; si no coincide con `calculada` los totales
+    se recalculan en la siguiente lectura.
+    """
+    alumnos = models.PositiveIntegerField(default=0)
+    profesores = models.PositiveIntegerField(default=0)
+    cursos = models.PositiveIntegerField(default=0)
+    asignaturas = models.PositiveIntegerField(default=0)
+    estudiantes = models.PositiveIntegerField(default=0)
+    actividades = models.PositiveIntegerField(default=0)
+
+    generacion = models.PositiveIntegerField(default=1)
+    calculada = models.PositiveIntegerField(default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Resumen global (gen. {self.calculada}/{self.generacion})"
+
+    @property
+    def vigente(self) -> bool:
+        return self.calculada == self.generacion
+
+
+class ResumenDocente(models.Model):
+    """
+    Portal del docente: totales y los últimos intentos finalizados en sus
+    actividades (`eventos`, lista acotada, el más reciente primero).
+    """
+    docente = models.OneToOneField(
+        Docente, on_delete=models.CASCADE, primary_key=True, related_name="resumen"
+    )
+    total_actividades = models.PositiveIntegerField(default=0)
+    total_estudiantes = models.PositiveIntegerField(default=0)
+    eventos = JSONField(default=list, blank=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Resumen de {self.docente_id}"
+
+
+class ResumenActividad(models.Model):
+    """Avance de las asignaciones de una actividad."""
+    actividad = models.OneToOneField(
+        Actividad, on_delete=models.CASCADE, primary_key=True, related_name="resumen"
+    )
+    asignados = models.PositiveIntegerField(default=0)
+    en_progreso = models.PositiveIntegerField(default=0)
+    completados = models.PositiveIntegerField(default=0)
+    promedio_nota = models.FloatField(null=True, blank=True)
+    ultima_entrega = models.DateTimeField(null=True, blank=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Resumen actividad {self.actividad_id}: {self.completados}/{self.asignados}"
+
+
+# ---------------------------------------------------------
+# Análisis de ítems (LevelUp/analitica.py)
+# ---------------------------------------------------------
+class AnalisisActividad(models.Model):
+    """
+    Último análisis de ítems de una actividad, de todos sus estudiantes
+    (curso vacío) o de los matriculados en un curso. `ultima_entrega` es
+    la marca de agua: si hay intentos finalizados más nuevos, está desfasado.
+    """
+    actividad = models.ForeignKey(Actividad, on_delete=models.CASCADE, related_name="analisis")
+    curso = models.ForeignKey("LevelUp.Curso", on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+
+    alumnos = models.PositiveIntegerField(default=0)
+    respuestas = models.PositiveIntegerField(default=0)
+    confiabilidad = models.FloatField(null=True, blank=True, help_text="Alfa de Cronbach")
+    ultima_entrega = models.DateTimeField(null=True, blank=True)
+    version_contenido = models.CharField(max_length=32, blank=True)
+    calculado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["actividad", "curso"], name="analisis_act_curso_uniq"),
+            # En SQLite / PostgreSQL los NULL no chocan en el índice único
+            models.UniqueConstraint(
+                fields=["actividad"], condition=models.Q(curso__isnull=True), name="analisis_act_global_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Análisis {self.actividad_id} ({self.curso_id or 'todos'})"
+
+
+class AnalisisItem(models.Model):
+    """
+    Estadística clásica de un ítem: `p_valor` (puntaje medio 0..1, la
+    facilidad), `discriminacion` (correlación punto-biserial ítem-resto)
+    y, para trivias, cuántas veces se eligió cada opción.
+    """
+    analisis = models.ForeignKey(AnalisisActividad, on_delete=models.CASCADE, related_name="items")
+    item = models.ForeignKey(ItemActividad, on_delete=models.CASCADE, related_name="+")
+
+    respuestas = models.PositiveIntegerField(default=0)
+    p_valor = models.FloatField(null=True, blank=True)
+    discriminacion = models.FloatField(null=True, blank=True)
+    distractores = JSONField(default=list, blank=True)
+
+    class Meta:
+        ordering = ["analisis", "item__orden", "item_id"]
+        unique_together = ("analisis", "item")
+
+    def __str__(self):
+        return f"Ítem {self.item_id}: p={self.p_valor} d={self.discriminacion}"
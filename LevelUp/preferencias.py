@@ -0,0 +1,62 @@
+"""
+Estado de interfaz del estudiante fuera de la sesión.
+
+La asignatura activa (selector del navbar y filtro de "Mis actividades")
+vivía en request.session: fijar la de por defecto en la primera visita o
+volver a elegir la misma ya costaba un UPDATE de django_session. Ahora:
+
+- Se guarda solo el slug, en una cookie firmada (no se puede alterar).
+  Nombre e icono salen del registro en memoria (LevelUp/asignaturas.py).
+- Sin cookie, la activa es la primera del registro (la misma del navbar)
+  y no se escribe nada.
+- La cookie se envía solo cuando el valor cambia.
+
+Los avisos de una sola vez tampoco pasan por la sesión: los mensajes
+flash usan CookieStorage (settings.MESSAGE_STORAGE) y los logros nuevos
+salen de RecompensaUsuario.notificada (LevelUp/context_processors.py).
+"""
+from django.conf import settings
+from django.core import signing
+from django.utils.text import slugify
+
+from .asignaturas import registro_asignaturas
+
+COOKIE_ASIGNATURA = "levelup_asignatura"
+SAL = "LevelUp.preferencias"
+DURACION = 365 * 24 * 3600
+
+
+def slug_de(asignatura) -> str:
+    return asignatura.slug or slugify(asignatura.nombre)
+
+
+def _slug_guardado(request):
+    try:
+        return request.get_signed_cookie(COOKIE_ASIGNATURA, default=None, salt=SAL)
+    except signing.BadSignature:
+        return None
+
+
+def asignatura_activa(request):
+    """Asignatura elegida (cookie) o, si no hay o ya no existe, la primera."""
+    asignatura = registro_asignaturas.por_slug(_slug_guardado(request))
+    return asignatura or registro_asignaturas.primera()
+
+
+def recordar_asignatura(request, response, asignatura) -> bool:
+    """Fija la cookie solo si cambia el valor. Devuelve si la escribió."""
+    slug = slug_de(asignatura)
+    if slug == _slug_guardado(request):
+        return False
+    response.set_signed_cookie(
+        COOKIE_ASIGNATURA, slug, salt=SAL,
+        max_age=DURACION,
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite="Lax",
+    )
+    return True
+
+
+def olvidar_preferencias(response) -> None:
+    response.delete_cookie(COOKIE_ASIGNATURA, samesite="Lax")
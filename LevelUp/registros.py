@@ -0,0 +1,69 @@
+"""
+Base de los registros en memoria por proceso (asignaturas, reglas de
+logros).
+
+Cada proceso guarda su copia y la construye con una consulta la primera
+vez que se usa. invalidar() la borra y además cambia una generación
+compartida en la caché de Django: antes de usar su copia, cada proceso
+compara la generación con la suya (como mucho cada
+LEVELUP_REGISTROS_REVISION segundos), así que una edición hecha en un
+worker de gunicorn llega a los demás.
+
+Con la LocMemCache por defecto la caché no se comparte entre procesos:
+por eso la copia también vence a los LEVELUP_REGISTROS_TTL segundos.
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class RegistroEnMemoria:
+    """Las subclases definen `clave_generacion` y `_construir()`."""
+
+    clave_generacion = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._datos = None
+        self._generacion = None
+        self._cargado_en = 0.0
+        self._revisado_en = 0.0
+
+    def _construir(self) -> dict:
+        raise NotImplementedError
+
+    def _generacion_compartida(self) -> str:
+        generacion = cache.get(self.clave_generacion)
+        if generacion is None:
+            cache.add(self.clave_generacion, uuid.uuid4().hex, None)
+            generacion = cache.get(self.clave_generacion)
+        return generacion
+
+    def _cargar(self):
+        ahora = time.monotonic()
+        datos = self._datos
+        if datos is not None and ahora - self._revisado_en < getattr(settings, "LEVELUP_REGISTROS_REVISION", 1.0):
+            return datos
+
+        generacion = self._generacion_compartida()
+        with self._lock:
+            vencido = ahora - self._cargado_en > getattr(settings, "LEVELUP_REGISTROS_TTL", 300)
+            if self._datos is None or generacion != self._generacion or vencido:
+                self._datos = self._construir()
+                self._generacion = generacion
+                self._cargado_en = ahora
+            self._revisado_en = ahora
+            return self._datos
+
+    def generacion(self) -> str:
+        """Generación compartida de la copia en uso."""
+        self._cargar()
+        return self._generacion
+
+    def invalidar(self):
+        with self._lock:
+            self._datos = None
+        cache.set(self.clave_generacion, uuid.uuid4().hex, None)
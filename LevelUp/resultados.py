@@ -0,0 +1,147 @@
+"""
+Armado de resultados de un intento (pantalla de resultados del estudiante).
+
+Todas las respuestas del intento se leen en una consulta (indexadas por
+item_id) y el desglose por ítem y global se calcula en una sola pasada.
+Para intentos finalizados el resultado se guarda en
+Submission.resumen_resultados, junto con la version_contenido de la
+actividad: volver a ver los resultados es leer ese JSON.
+"""
+from .models import Answer, Submission
+
+
+def _to_int_or_none(v):
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def detalle_respuesta(datos_item, respuesta, es_correcta):
+    """
+    Desglose de un ítem a partir de Answer.respuesta (payload del minijuego).
+
+    Usa meta.correctas / total / misses (o en la raíz, formato antiguo) y
+    `score` para reconstruir correctas si faltan. Devuelve el dict
+    `detalle` de la plantilla.
+    """
+    es_dict = isinstance(respuesta, dict)
+    respuesta = respuesta if es_dict else {}
+
+    # kind del minijuego
+    kind = respuesta.get("kind") or (datos_item or {}).get("kind")
+
+    # Meta (correctas / total / misses)
+    meta = respuesta.get("meta") or {}
+    if not isinstance(meta, dict):
+        meta = {}
+
+    # Compatibilidad por si vienen en la raíz
+    if not meta:
+        meta = {
+            "correctas": respuesta.get("correctas"),
+            "total": respuesta.get("total"),
+            "misses": respuesta.get("incorrectas"),
+        }
+
+    corr = _to_int_or_none(meta.get("correctas"))
+    tot = _to_int_or_none(meta.get("total"))
+    misses = _to_int_or_none(meta.get("misses"))
+
+    # Score (0..1) para reconstruir correctas por si faltan
+    score = None
+    try:
+        if "score" in respuesta:
+            score = float(respuesta["score"])
+    except (TypeError, ValueError):
+        score = None
+
+    if corr is None and tot is not None and score is not None:
+        corr = int(round(score * tot))
+
+    if misses is None and corr is not None and tot is not None:
+        misses = max(0, tot - corr)
+
+    # Correcto a nivel de ÍTEM: todas las sub-preguntas correctas;
+    # si no hay meta, se usa es_correcta (fallback antiguo)
+    if corr is not None and tot is not None and tot > 0:
+        correcto = (corr == tot)
+    else:
+        correcto = bool(es_correcta)
+
+    return {
+        "correcto": correcto,
+        "kind": (kind or "").lower(),
+        "correctas": corr,
+        "total": tot,
+        "incorrectas": misses,
+        "completado": es_dict and bool(respuesta.get("completado", True)),
+    }
+
+
+def calcular_resultados(sub, actividad) -> dict:
+    """
+    {"version", "items": [{"item": {id, enunciado}, "detalle"}],
+     "total_buenas", "total_preguntas", "porcentaje_global"}
+
+    Solo ítems tipo "game"; dos consultas (ítems y respuestas).
+    """
+    respuestas = {
+        item_id: (respuesta, es_correcta)
+        for item_id, respuesta, es_correcta in (
+            Answer.objects
+            .filter(submission=sub)
+            .values_list("item_id", "respuesta", "es_correcta")
+        )
+    }
+
+    items = []
+    total_buenas = 0
+    total_preguntas = 0
+
+    for item_id, enunciado, datos in (
+        actividad.items
+        .filter(tipo="game")
+        .order_by("orden", "id")
+        .values_list("id", "enunciado", "datos")
+    ):
+        respuesta, es_correcta = respuestas.get(item_id, ({}, False))
+        detalle = detalle_respuesta(datos, respuesta, es_correcta)
+
+        if detalle["correctas"] is not None and detalle["total"]:
+            total_buenas += detalle["correctas"]
+            total_preguntas += detalle["total"]
+        else:
+            total_preguntas += 1
+            if detalle["correcto"]:
+                total_buenas += 1
+
+        items.append({"item": {"id": item_id, "enunciado": enunciado}, "detalle": detalle})
+
+    porcentaje_global = 0
+    if total_preguntas > 0:
+        porcentaje_global = int(round(total_buenas * 100.0 / float(total_preguntas)))
+
+    return {
+        "version": actividad.version_contenido,
+        "items": items,
+        "total_buenas": total_buenas,
+        "total_preguntas": total_preguntas,
+        "porcentaje_global": porcentaje_global,
+    }
+
+
+def resultados_de_intento(sub, actividad) -> dict:
+    """
+    calcular_resultados con caché en el Submission (solo si está
+    finalizado y la actividad no cambió desde que se guardó).
+    """
+    guardado = sub.resumen_resultados
+    if sub.finalizado and guardado and guardado.get("version") == actividad.version_contenido:
+        return guardado
+
+    resultados = calcular_resultados(sub, actividad)
+    if sub.finalizado:
+        Submission.objects.filter(pk=sub.pk).update(resumen_resultados=resultados)
+        sub.resumen_resultados = resultados
+    return resultados
@@ -20,9 +20,8 @@ def compute_rewards(meta: dict) -> RewardOutcome:
     return RewardOutcome(xp=xp, coins=coins, unlocks=unlocks)
 
 def apply_rewards(estudiante, outcome: RewardOutcome):
-    pre_lvl = estudiante.nivel()
+    pre_lvl = estudiante.nivel_calculado()
     estudiante.add_xp(outcome.xp)
     estudiante.add_coins(outcome.coins)
-    estudiante.equip_default_if_empty()
-    estudiante.save()
-    return {"level_up": estudiante.nivel() > pre_lvl}
+    estudiante.save(update_fields=["xp", "coins"])
+    return {"level_up": estudiante.nivel_calculado() > pre_lvl}
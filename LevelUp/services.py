@@ -0,0 +1,411 @@
+"""
+Servicios de escritura del flujo de juego del estudiante.
+
+Las vistas/APIs solo parsean la petición y arman la respuesta; todo lo que
+escribe en BD para una respuesta (intento, Answer, asignación) ocurre
+aquí dentro de UNA transacción, con el intento abierto bloqueado para que
+dos peticiones simultáneas del mismo estudiante no se pisen.
+
+Los efectos de gamificación (XP/coins, puntos y medallas, actividades
+completadas, logros) no se aplican en el request: se encolan en la misma
+transacción con clave por Answer / Submission y los procesa la cola de
+LevelUp/tareas.py (ver los manejadores @tarea al final del módulo).
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from gamificacion.services import evaluar_logros_por_actividad, obtener_o_crear_perfil
+
+from .models import Answer, AsignacionActividad, Estudiante, ItemActividad, Submission, Tarea
+from .rewards import RewardOutcome, apply_rewards, compute_rewards
+from .signals import completar_asignacion, otorgar_puntos_por_intento, sincronizar_intentos_asignacion
+from .tableros import registrar_cierre
+from .tareas import encolar, tarea
+
+
+# --------------------------------------------------------------------
+# Intentos
+# --------------------------------------------------------------------
+
+# Aperturas que pueden chocar seguidas (otra petición abrió y cerró un
+# intento entre medio); más que esto es un error real
+REINTENTOS_APERTURA = 3
+
+
+def _intento_abierto(actividad, estudiante):
+    return (
+        Submission.objects
+        .select_for_update()
+        .filter(actividad=actividad, estudiante=estudiante, finalizado=False)
+        .first()
+    )
+
+
+def obtener_intento_abierto(actividad, estudiante, crear=True):
+    """
+    Devuelve el Submission abierto (finalizado=False) bloqueado para
+    escritura; si no hay y `crear`, abre el siguiente intento.
+
+    La restricción parcial `sub_un_abierto` garantiza un solo intento
+    abierto por (actividad, estudiante): si dos peticiones abren a la vez,
+    una inserta y la otra recibe IntegrityError y se queda con el de la
+    primera. El número sale del máximo existente, no de count().
+
+    Debe llamarse dentro de transaction.atomic().
+    """
+    sub = _intento_abierto(actividad, estudiante)
+    if sub or not crear:
+        return sub
+
+    for _ in range(REINTENTOS_APERTURA):
+        ultimo = (
+            Submission.objects
+            .filter(actividad=actividad, estudiante=estudiante)
+            .aggregate(m=Max("intento"))["m"] or 0
+        )
+        try:
+            with transaction.atomic():
+                return Submission.objects.create(
+                    actividad=actividad,
+                    estudiante=estudiante,
+                    intento=ultimo + 1,
+                )
+        except IntegrityError:
+            # Otra petición abrió primero: usar ese. Si ya lo cerró, el
+            # número quedó ocupado y se vuelve a calcular.
+            sub = _intento_abierto(actividad, estudiante)
+            if sub:
+                return sub
+
+    raise IntegrityError(
+        f"No se pudo abrir un intento para actividad={actividad.pk} estudiante={estudiante.pk}"
+    )
+
+
+def abrir_intento(actividad, estudiante):
+    """obtener_intento_abierto en su propia transacción (para las vistas)."""
+    with transaction.atomic():
+        return obtener_intento_abierto(actividad, estudiante)
+
+
+# --------------------------------------------------------------------
+# Corrección de un ítem
+# --------------------------------------------------------------------
+
+def evaluar_payload(item, payload: dict):
+    """
+    Calcula (es_correcta, puntaje_obtenido) para el payload de un minijuego.
+
+    - meta.correctas / meta.total → correcto si todas las sub-preguntas
+      están buenas.
+    - Sin meta, se usa `completado`.
+    - El puntaje es proporcional a `score` (0..1) sobre item.puntaje.
+    """
+    meta = payload.get("meta") or {}
+    completado = bool(payload.get("completado"))
+
+    corr = meta.get("correctas")
+    tot = meta.get("total")
+    ratio = payload.get("score")
+
+    try:
+        if corr is not None:
+            corr = int(corr)
+    except Exception:
+        corr = None
+    try:
+        if tot is not None:
+            tot = int(tot)
+    except Exception:
+        tot = None
+
+    if not isinstance(ratio, (int, float)):
+        if corr is not None and tot not in (None, 0):
+            ratio = float(corr) / float(tot)
+        else:
+            ratio = 0.0
+    else:
+        ratio = float(ratio)
+
+    if corr is not None and tot not in (None, 0):
+        es_correcta = (corr == tot)
+    else:
+        es_correcta = completado
+
+    puntaje_max = getattr(item, "puntaje", 0) or 0
+    return es_correcta, int(round(ratio * puntaje_max))
+
+
+# --------------------------------------------------------------------
+# Ingesta de respuestas
+# --------------------------------------------------------------------
+
+def _marcar_asignacion_en_progreso(actividad, estudiante):
+    """
+    Equivalente a submission_post_save para intentos abiertos, en un
+    solo UPDATE (no toca asignaciones ya completadas).
+    """
+    AsignacionActividad.objects.filter(
+        estudiante=estudiante,
+        actividad=actividad,
+        estado=AsignacionActividad.Estado.PENDIENTE,
+    ).update(estado=AsignacionActividad.Estado.EN_PROGRESO)
+
+
+def _otorgar_recompensas(usuario, estudiante, metas: list) -> dict:
+    """
+    XP/coins de uno o más minijuegos al Estudiante y XP al PerfilGamificacion,
+    sumados para escribir cada fila una sola vez.
+    """
+    outcomes = [compute_rewards(meta) for meta in metas]
+    outcome = RewardOutcome(
+        xp=sum(o.xp for o in outcomes),
+        coins=sum(o.coins for o in outcomes),
+        unlocks=[u for o in outcomes for u in o.unlocks],
+    )
+    res = apply_rewards(estudiante, outcome)
+
+    perfil = obtener_o_crear_perfil(usuario)
+    info_xp = perfil.agregar_xp(outcome.xp or 0, origen="juego")
+
+    return {
+        "xp": outcome.xp,
+        "coins": outcome.coins,
+        "unlocks": outcome.unlocks,
+        **res,
+        "niveles_subidos": info_xp["niveles_subidos"],
+    }
+
+
+def _encolar_recompensas(estudiante, pares: list) -> dict:
+    """
+    Encola las recompensas de [(answer, payload), ...], una tarea por
+    Answer: reenviar el mismo ítem en el mismo intento no vuelve a sumar.
+
+    Devuelve lo que se otorgará (compute_rewards es puro) para responder
+    sin esperar a la cola; las subidas de nivel se ven al procesarla.
+    """
+    claves = {f"respuesta:{answer.pk}": payload.get("meta") or {} for answer, payload in pares}
+    ya_encoladas = set(Tarea.objects.filter(clave__in=list(claves)).values_list("clave", flat=True))
+    nuevas = {clave: meta for clave, meta in claves.items() if clave not in ya_encoladas}
+
+    encolar([
+        ("recompensas_respuesta", clave, {"estudiante_id": estudiante.pk, "meta": meta})
+        for clave, meta in nuevas.items()
+    ])
+
+    outcomes = [compute_rewards(meta) for meta in nuevas.values()]
+    return {
+        "xp": sum(o.xp for o in outcomes),
+        "coins": sum(o.coins for o in outcomes),
+        "unlocks": [u for o in outcomes for u in o.unlocks],
+        "niveles_subidos": 0,
+        "pendiente": bool(nuevas),
+    }
+
+
+def _guardar_answers(sub, pares: list) -> list:
+    """
+    Upsert de [(item, payload), ...] en un solo INSERT ... ON CONFLICT UPDATE.
+    """
+    answers = []
+    for item, payload in pares:
+        es_correcta, puntaje = evaluar_payload(item, payload)
+        answers.append(Answer(
+            submission=sub,
+            item=item,
+            respuesta=payload,
+            es_correcta=es_correcta,
+            puntaje_obtenido=puntaje,
+        ))
+    if answers:
+        Answer.objects.bulk_create(
+            answers,
+            update_conflicts=True,
+            unique_fields=["submission", "item"],
+            update_fields=["respuesta", "es_correcta", "puntaje_obtenido", "respondido_en"],
+        )
+    return answers
+
+
+def _cerrar_intento(actividad, estudiante, sub) -> None:
+    """
+    Marca `sub` como finalizado, pasa la asignación a COMPLETADA y encola
+    la gamificación de fin de actividad (puntos y medallas del Estudiante,
+    actividades completadas y logros) y los resúmenes de los tableros.
+
+    Los logros se evalúan en la cola y llegan al popup global como
+    RecompensaUsuario con notificada=False.
+    """
+    sub.finalizado = True
+    sub.enviado_en = timezone.now()
+    # UPDATE sin post_save: el resto de submission_post_save va a la cola
+    Submission.objects.filter(pk=sub.pk).update(finalizado=True, enviado_en=sub.enviado_en)
+    sincronizar_intentos_asignacion(estudiante.pk, actividad.pk)
+    completar_asignacion(sub)
+
+    encolar([("cierre_intento", f"cierre:{sub.pk}", {"submission_id": sub.pk})])
+
+
+def registrar_respuesta(usuario, actividad, estudiante, item, payload: dict) -> dict:
+    """
+    Guarda la respuesta de un ítem y encola sus recompensas en una sola
+    transacción:
+
+      1. Bloquea (o abre) el intento del estudiante.
+      2. Upsert del Answer (INSERT ... ON CONFLICT UPDATE).
+      3. Sella enviado_en del intento y pasa la asignación a EN_PROGRESO.
+      4. Encola XP/coins y XP de gamificación (tarea "respuesta:<answer_id>").
+
+    Devuelve {"submission": Submission, "answer_id": int, "reward": dict}.
+    """
+    ahora = timezone.now()
+
+    with transaction.atomic():
+        sub = obtener_intento_abierto(actividad, estudiante)
+        answer, = _guardar_answers(sub, [(item, payload)])
+
+        Submission.objects.filter(pk=sub.pk).update(enviado_en=ahora)
+        sub.enviado_en = ahora
+        _marcar_asignacion_en_progreso(actividad, estudiante)
+
+        reward = _encolar_recompensas(estudiante, [(answer, payload)])
+
+    return {"submission": sub, "answer_id": answer.pk, "reward": reward}
+
+
+def finalizar_intento(usuario, actividad, estudiante) -> dict:
+    """
+    Cierra el intento abierto (marcador item_id == 0 del cliente): sella
+    el envío, completa la asignación y encola el resto (ver _cerrar_intento).
+
+    Devuelve {"submission": Submission}.
+    """
+    with transaction.atomic():
+        sub = obtener_intento_abierto(actividad, estudiante)
+        _cerrar_intento(actividad, estudiante, sub)
+
+    return {"submission": sub}
+
+
+def registrar_respuestas_lote(usuario, actividad, estudiante, resultados: list, finalizar=False) -> dict:
+    """
+    Versión por lotes de registrar_respuesta (+ finalizar_intento) para
+    enviar todos los resultados de un intento en una sola petición.
+
+    `resultados` es [{"item_id": int, "payload": dict}, ...]; una entrada
+    con item_id 0 equivale a finalizar=True (mismo marcador que la API
+    por ítem). Los ítems se
+    resuelven en una consulta, los Answer se escriben en un solo upsert y
+    las recompensas se encolan en un solo INSERT.
+
+    Devuelve {"submission", "answer_ids", "ignorados", "reward"};
+    `ignorados` son los item_id que no pertenecen a la actividad o cuyo
+    payload no es un objeto JSON.
+    """
+    payloads = {}
+    ignorados = []
+    for r in resultados:
+        try:
+            item_id = int(r.get("item_id"))
+        except (TypeError, ValueError, AttributeError):
+            continue
+        if item_id == 0:
+            finalizar = True
+            continue
+        payload = r.get("payload") or {}
+        if not isinstance(payload, dict):
+            ignorados.append(item_id)
+            continue
+        payloads[item_id] = payload
+
+    items = {
+        it.pk: it
+        for it in ItemActividad.objects.filter(actividad=actividad, pk__in=list(payloads))
+    }
+    ignorados += [i for i in payloads if i not in items]
+    pares = [(items[i], p) for i, p in payloads.items() if i in items]
+    ahora = timezone.now()
+
+    with transaction.atomic():
+        sub = obtener_intento_abierto(actividad, estudiante)
+        answers = _guardar_answers(sub, pares)
+
+        reward = {"xp": 0, "coins": 0, "unlocks": [], "niveles_subidos": 0, "pendiente": False}
+        if pares:
+            _marcar_asignacion_en_progreso(actividad, estudiante)
+            reward = _encolar_recompensas(estudiante, list(zip(answers, (p for _, p in pares))))
+
+        if finalizar:
+            _cerrar_intento(actividad, estudiante, sub)
+        elif pares:
+            Submission.objects.filter(pk=sub.pk).update(enviado_en=ahora)
+            sub.enviado_en = ahora
+
+    return {
+        "submission": sub,
+        "answer_ids": {a.item_id: a.pk for a in answers},
+        "ignorados": ignorados,
+        "reward": reward,
+    }
+
+
+def resumen_intentos(actividad, estudiante) -> dict:
+    """
+    Intentos usados / máximos y si puede reintentar (0 = ilimitado).
+    """
+    intentos_usados = Submission.objects.filter(
+        actividad=actividad,
+        estudiante=estudiante,
+    ).count()
+
+    if actividad.intentos_ilimitados:
+        intentos_max = 0
+    else:
+        try:
+            intentos_max = int(actividad.intentos_max or 0)
+        except (TypeError, ValueError):
+            intentos_max = 0
+
+    es_intentos_ilimitados = (intentos_max == 0)
+    ahora = timezone.now()
+
+    puede_reintentar = (
+        actividad.es_publicada
+        and (not actividad.fecha_cierre or ahora <= actividad.fecha_cierre)
+        and (es_intentos_ilimitados or intentos_usados < intentos_max)
+    )
+    return {
+        "intentos_usados": intentos_usados,
+        "intentos_max": intentos_max,
+        "es_intentos_ilimitados": es_intentos_ilimitados,
+        "puede_reintentar": puede_reintentar,
+    }
+
+
+# --------------------------------------------------------------------
+# Tareas diferidas (LevelUp/tareas.py)
+# --------------------------------------------------------------------
+
+@tarea("recompensas_respuesta")
+def _tarea_recompensas_respuesta(estudiante_id, meta):
+    estudiante = Estudiante.objects.select_related("usuario").get(pk=estudiante_id)
+    _otorgar_recompensas(estudiante.usuario, estudiante, [meta])
+
+
+@tarea("cierre_intento")
+def _tarea_cierre_intento(submission_id):
+    sub = Submission.objects.select_related("actividad", "estudiante__usuario").get(pk=submission_id)
+    estudiante = sub.estudiante
+
+    otorgar_puntos_por_intento(sub)
+    perfil = obtener_o_crear_perfil(estudiante.usuario)
+    perfil.registrar_actividad_completada()
+    evaluar_logros_por_actividad(
+        estudiante=estudiante,
+        actividad=sub.actividad,
+        submission=sub,
+        perfil=perfil,
+    )
+    registrar_cierre(sub)
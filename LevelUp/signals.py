@@ -1,12 +1,20 @@
-from django.db.models.signals import pre_save, post_save
+import uuid
+
+from django.db.models import Count, FloatField, IntegerField, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
 from .models import (
     Usuario, Administrador, Docente, Estudiante,
-    Actividad, AsignacionActividad, Submission
+    Actividad, AsignacionActividad, Submission, Asignatura, ItemActividad, Curso
 )
+from gamificacion.curvas import nivel_por_puntos
+
+from .asignaturas import registro_asignaturas
+from . import tableros
 from .validators import formatear_rut_usuario
 
 
@@ -14,20 +22,71 @@ from .validators import formatear_rut_usuario
 # Utilidades de gamificación (umbral editable)
 # --------------------------------------------------------------------
 
-PUNTOS_POR_NIVEL = 100           # 1 nivel cada 100 puntos
 CALIFICACION_MEDALLA = 90.0      # medalla por >= 90
 
 
 def recalcular_nivel_por_puntos(puntos: int) -> int:
     """
-    Nivel mínimo 1; sube 1 nivel cada PUNTOS_POR_NIVEL.
+    Nivel mínimo 1; sube 1 nivel cada PUNTOS_POR_NIVEL
+    (gamificacion/curvas.py).
     """
     try:
-        return max(1, 1 + (puntos // PUNTOS_POR_NIVEL))
+        return nivel_por_puntos(puntos)
     except Exception:
         return 1
 
 
+# --------------------------------------------------------------------
+# Asignatura: invalidar el registro en memoria
+# --------------------------------------------------------------------
+
+@receiver(post_save, sender=Asignatura)
+@receiver(post_delete, sender=Asignatura)
+def asignatura_cambiada(sender, **kwargs):
+    registro_asignaturas.invalidar()
+    tableros.invalidar_global()
+
+
+# --------------------------------------------------------------------
+# Totales del portal admin / reportes (LevelUp/tableros.py)
+# --------------------------------------------------------------------
+
+@receiver(post_save, sender=Usuario)
+def usuario_totales(sender, instance: Usuario, created, update_fields=None, **kwargs):
+    # El login guarda solo last_login: no cambia ningún total
+    if created or update_fields is None or "rol" in update_fields:
+        tableros.invalidar_global()
+
+
+@receiver(post_save, sender=Curso)
+@receiver(post_save, sender=Estudiante)
+def alta_totales(sender, created, **kwargs):
+    if created:
+        tableros.invalidar_global()
+
+
+@receiver(post_delete, sender=Usuario)
+@receiver(post_delete, sender=Curso)
+@receiver(post_delete, sender=Estudiante)
+def baja_totales(sender, **kwargs):
+    tableros.invalidar_global()
+
+
+@receiver(post_save, sender=Actividad)
+def actividad_creada_totales(sender, instance: Actividad, created, **kwargs):
+    if created:
+        tableros.invalidar_global()
+        if instance.docente_id:
+            tableros.sumar_actividades(instance.docente_id, 1)
+
+
+@receiver(post_delete, sender=Actividad)
+def actividad_borrada_totales(sender, instance: Actividad, **kwargs):
+    tableros.invalidar_global()
+    if instance.docente_id:
+        tableros.sumar_actividades(instance.docente_id, -1)
+
+
 # --------------------------------------------------------------------
 # Usuario: normalización de RUT y creación de perfil por rol
 # --------------------------------------------------------------------
@@ -63,19 +122,79 @@ def actividad_set_fecha_publicacion(sender, instance: Actividad, **kwargs):
         instance.fecha_publicacion = timezone.now()
 
 
+# --------------------------------------------------------------------
+# ItemActividad: nueva versión de contenido de la actividad
+# --------------------------------------------------------------------
+
+def renovar_version_contenido(actividad_id):
+    """
+    Invalida el mapa compilado de la misión (LevelUp/mapas.py). Llamar
+    también tras escrituras masivas de ítems, que no disparan señales.
+    """
+    Actividad.objects.filter(pk=actividad_id).update(version_contenido=uuid.uuid4().hex)
+
+
+@receiver(post_save, sender=ItemActividad)
+@receiver(post_delete, sender=ItemActividad)
+def item_actividad_cambiado(sender, instance: ItemActividad, **kwargs):
+    renovar_version_contenido(instance.actividad_id)
+
+
 # --------------------------------------------------------------------
 # Submission: al finalizar, otorgar XP/medallas, nivelar y sincronizar asignación
 # --------------------------------------------------------------------
 
+def _agregado_intentos(expr, output_field, filtro=Q()):
+    """Subquery con un agregado de los Submission de la asignación externa."""
+    return Subquery(
+        Submission.objects
+        .filter(estudiante_id=OuterRef("estudiante_id"), actividad_id=OuterRef("actividad_id"))
+        .filter(filtro)
+        .values("estudiante_id")
+        .annotate(v=expr)
+        .values("v")[:1],
+        output_field=output_field,
+    )
+
+
+def sincronizar_intentos(asignaciones):
+    """
+    Recalcula intentos usados / abiertos / finalizados y la mejor
+    calificación de las asignaciones del queryset en un solo UPDATE.
+    """
+    contar = lambda filtro=Q(): Coalesce(_agregado_intentos(Count("id"), IntegerField(), filtro), 0)
+    return asignaciones.update(
+        intentos_usados=contar(),
+        intentos_abiertos=contar(Q(finalizado=False)),
+        intentos_finalizados=contar(Q(finalizado=True)),
+        mejor_calificacion=_agregado_intentos(Max("calificacion"), FloatField(), Q(finalizado=True)),
+    )
+
+
+def sincronizar_intentos_asignacion(estudiante_id, actividad_id):
+    sincronizar_intentos(
+        AsignacionActividad.objects.filter(estudiante_id=estudiante_id, actividad_id=actividad_id)
+    )
+
+
+@receiver(post_delete, sender=Submission)
+def submission_post_delete(sender, instance: Submission, **kwargs):
+    sincronizar_intentos_asignacion(instance.estudiante_id, instance.actividad_id)
+
+
 @receiver(post_save, sender=Submission)
 def submission_post_save(sender, instance: Submission, created, **kwargs):
     """
+    Siempre: actualiza el resumen de intentos de la asignación.
+
     Cuando un submission se marca como finalizado:
       - Suma puntos al Estudiante (xp_obtenido).
       - Recalcula nivel.
       - Suma medalla si calificación >= CALIFICACION_MEDALLA.
       - Sincroniza AsignacionActividad (nota/estado/fecha_completada).
     """
+    sincronizar_intentos_asignacion(instance.estudiante_id, instance.actividad_id)
+
     # Solo actuamos cuando ya NO es creación y está finalizado
     if created:
         return
@@ -95,6 +214,17 @@ def submission_post_save(sender, instance: Submission, created, **kwargs):
         return
 
     # Aquí: finalizado = True -> otorgar recompensas y cerrar asignación
+    otorgar_puntos_por_intento(instance)
+    completar_asignacion(instance)
+    tableros.registrar_cierre(instance)
+
+
+def otorgar_puntos_por_intento(instance: Submission):
+    """
+    Puntos (xp_obtenido), nivel por puntos y medalla del Estudiante por un
+    intento finalizado. Los servicios del flujo de juego lo ejecutan desde
+    la cola de tareas (LevelUp/tareas.py) en vez de en el request.
+    """
     est = instance.estudiante
     puntos_previos = est.puntos or 0
     medallas_previas = est.medallas or 0
@@ -127,10 +257,12 @@ def submission_post_save(sender, instance: Submission, created, **kwargs):
     if campos_update:
         est.save(update_fields=campos_update)
 
-    # 4) Sincronizar la AsignacionActividad
+
+def completar_asignacion(instance: Submission):
+    """Pasa la AsignacionActividad del intento finalizado a COMPLETADA (nota y fecha)."""
     try:
         asign = AsignacionActividad.objects.get(
-            estudiante=instance.estudiante, actividad=instance.actividad
+            estudiante_id=instance.estudiante_id, actividad_id=instance.actividad_id
         )
         cambios = []
         if asign.estado != AsignacionActividad.Estado.COMPLETADA:
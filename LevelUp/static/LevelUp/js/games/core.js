@@ -5,13 +5,45 @@ export function getCSRF() {
   return m ? m[1] : "";
 }
 
+// Id de envío para la idempotencia del servidor (cabecera Idempotency-Key):
+// es el mismo en todos los reintentos de un envío.
+export function nuevoRequestId() {
+  if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+}
+
+const REINTENTOS = 3;
+
+// POST JSON con Idempotency-Key. Reintenta errores de red, 409 (el primer
+// envío sigue en curso) y 5xx con espera creciente; si el primer envío
+// ya había llegado, el servidor devuelve la respuesta guardada.
+async function postIdempotente(url, body, { keepalive = false } = {}) {
+  const requestId = nuevoRequestId();
+  let ultimoError = null;
+  for (let intento = 0; intento <= REINTENTOS; intento++) {
+    if (intento > 0) {
+      await new Promise(r => setTimeout(r, 300 * 2 ** (intento - 1)));
+      console.warn(`[core.js] 🔁 Reintento ${intento} (${requestId})`);
+    }
+    try {
+      const res = await fetch(url, {
+        method: "POST",
+        headers: { "X-CSRFToken": getCSRF(), "Content-Type": "application/json", "Idempotency-Key": requestId },
+        body: JSON.stringify(body),
+        keepalive
+      });
+      if (res.status !== 409 && res.status < 500) return res;
+      ultimoError = new Error(`HTTP ${res.status}`);
+    } catch (err) {
+      ultimoError = err;
+    }
+  }
+  throw ultimoError;
+}
+
 export async function postAnswer(actividadId, itemId, payload = {}) {
   console.log(`[core.js] 💾 Guardando respuesta - Item ${itemId}`, payload);
-  const res = await fetch(`/api/actividades/${actividadId}/answer/${itemId}/`, {
-    method: "POST",
-    headers: { "X-CSRFToken": getCSRF(), "Content-Type": "application/json" },
-    body: JSON.stringify({ payload })
-  });
+  const res = await postIdempotente(`/api/actividades/${actividadId}/answer/${itemId}/`, { payload });
   if (!res.ok) {
     console.error('[core.js] ❌ Error guardando respuesta:', res.status);
     throw new Error("Fallo guardando respuesta");
@@ -21,6 +53,23 @@ export async function postAnswer(actividadId, itemId, payload = {}) {
   return data;
 }
 
+// Envía todos los resultados de un intento en UNA petición.
+// resultados: [{ item_id, payload }, ...]; finalizar cierra el intento.
+// keepalive permite enviarlo aunque la página se esté cerrando.
+export async function postAnswers(actividadId, resultados = [], { finalizar = false, keepalive = false } = {}) {
+  console.log(`[core.js] 💾 Guardando ${resultados.length} respuesta(s) en lote`, { finalizar });
+  const res = await postIdempotente(
+    `/api/actividades/${actividadId}/answers/`,
+    { items: resultados, finalizar },
+    { keepalive }
+  );
+  if (!res.ok) {
+    console.error('[core.js] ❌ Error guardando lote:', res.status);
+    throw new Error("Fallo guardando respuestas");
+  }
+  return res.json();
+}
+
 export function shuffle(a) {
   console.log('[core.js] 🔀 Mezclando array de', a.length, 'elementos');
   return a.map(v => [Math.random(), v]).sort((x, y) => x[0] - y[0]).map(x => x[1]);
@@ -7,7 +7,8 @@ export default async function init(host, cfg) {
   console.log('🎮 [TRIVIA] Inicializando');
   console.log('📦 Config:', cfg);
 
-  const questions = shuffle(cfg.trivia || cfg.questions || []);
+  // _idx: posición original, para reportar qué opción se eligió en cada pregunta
+  const questions = shuffle((cfg.trivia || cfg.questions || []).map((q, i) => ({ ...q, _idx: i })));
   if (!questions.length) {
     console.error('❌ [TRIVIA] No hay preguntas');
     return;
@@ -15,6 +16,7 @@ export default async function init(host, cfg) {
 
   let currentQ = 0;
   let correctas = 0;
+  const elegidas = [];  // [{ q, opcion }] → meta.detail (análisis de ítems)
 
   // (vidas/corazones desactivados por ahora)
   // let lives = cfg.lives != null ? cfg.lives : 3;
@@ -104,6 +106,7 @@ export default async function init(host, cfg) {
 
       btn.addEventListener('click', () => {
         console.log(`👆 [TRIVIA] Click en opción ${idx}`);
+        elegidas.push({ q: q._idx, opcion: idx });
 
         // Deshabilitar todos los botones
         optsDiv.querySelectorAll('.tr-opt').forEach(b => {
@@ -203,6 +206,7 @@ export default async function init(host, cfg) {
     host.dataset.gameScore = score.toFixed(2);
     host.dataset.gameCorrect = correctas;
     host.dataset.gameTotal = questions.length;
+    host.dataset.gameDetail = JSON.stringify(elegidas);
 
     console.log('✅ [TRIVIA] Marcado como completado');
   }
@@ -0,0 +1,270 @@
+"""
+Resúmenes precalculados de los tableros (portal docente, portal admin,
+reportes) para que cada portada se arme con lecturas por clave primaria
+en vez de COUNT / JOIN sobre tablas completas.
+
+- ResumenGlobal (una fila): totales de usuarios, cursos, asignaturas y
+  actividades. Las señales solo suben `generacion` (un UPDATE); la
+  siguiente lectura recalcula si quedó desfasada.
+- ResumenDocente: actividades del docente, estudiantes distintos con
+  intentos finalizados (y asignados) y los últimos MAX_EVENTOS cierres.
+  Se actualiza al procesar la tarea "cierre_intento" y al crear o borrar
+  actividades.
+- ResumenActividad: avance de las asignaciones. Se recalcula tras
+  sincronizar_asignaciones y al cerrar un intento.
+
+Lo que cambie por otras vías (admin, cargas masivas) lo corrige
+`reconciliar()` (`manage.py reconciliar_tableros`, periódico).
+"""
+from django.db import transaction
+from django.db.models import Avg, Count, F, Max, Q, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .diagnostico import obtener_logger
+from .models import (
+    Actividad, AsignacionActividad, Asignatura, Curso, Docente, Estudiante,
+    ResumenActividad, ResumenDocente, ResumenGlobal, Submission, Usuario,
+)
+
+log = obtener_logger(__name__)
+
+MAX_EVENTOS = 10
+PK_GLOBAL = 1
+
+
+# --------------------------------------------------------------------
+# Global
+# --------------------------------------------------------------------
+
+def invalidar_global() -> None:
+    """Marca los totales globales como desfasados (se recalculan al leerlos)."""
+    ResumenGlobal.objects.filter(pk=PK_GLOBAL).update(generacion=F("generacion") + 1)
+
+
+def _contar_global() -> dict:
+    usuarios = Usuario.objects.aggregate(
+        alumnos=Count("id", filter=Q(rol=Usuario.Rol.ESTUDIANTE)),
+        profesores=Count("id", filter=Q(rol=Usuario.Rol.DOCENTE)),
+    )
+    return {
+        **usuarios,
+        "cursos": Curso.objects.count(),
+        "asignaturas": Asignatura.objects.count(),
+        "estudiantes": Estudiante.objects.count(),
+        "actividades": Actividad.objects.count(),
+    }
+
+
+def resumen_global() -> ResumenGlobal:
+    """
+    Fila de totales globales, recalculada si alguna señal la invalidó.
+    Solo se guarda si nadie la invalidó mientras se contaba.
+    """
+    resumen = ResumenGlobal.objects.filter(pk=PK_GLOBAL).first()
+    if resumen is not None and resumen.vigente:
+        return resumen
+    if resumen is None:
+        resumen, _ = ResumenGlobal.objects.get_or_create(pk=PK_GLOBAL)
+
+    generacion = resumen.generacion
+    totales = _contar_global()
+    ResumenGlobal.objects.filter(pk=PK_GLOBAL, generacion=generacion).update(
+        calculada=generacion, actualizado_en=timezone.now(), **totales,
+    )
+    for campo, valor in totales.items():
+        setattr(resumen, campo, valor)
+    resumen.calculada = generacion
+    return resumen
+
+
+# --------------------------------------------------------------------
+# Docente
+# --------------------------------------------------------------------
+
+def _cierres_docente(docente_id):
+    """Intentos finalizados en actividades del docente, de estudiantes asignados."""
+    return Submission.objects.filter(
+        actividad__docente_id=docente_id,
+        finalizado=True,
+        actividad__asignacionactividad__estudiante=F("estudiante"),
+    )
+
+
+def _evento(sub) -> dict:
+    usuario = sub.estudiante.usuario
+    nombre = usuario.get_full_name() or usuario.first_name or usuario.username
+    partes = nombre.split()
+    if len(partes) >= 2:
+        iniciales = (partes[0][0] + partes[-1][0]).upper()
+    else:
+        iniciales = nombre[:2].upper()
+    fecha = sub.enviado_en or sub.iniciado_en
+    return {
+        "submission": sub.pk,
+        "estudiante": nombre,
+        "iniciales": iniciales,
+        "actividad": sub.actividad.titulo,
+        "fecha": fecha.isoformat() if fecha else None,
+    }
+
+
+def _ordenar_eventos(eventos) -> list:
+    return sorted(eventos, key=lambda e: (e["fecha"] or "", e["submission"]), reverse=True)[:MAX_EVENTOS]
+
+
+def recalcular_docente(docente_id) -> ResumenDocente:
+    """Recalcula desde cero el resumen del docente (upsert)."""
+    cierres = _cierres_docente(docente_id)
+    recientes = (
+        cierres
+        .annotate(fecha_evento=Coalesce("enviado_en", "iniciado_en"))
+        .select_related("actividad", "estudiante__usuario")
+        .order_by("-fecha_evento", "-id")[:MAX_EVENTOS]
+    )
+    resumen = ResumenDocente(
+        docente_id=docente_id,
+        total_actividades=Actividad.objects.filter(docente_id=docente_id).count(),
+        total_estudiantes=cierres.values("estudiante_id").distinct().count(),
+        eventos=[_evento(sub) for sub in recientes],
+    )
+    ResumenDocente.objects.bulk_create(
+        [resumen],
+        update_conflicts=True,
+        unique_fields=["docente"],
+        update_fields=["total_actividades", "total_estudiantes", "eventos", "actualizado_en"],
+    )
+    return resumen
+
+
+def resumen_docente(docente_id):
+    """
+    Resumen del docente (pk = usuario_id). El primero se calcula al vuelo;
+    None si el usuario no tiene perfil Docente.
+    """
+    resumen = ResumenDocente.objects.filter(pk=docente_id).first()
+    if resumen is None and Docente.objects.filter(pk=docente_id).exists():
+        resumen = recalcular_docente(docente_id)
+    return resumen
+
+
+def sumar_actividades(docente_id, delta: int) -> None:
+    ResumenDocente.objects.filter(pk=docente_id).update(
+        total_actividades=Greatest(F("total_actividades") + delta, Value(0)),
+    )
+
+
+def registrar_cierre(sub) -> None:
+    """
+    Refleja un intento finalizado en los resúmenes de su actividad y de su
+    docente: recuenta estudiantes y mete el evento al frente de la lista
+    (sin duplicarlo si la tarea se repite).
+    """
+    recalcular_actividades([sub.actividad_id])
+
+    docente_id = sub.actividad.docente_id
+    if docente_id is None:
+        return
+    asignado = AsignacionActividad.objects.filter(
+        actividad_id=sub.actividad_id, estudiante_id=sub.estudiante_id,
+    ).exists()
+    if not asignado:
+        return
+
+    with transaction.atomic():
+        resumen = ResumenDocente.objects.select_for_update().filter(pk=docente_id).first()
+        if resumen is None:
+            recalcular_docente(docente_id)
+            return
+        resumen.total_estudiantes = (
+            _cierres_docente(docente_id).values("estudiante_id").distinct().count()
+        )
+        resumen.eventos = _ordenar_eventos(
+            [_evento(sub)] + [e for e in resumen.eventos if e["submission"] != sub.pk]
+        )
+        resumen.save(update_fields=["total_estudiantes", "eventos", "actualizado_en"])
+
+
+def actividad_reciente(resumen, limite=5) -> list:
+    """Eventos del resumen con el formato de portal/docente.html."""
+    if resumen is None:
+        return []
+    filas = []
+    for e in resumen.eventos[:limite]:
+        fecha = parse_datetime(e["fecha"]) if e["fecha"] else None
+        filas.append({
+            "iniciales": e["iniciales"],
+            "estudiante_nombre": e["estudiante"],
+            "actividad_titulo": e["actividad"],
+            "descripcion": "completó",
+            "hace": fecha.strftime("%d/%m/%Y %H:%M hrs") if fecha else "Sin fecha",
+            "badge_tipo": "completado",
+            "puntos": 0,
+            "badge_texto": "Completado",
+        })
+    return filas
+
+
+# --------------------------------------------------------------------
+# Actividad
+# --------------------------------------------------------------------
+
+CAMPOS_ACTIVIDAD = ["asignados", "en_progreso", "completados", "promedio_nota", "ultima_entrega", "actualizado_en"]
+
+
+def recalcular_actividades(actividad_ids=None) -> int:
+    """
+    Recalcula el avance de las actividades indicadas (todas si es None)
+    con dos consultas agrupadas y un upsert. Devuelve cuántas escribió.
+    """
+    asignaciones = AsignacionActividad.objects.order_by()
+    entregas = Submission.objects.filter(finalizado=True).order_by()
+    if actividad_ids is None:
+        actividad_ids = list(Actividad.objects.values_list("pk", flat=True))
+    else:
+        actividad_ids = list(actividad_ids)
+        asignaciones = asignaciones.filter(actividad_id__in=actividad_ids)
+        entregas = entregas.filter(actividad_id__in=actividad_ids)
+
+    completada = Q(estado=AsignacionActividad.Estado.COMPLETADA)
+    avance = {
+        fila.pop("actividad_id"): fila
+        for fila in asignaciones.values("actividad_id").annotate(
+            asignados=Count("id"),
+            en_progreso=Count("id", filter=Q(estado=AsignacionActividad.Estado.EN_PROGRESO)),
+            completados=Count("id", filter=completada),
+            promedio_nota=Avg("nota", filter=completada),
+        )
+    }
+    ultima = dict(entregas.values("actividad_id").annotate(m=Max("enviado_en")).values_list("actividad_id", "m"))
+
+    filas = [
+        ResumenActividad(actividad_id=pk, ultima_entrega=ultima.get(pk), **avance.get(pk, {}))
+        for pk in actividad_ids
+    ]
+    ResumenActividad.objects.bulk_create(
+        filas,
+        update_conflicts=True,
+        unique_fields=["actividad"],
+        update_fields=CAMPOS_ACTIVIDAD,
+        batch_size=500,
+    )
+    return len(filas)
+
+
+# --------------------------------------------------------------------
+# Reconciliación
+# --------------------------------------------------------------------
+
+def reconciliar() -> dict:
+    """Recalcula todos los resúmenes. Devuelve cuántos de cada tipo."""
+    invalidar_global()
+    resumen_global()
+    actividades = recalcular_actividades()
+    docentes = 0
+    for docente_id in Docente.objects.values_list("pk", flat=True):
+        recalcular_docente(docente_id)
+        docentes += 1
+    log.info("tableros.reconciliados", actividades=actividades, docentes=docentes)
+    return {"actividades": actividades, "docentes": docentes}
@@ -0,0 +1,227 @@
+"""
+Cola local de tareas en BD para sacar del request los efectos de
+gamificación (XP, coins, puntos, medallas, logros).
+
+Las vistas guardan lo imprescindible (Answer, estado del intento) y
+encolan el resto con una `clave` que identifica el efecto
+("respuesta:<answer_id>", "cierre:<submission_id>"). La clave es única:
+encolar dos veces el mismo efecto deja una sola tarea.
+
+Cada tarea se toma, se ejecuta y se marca HECHA en UNA transacción: si el
+proceso muere a mitad, todo vuelve atrás y la tarea sigue pendiente
+(al menos una vez), y como el efecto y la marca se confirman juntos nunca
+se aplica dos veces. Los fallos se reintentan con espera creciente hasta
+MAX_INTENTOS y después quedan FALLIDA (visibles en el admin).
+
+Quién procesa (settings.LEVELUP_TAREAS_MODO):
+
+- "hilos" (por defecto): al confirmar la transacción que encola, un
+  ThreadPoolExecutor del propio proceso drena la cola. Si al terminar
+  quedan reintentos con espera, un temporizador vuelve a drenarla cuando
+  vence el primero (sin esperar a que alguien encole otra cosa).
+  Lo que quede pendiente si el proceso se reinicia lo toma el siguiente
+  drenaje; en instalaciones sin tráfico conviene además
+  `manage.py procesar_tareas` periódico (cron).
+- "worker": solo se encola; `manage.py procesar_tareas` drena la cola.
+- "inmediato": se drena en el mismo hilo al confirmar (scripts, depuración).
+
+Los logros desbloqueados quedan con notificada=False y el popup global
+los muestra en la siguiente página (context_processors._nuevas_recompensas).
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .diagnostico import obtener_logger
+from .models import Tarea
+
+log = obtener_logger(__name__)
+
+MAX_INTENTOS = 5
+ESPERA_MAXIMA_S = 300
+
+MANEJADORES = {}
+
+_pool = None
+_pool_lock = threading.Lock()
+_temporizador = None        # (vence en time.monotonic(), threading.Timer)
+
+
+def tarea(tipo: str):
+    """Registra la función decorada como manejador de `tipo`."""
+    def registrar(funcion):
+        MANEJADORES[tipo] = funcion
+        return funcion
+    return registrar
+
+
+def modo() -> str:
+    return getattr(settings, "LEVELUP_TAREAS_MODO", "hilos")
+
+
+# --------------------------------------------------------------------
+# Encolar
+# --------------------------------------------------------------------
+
+def encolar(tareas) -> None:
+    """
+    Encola [(tipo, clave, datos), ...] en un solo INSERT; las claves que
+    ya existen se ignoran. El despacho ocurre al confirmar la transacción.
+    """
+    filas = [Tarea(tipo=tipo, clave=clave, datos=datos) for tipo, clave, datos in tareas]
+    if not filas:
+        return
+    Tarea.objects.bulk_create(filas, ignore_conflicts=True)
+    transaction.on_commit(_despachar)
+
+
+def _despachar():
+    actual = modo()
+    if actual == "worker":
+        return
+    if actual == "inmediato":
+        procesar_pendientes()
+        return
+    _ejecutor().submit(_drenar_en_hilo)
+
+
+def _ejecutor() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, "LEVELUP_TAREAS_HILOS", 2),
+                thread_name_prefix="levelup-tareas",
+            )
+        return _pool
+
+
+def _drenar_en_hilo():
+    try:
+        procesar_pendientes()
+        programar_siguiente()
+    except Exception:
+        log.exception("tareas.hilo_error")
+    finally:
+        # Cada hilo del pool tiene su propia conexión
+        connection.close()
+
+
+def programar_siguiente() -> float | None:
+    """
+    Modo "hilos": deja un temporizador que vuelve a drenar la cola cuando
+    vence el próximo reintento pendiente. Mantiene uno solo (el más
+    próximo). Devuelve los segundos de espera, o None si no hay nada.
+    """
+    global _temporizador
+    if modo() != "hilos":
+        return None
+    proxima = (
+        Tarea.objects
+        .filter(estado=Tarea.Estado.PENDIENTE)
+        .order_by("disponible_en")
+        .values_list("disponible_en", flat=True)
+        .first()
+    )
+    if proxima is None:
+        return None
+
+    espera = max(0.0, (proxima - timezone.now()).total_seconds())
+    vence = time.monotonic() + espera
+    with _pool_lock:
+        if _temporizador is not None and _temporizador[1].is_alive() and _temporizador[0] <= vence:
+            return espera
+        if _temporizador is not None:
+            _temporizador[1].cancel()
+        reloj = threading.Timer(espera, _al_vencer)
+        reloj.daemon = True
+        _temporizador = (vence, reloj)
+        reloj.start()
+    return espera
+
+
+def _al_vencer():
+    global _temporizador
+    with _pool_lock:
+        _temporizador = None
+    _ejecutor().submit(_drenar_en_hilo)
+
+
+def esperar_hilos() -> None:
+    """Espera a que el pool termine lo que tiene en curso (benchmarks, apagado)."""
+    global _pool, _temporizador
+    with _pool_lock:
+        pool, _pool = _pool, None
+        if _temporizador is not None:
+            _temporizador[1].cancel()
+            _temporizador = None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+# --------------------------------------------------------------------
+# Procesar
+# --------------------------------------------------------------------
+
+def procesar_una() -> bool:
+    """
+    Toma la siguiente tarea disponible y la ejecuta. Devuelve False si no
+    había ninguna.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        t = (
+            Tarea.objects
+            .select_for_update(skip_locked=True)
+            .filter(estado=Tarea.Estado.PENDIENTE, disponible_en__lte=ahora)
+            .order_by("disponible_en", "id")
+            .first()
+        )
+        if t is None:
+            return False
+
+        try:
+            manejador = MANEJADORES.get(t.tipo)
+            if manejador is None:
+                raise LookupError(f"Tipo de tarea desconocido: {t.tipo}")
+            with transaction.atomic():
+                manejador(**t.datos)
+        except Exception as e:
+            t.intentos += 1
+            t.error = f"{type(e).__name__}: {e}"[:2000]
+            if t.intentos >= MAX_INTENTOS:
+                t.estado = Tarea.Estado.FALLIDA
+                t.terminada_en = ahora
+                log.error("tareas.fallida", tarea=t.pk, tipo=t.tipo, clave=t.clave, error=t.error)
+            else:
+                t.disponible_en = ahora + timedelta(seconds=min(ESPERA_MAXIMA_S, 2 ** t.intentos))
+                log.warning("tareas.reintento", tarea=t.pk, tipo=t.tipo, intento=t.intentos, error=t.error)
+        else:
+            t.estado = Tarea.Estado.HECHA
+            t.terminada_en = ahora
+            t.error = ""
+
+        t.save(update_fields=["estado", "intentos", "error", "disponible_en", "terminada_en"])
+    return True
+
+
+def procesar_pendientes(limite=None) -> int:
+    """Procesa tareas hasta vaciar la cola (o `limite`). Devuelve cuántas tomó."""
+    n = 0
+    while (limite is None or n < limite) and procesar_una():
+        n += 1
+    return n
+
+
+def purgar_hechas(dias: int) -> int:
+    """Borra las tareas HECHA terminadas hace más de `dias` días."""
+    borradas, _ = Tarea.objects.filter(
+        estado=Tarea.Estado.HECHA,
+        terminada_en__lt=timezone.now() - timedelta(days=dias),
+    ).delete()
+    return borradas
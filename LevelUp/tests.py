@@ -1,3 +1,1172 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import logging
+import sqlite3
+import tempfile
+import threading
+import zipfile
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.http import QueryDict
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from gamificacion.curvas import nivel_estudiante, nivel_para_xp, progreso_para_xp, xp_para_subir
+from gamificacion.logros import registro_reglas
+from gamificacion.models import PerfilGamificacion, PuestoRanking, Recompensa, RecompensaUsuario
+from gamificacion.ranking import pagina_ranking, posicion_de
+
+from . import tareas
+from .models import (
+    Actividad, AnalisisActividad, Answer, AsignacionActividad, Asignatura, ClaveIdempotencia, Curso, Estudiante,
+    ItemActividad, Matricula, ResumenActividad, ResumenDocente, Submission, Tarea, Usuario,
+)
+from .analitica import analizar_pendientes, estadisticas_items, np
+from .asignaciones import asignar_actividad, sincronizar_asignaciones
+from .asignaturas import RegistroAsignaturas, registro_asignaturas
+from .benchmark import contar_escrituras, recorrer_colegio, sembrar_colegio
+from .mapas import mapa_compilado
+from .context_processors import levelup_context
+from .editor_items import guardar_items, leer_items_post
+from .importacion import hashear
+from .diagnostico import FormatoJSON, obtener_logger
+from .metricas import PresupuestoConsultasExcedido, _percentil, metricas
+from .preferencias import COOKIE_ASIGNATURA
+from .services import abrir_intento, finalizar_intento, registrar_respuesta, registrar_respuestas_lote
+from .tableros import recalcular_actividades, registrar_cierre, resumen_global
+from .tareas import MANEJADORES, encolar, procesar_pendientes
+
+
+def crear_estudiante(n=1):
+    usuario = Usuario.objects.create_user(
+        username=f"alumno{n}",
+        email=f"alumno{n}@levelup.test",
+        password="password",
+        rut=f"{10000000 + n}-1",
+        rol=Usuario.Rol.ESTUDIANTE,
+    )
+    return usuario, Estudiante.objects.get(usuario=usuario)
+
+
+def crear_actividad(n_items=3):
+    act = Actividad.objects.create(
+        titulo="Sumas", descripcion="Quiz de sumas", tipo="quiz", es_publicada=True,
+    )
+    items = [
+        ItemActividad.objects.create(
+            actividad=act, tipo="game", enunciado=f"Ítem {i}", puntaje=10, orden=i,
+            datos={"kind": "trivia", "questions": []},
+        )
+        for i in range(1, n_items + 1)
+    ]
+    return act, items
+
+
+PAYLOAD_OK = {"completado": True, "score": 1, "kind": "trivia", "meta": {"correctas": 3, "total": 3}}
+
+
+class IngestaRespuestasTests(TestCase):
+
+    def setUp(self):
+        self.usuario, self.estudiante = crear_estudiante()
+        self.actividad, self.items = crear_actividad()
+        AsignacionActividad.objects.create(estudiante=self.estudiante, actividad=self.actividad)
+
+    def test_respuesta_crea_intento_answer_y_recompensas(self):
+        res = registrar_respuesta(self.usuario, self.actividad, self.estudiante, self.items[0], PAYLOAD_OK)
+
+        sub = res["submission"]
+        self.assertEqual(sub.intento, 1)
+        answer = Answer.objects.get(pk=res["answer_id"])
+        self.assertTrue(answer.es_correcta)
+        self.assertEqual(answer.puntaje_obtenido, 10)
+        self.assertGreater(res["reward"]["xp"], 0)
+
+        asign = AsignacionActividad.objects.get(estudiante=self.estudiante, actividad=self.actividad)
+        self.assertEqual(asign.estado, AsignacionActividad.Estado.EN_PROGRESO)
+        # La XP se aplica en la cola, una sola vez por Answer
+        self.assertEqual(PerfilGamificacion.objects.get(usuario=self.usuario).xp_total, 0)
+        self.assertEqual(procesar_pendientes(), 1)
+        registrar_respuesta(self.usuario, self.actividad, self.estudiante, self.items[0], PAYLOAD_OK)
+        self.assertEqual(procesar_pendientes(), 0)
+        perfil = PerfilGamificacion.objects.get(usuario=self.usuario)
+        self.assertEqual(perfil.xp_total, res["reward"]["xp"])
+
+    def test_reenviar_mismo_item_actualiza_en_lugar_de_duplicar(self):
+        registrar_respuesta(self.usuario, self.actividad, self.estudiante, self.items[0], PAYLOAD_OK)
+        fallo = {"completado": True, "score": 0, "meta": {"correctas": 0, "total": 3}}
+        res = registrar_respuesta(self.usuario, self.actividad, self.estudiante, self.items[0], fallo)
+
+        self.assertEqual(Submission.objects.filter(estudiante=self.estudiante).count(), 1)
+        self.assertEqual(Answer.objects.count(), 1)
+        answer = Answer.objects.get()
+        self.assertEqual(answer.pk, res["answer_id"])
+        self.assertFalse(answer.es_correcta)
+
+    def test_numero_de_consultas_acotado(self):
+        # Intento ya abierto: el caso típico de cada ítem de la actividad
+        registrar_respuesta(self.usuario, self.actividad, self.estudiante, self.items[0], PAYLOAD_OK)
+
+        with self.assertNumQueries(8):
+            registrar_respuesta(self.usuario, self.actividad, self.estudiante, self.items[1], PAYLOAD_OK)
+
+    def test_finalizar_cierra_intento_y_el_siguiente_abre_otro(self):
+        registrar_respuesta(self.usuario, self.actividad, self.estudiante, self.items[0], PAYLOAD_OK)
+        res = finalizar_intento(self.usuario, self.actividad, self.estudiante)
+
+        self.assertTrue(res["submission"].finalizado)
+        asign = AsignacionActividad.objects.get(estudiante=self.estudiante, actividad=self.actividad)
+        self.assertEqual(asign.estado, AsignacionActividad.Estado.COMPLETADA)
+        procesar_pendientes()
+        self.assertEqual(PerfilGamificacion.objects.get(usuario=self.usuario).actividades_completadas, 1)
+
+        res = registrar_respuesta(self.usuario, self.actividad, self.estudiante, self.items[0], PAYLOAD_OK)
+        self.assertEqual(res["submission"].intento, 2)
+
+    def test_api_item_answer_y_finalizar(self):
+        self.client.force_login(self.usuario)
+        url = f"/api/actividades/{self.actividad.pk}/answer/{self.items[0].pk}/"
+        r = self.client.post(url, data={"payload": PAYLOAD_OK}, content_type="application/json")
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.json()["ok"])
+
+        r = self.client.post(
+            f"/api/actividades/{self.actividad.pk}/answer/0/",
+            data={"payload": {"completado": True, "finalizar": True}},
+            content_type="application/json",
+        )
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["intentos_usados"], 1)
+        self.assertFalse(r.json()["puede_reintentar"])
+
+    def test_lote_guarda_todo_y_finaliza(self):
+        resultados = [{"item_id": it.pk, "payload": PAYLOAD_OK} for it in self.items]
+        resultados.append({"item_id": 999999, "payload": PAYLOAD_OK})
+        res = registrar_respuestas_lote(
+            self.usuario, self.actividad, self.estudiante, resultados, finalizar=True,
+        )
+        procesar_pendientes()
+
+        self.assertTrue(res["submission"].finalizado)
+        self.assertEqual(set(res["answer_ids"]), {it.pk for it in self.items})
+        self.assertEqual(res["ignorados"], [999999])
+        self.assertEqual(Answer.objects.filter(submission=res["submission"]).count(), 3)
+        perfil = PerfilGamificacion.objects.get(usuario=self.usuario)
+        self.assertEqual(perfil.xp_total, res["reward"]["xp"])
+        self.assertEqual(perfil.actividades_completadas, 1)
+
+    def test_lote_payload_que_no_es_objeto(self):
+        resultados = [
+            {"item_id": self.items[0].pk, "payload": PAYLOAD_OK},
+            {"item_id": self.items[1].pk, "payload": ["x"]},
+            {"item_id": self.items[2].pk, "payload": "x"},
+        ]
+        res = registrar_respuestas_lote(self.usuario, self.actividad, self.estudiante, resultados)
+        self.assertEqual(res["ignorados"], [self.items[1].pk, self.items[2].pk])
+        self.assertEqual(list(res["answer_ids"]), [self.items[0].pk])
+
+    def test_api_lote(self):
+        self.client.force_login(self.usuario)
+        r = self.client.post(
+            f"/api/actividades/{self.actividad.pk}/answers/",
+            data={"items": [{"item_id": it.pk, "payload": PAYLOAD_OK} for it in self.items], "finalizar": True},
+            content_type="application/json",
+        )
+        self.assertEqual(r.status_code, 200)
+        data = r.json()
+        self.assertTrue(data["ok"])
+        self.assertEqual(data["intentos_usados"], 1)
+        self.assertEqual(Answer.objects.count(), 3)
+
+        for cuerpo in ("[]", '"x"', "{"):
+            r = self.client.post(
+                f"/api/actividades/{self.actividad.pk}/answers/", data=cuerpo, content_type="application/json",
+            )
+            self.assertEqual(r.status_code, 400, cuerpo)
+
+
+class DiagnosticoTests(TestCase):
+
+    def test_desactivado_no_evalua_campos(self):
+        log = obtener_logger("LevelUp.tests.apagado")
+        log.logger.setLevel(logging.WARNING)
+        llamadas = []
+        log.debug("evento", caro=lambda: llamadas.append(1))
+        self.assertEqual(llamadas, [])
+
+    @override_settings(LEVELUP_LOG_MUESTREO={"LevelUp.tests": 0.0})
+    def test_muestreo_no_afecta_warnings(self):
+        log = obtener_logger("LevelUp.tests.muestreo")
+        with self.assertLogs("LevelUp.tests.muestreo", level="DEBUG") as cm:
+            log.debug("descartado")
+            log.warning("siempre")
+        self.assertEqual([r.evento for r in cm.records], ["siempre"])
+
+    def test_formato_json(self):
+        log = obtener_logger("LevelUp.tests.json")
+        with self.assertLogs("LevelUp.tests.json", level="DEBUG") as cm:
+            log.info("item", item=7, kind=lambda: "trivia")
+        data = json.loads(FormatoJSON().format(cm.records[0]))
+        self.assertEqual(data["evento"], "item")
+        self.assertEqual(data["item"], 7)
+        self.assertEqual(data["kind"], "trivia")
+
+
+class MetricasVistaTests(TestCase):
+
+    def setUp(self):
+        metricas.limpiar()
+        self.usuario, _ = crear_estudiante()
+        self.client.force_login(self.usuario)
+
+    @override_settings(DEBUG=True)
+    def test_registra_consultas_y_encabezados(self):
+        r = self.client.get(reverse("ranking"))
+        self.assertEqual(r.status_code, 200)
+        self.assertGreater(int(r["X-DB-Queries"]), 0)
+
+        fila, = [f for f in metricas.resumen() if f["vista"] == "ranking"]
+        self.assertEqual(fila["n"], 1)
+        self.assertEqual(fila["consultas_max"], int(r["X-DB-Queries"]))
+        self.assertEqual(fila["excedidas"], 0)
+
+    @override_settings(LEVELUP_PRESUPUESTO_CONSULTAS_VISTA={"ranking": 1}, LEVELUP_PRESUPUESTO_ESTRICTO=True)
+    def test_presupuesto_estricto(self):
+        with self.assertRaises(PresupuestoConsultasExcedido), self.assertLogs("LevelUp.metricas", "WARNING"):
+            self.client.get(reverse("ranking"))
+        self.assertEqual(metricas.resumen()[0]["excedidas"], 1)
+
+    def test_percentil_rango_mas_cercano(self):
+        valores = [10, 20, 30, 40, 50, 60]
+        self.assertEqual(_percentil(valores, 50), 30)  # ceil(3) - 1 = índice 2
+        self.assertEqual(_percentil(valores, 95), 60)
+        self.assertEqual(_percentil(valores, 0), 10)
+        self.assertEqual(_percentil([], 50), 0)
+
+
+class ContextoGlobalTests(TestCase):
+
+    def setUp(self):
+        registro_asignaturas.invalidar()
+        self.usuario, _ = crear_estudiante()
+
+    def test_valores_perezosos_no_consultan(self):
+        request = RequestFactory().get("/")
+        request.user = self.usuario
+        request.session = {}
+        with self.assertNumQueries(0):
+            ctx = levelup_context(request)
+        self.assertEqual(ctx["perfil"].usuario_id, self.usuario.pk)
+        with self.assertNumQueries(0):
+            # Memoizado en el request: otro render no vuelve a consultar
+            levelup_context(request)["perfil"].nivel
+
+    @override_settings(LEVELUP_REGISTROS_REVISION=0)
+    def test_registro_ve_la_invalidacion_de_otro_proceso(self):
+        mate = Asignatura.objects.create(nombre="Matemáticas", slug="mate")
+        self.assertEqual(registro_asignaturas.por_id(mate.pk).nombre, "Matemáticas")
+        # Otro worker edita e invalida: aquí solo cambia la generación compartida
+        Asignatura.objects.filter(pk=mate.pk).update(nombre="Mate")
+        cache.set(RegistroAsignaturas.clave_generacion, "otra-generacion", None)
+        self.assertEqual(registro_asignaturas.por_id(mate.pk).nombre, "Mate")
+
+    def test_popup_de_logros_una_sola_fuente(self):
+        recompensa = Recompensa.objects.create(nombre="Nueva", slug="nueva")
+        perfil = PerfilGamificacion.objects.get(usuario=self.usuario)
+        RecompensaUsuario.objects.create(perfil=perfil, recompensa=recompensa)
+        request = RequestFactory().get("/")
+        request.user = self.usuario
+        request.session = {}
+        ctx = levelup_context(request)
+        self.assertNotIn("recompensas_nuevas", ctx)
+        self.assertIn("nueva", [ru.recompensa.slug for ru in ctx["nuevas_recompensas"]])
+        # Ya marcadas, pero el mismo request las sigue viendo
+        self.assertFalse(RecompensaUsuario.objects.filter(perfil=perfil, notificada=False).exists())
+        self.assertIn("nueva", [ru.recompensa.slug for ru in levelup_context(request)["nuevas_recompensas"]])
+
+    def test_registro_asignaturas(self):
+        mate = Asignatura.objects.create(nombre="Matemáticas", slug="mate")
+        ingles = Asignatura.objects.create(nombre="Inglés")
+        self.assertEqual(registro_asignaturas.todas(), [ingles, mate])
+        with self.assertNumQueries(0):
+            self.assertEqual(registro_asignaturas.por_slug("mate"), mate)
+            self.assertEqual(registro_asignaturas.por_slug("matematicas"), mate)
+            self.assertEqual(registro_asignaturas.por_slug("ingles"), ingles)
+            self.assertEqual(registro_asignaturas.por_id(mate.pk), mate)
+
+        # post_delete invalida el registro
+        ingles.delete()
+        self.assertEqual(registro_asignaturas.todas(), [mate])
+        self.assertIsNone(registro_asignaturas.por_slug("ingles"))
+
+
+class MapaMisionTests(TestCase):
+
+    def setUp(self):
+        self.usuario, _ = crear_estudiante()
+        self.actividad, self.items = crear_actividad(2)
+        self.client.force_login(self.usuario)
+        self.url = reverse("misiones_mapa_actividad", kwargs={"actividad_pk": self.actividad.pk})
+
+    def test_etag_y_304(self):
+        r = self.client.get(self.url)
+        self.assertEqual(r.status_code, 200)
+        data = json.loads(r.content)
+        self.assertEqual(data["actividad_id"], self.actividad.pk)
+        self.assertEqual([q["item_pk"] for q in data["questions"]], [it.pk for it in self.items])
+
+        r2 = self.client.get(self.url, HTTP_IF_NONE_MATCH=r["ETag"])
+        self.assertEqual(r2.status_code, 304)
+
+    def test_editar_item_recompila(self):
+        act = Actividad.objects.get(pk=self.actividad.pk)
+        _, etag = mapa_compilado("LevelUp/maps/escenario1.json", act)
+        with self.assertNumQueries(0):
+            self.assertEqual(mapa_compilado("LevelUp/maps/escenario1.json", act)[1], etag)
+
+        self.items[0].enunciado = "Otra pregunta"
+        self.items[0].save()
+        act.refresh_from_db()
+        contenido, etag2 = mapa_compilado("LevelUp/maps/escenario1.json", act)
+        self.assertNotEqual(etag, etag2)
+        self.assertEqual(json.loads(contenido)["questions"][0]["q"], "Otra pregunta")
+
+
+class EstadoAsignacionTests(TestCase):
+
+    def setUp(self):
+        self.usuario, self.estudiante = crear_estudiante()
+        self.client.force_login(self.usuario)
+
+    def _asignar(self, n_items=1, **kwargs):
+        actividad, items = crear_actividad(n_items)
+        asign = AsignacionActividad.objects.create(estudiante=self.estudiante, actividad=actividad, **kwargs)
+        return actividad, items, asign
+
+    def test_resumen_de_intentos_se_mantiene(self):
+        actividad, items, asign = self._asignar()
+        registrar_respuesta(self.usuario, actividad, self.estudiante, items[0], PAYLOAD_OK)
+        asign.refresh_from_db()
+        self.assertEqual((asign.intentos_usados, asign.intentos_abiertos, asign.intentos_finalizados), (1, 1, 0))
+
+        sub = finalizar_intento(self.usuario, actividad, self.estudiante)["submission"]
+        Submission.objects.filter(pk=sub.pk).update(calificacion=6.5)
+        sub.refresh_from_db()
+        sub.save()
+        asign.refresh_from_db()
+        self.assertEqual((asign.intentos_usados, asign.intentos_abiertos, asign.intentos_finalizados), (1, 0, 1))
+        self.assertEqual(asign.mejor_calificacion, 6.5)
+
+        sub.delete()
+        asign.refresh_from_db()
+        self.assertEqual(asign.intentos_usados, 0)
+        self.assertIsNone(asign.mejor_calificacion)
+
+    def test_lista_en_consultas_constantes(self):
+        url = reverse("estudiante_lista")
+        self._asignar()
+        self.client.get(url)  # calienta sesión / registro de asignaturas
+        with CaptureQueriesContext(connection) as pocas:
+            r = self.client.get(url)
+        self.assertEqual(len(r.context["rows"]), 1)
+
+        for _ in range(5):
+            self._asignar(intentos_permitidos=3)
+        with CaptureQueriesContext(connection) as muchas:
+            r = self.client.get(url)
+        self.assertEqual(len(r.context["rows"]), 6)
+        self.assertEqual(r.context["rows"][0]["max"], 3)
+        self.assertEqual(len(pocas), len(muchas))
+
+
+class ResultadosTests(TestCase):
+
+    def setUp(self):
+        self.usuario, self.estudiante = crear_estudiante()
+        self.actividad, self.items = crear_actividad(4)
+        AsignacionActividad.objects.create(estudiante=self.estudiante, actividad=self.actividad)
+        fallo = {"completado": True, "score": 0.5, "meta": {"correctas": 1, "total": 2}}
+        registrar_respuestas_lote(
+            self.usuario, self.actividad, self.estudiante,
+            [
+                {"item_id": self.items[0].pk, "payload": PAYLOAD_OK},
+                {"item_id": self.items[1].pk, "payload": fallo},
+            ],
+            finalizar=True,
+        )
+        self.client.force_login(self.usuario)
+        self.url = reverse("resolver_resultado", kwargs={"pk": self.actividad.pk})
+
+    def test_desglose_y_cache_en_submission(self):
+        r = self.client.get(self.url)
+        self.assertEqual(r.status_code, 200)
+        # 3 + 1 buenas de 3 + 2 + 1 + 1 (ítems sin respuesta cuentan como una pregunta)
+        self.assertEqual((r.context["total_buenas"], r.context["total_preguntas"]), (4, 7))
+        detalles = [row["detalle"]["correcto"] for row in r.context["items_data"]]
+        self.assertEqual(detalles, [True, False, False, False])
+        sub = Submission.objects.get(estudiante=self.estudiante)
+        self.assertIsNotNone(sub.resumen_resultados)
+
+        with CaptureQueriesContext(connection) as primera:
+            self.client.get(self.url + "?ver=solo_malas")
+        Answer.objects.filter(submission=sub).delete()
+        with CaptureQueriesContext(connection) as segunda:
+            r = self.client.get(self.url)
+        # Sale del resumen guardado: no vuelve a leer Answer
+        self.assertEqual(r.context["total_buenas"], 4)
+        self.assertEqual(len(primera), len(segunda))
+        self.assertFalse(any("levelup_answer" in q["sql"].lower() for q in segunda.captured_queries))
+        # El resumen del intento mostrado viene en la misma consulta de la lista
+        self.assertFalse(any('"resumen_resultados" FROM' in q["sql"] for q in segunda.captured_queries))
+        r = self.client.get(self.url + "?intento=1")
+        self.assertEqual(r.context["total_buenas"], 4)
+
+    def test_editar_actividad_recalcula(self):
+        self.client.get(self.url)
+        self.items[3].delete()
+        r = self.client.get(self.url)
+        self.assertEqual(len(r.context["items_data_all"]), 3)
+
+
+class LogrosTests(TestCase):
+
+    def setUp(self):
+        self.usuario, self.estudiante = crear_estudiante()
+        self.mate = Asignatura.objects.create(nombre="Matemáticas")
+        reglas = [
+            ("primer-paso-matematicas", "COMPLETADAS_ASIGNATURA", "mate", 1),
+            ("maestro-matematicas", "TODAS_ASIGNATURA", "mate", 1),
+            ("primer-cuento-lenguaje", "COMPLETADAS_ASIGNATURA", "lengua", 1),
+            ("racha-doble", "RACHA_PERFECTA", "", 2),
+        ]
+        for slug, regla, asignatura, umbral in reglas:
+            Recompensa.objects.create(
+                nombre=slug, slug=slug, regla=regla, regla_asignatura=asignatura, regla_umbral=umbral,
+            )
+
+    def _jugar(self, actividad, items, payload=PAYLOAD_OK):
+        """Juega y procesa la cola; devuelve lo que mostraría el popup."""
+        registrar_respuesta(self.usuario, actividad, self.estudiante, items[0], payload)
+        finalizar_intento(self.usuario, actividad, self.estudiante)
+        procesar_pendientes()
+        nuevas = list(RecompensaUsuario.objects.filter(perfil__usuario=self.usuario, notificada=False).order_by("id"))
+        RecompensaUsuario.objects.filter(pk__in=[ru.pk for ru in nuevas]).update(notificada=True)
+        return nuevas
+
+    def _actividad_de_mate(self):
+        actividad, items = crear_actividad(1)
+        Actividad.objects.filter(pk=actividad.pk).update(asignatura=self.mate)
+        actividad.refresh_from_db()
+        AsignacionActividad.objects.create(estudiante=self.estudiante, actividad=actividad, intentos_permitidos=3)
+        return actividad, items
+
+    def test_reglas_y_contadores(self):
+        primera, items1 = self._actividad_de_mate()
+        segunda, items2 = self._actividad_de_mate()
+
+        logros = self._jugar(primera, items1)
+        self.assertEqual([ru.recompensa.slug for ru in logros], ["primer-paso-matematicas"])
+
+        # Repetir la misma actividad no cuenta como otra completada
+        self._jugar(primera, items1, {"completado": True, "meta": {"correctas": 1, "total": 3}})
+        perfil = PerfilGamificacion.objects.get(usuario=self.usuario)
+        self.assertEqual(perfil.completadas_por_asignatura, {str(self.mate.pk): 1})
+        self.assertEqual(perfil.racha_perfecta, 0)
+
+        logros = self._jugar(segunda, items2)
+        self.assertEqual([ru.recompensa.slug for ru in logros], ["maestro-matematicas"])
+        logros = self._jugar(segunda, items2)
+        self.assertEqual([ru.recompensa.slug for ru in logros], ["racha-doble"])
+        self.assertEqual(
+            set(RecompensaUsuario.objects.filter(perfil=perfil).values_list("recompensa__slug", flat=True)),
+            {"primer-paso-matematicas", "maestro-matematicas", "racha-doble"},
+        )
+
+    def test_dos_cierres_antes_de_drenar_la_cola(self):
+        actividad, items = self._actividad_de_mate()
+        for _ in range(2):
+            registrar_respuesta(self.usuario, actividad, self.estudiante, items[0], PAYLOAD_OK)
+            finalizar_intento(self.usuario, actividad, self.estudiante)
+        procesar_pendientes()
+
+        perfil = PerfilGamificacion.objects.get(usuario=self.usuario)
+        self.assertEqual(perfil.completadas_por_asignatura, {str(self.mate.pk): 1})
+        self.assertTrue(RecompensaUsuario.objects.filter(
+            perfil=perfil, recompensa__slug="primer-paso-matematicas",
+        ).exists())
+
+    def test_nueva_regla_sin_cambios_de_codigo(self):
+        actividad, items = self._actividad_de_mate()
+        self._jugar(actividad, items)
+        Recompensa.objects.create(nombre="Perfecto", slug="perfecto", regla="RACHA_PERFECTA", regla_umbral=1)
+        otra, items2 = self._actividad_de_mate()
+        logros = self._jugar(otra, items2)
+        self.assertIn("perfecto", [ru.recompensa.slug for ru in logros])
+
+    def test_desbloqueo_por_umbrales(self):
+        Recompensa.objects.create(nombre="Fondo", slug="fondo", tipo="FONDO", xp_requerida=50)
+        Recompensa.objects.create(nombre="Capa", slug="capa", tipo="ACCESORIO", xp_requerida=500)
+        perfil = PerfilGamificacion.objects.get(usuario=self.usuario)
+
+        nuevas = perfil.agregar_xp(60)["recompensas_nuevas"]
+        self.assertEqual([ru.recompensa.slug for ru in nuevas], ["fondo"])
+        # Sin cruzar otro umbral: solo el UPDATE del perfil
+        with self.assertNumQueries(1):
+            self.assertEqual(perfil.agregar_xp(10)["recompensas_nuevas"], [])
+
+        nuevas = perfil.agregar_xp(1000)["recompensas_nuevas"]
+        self.assertEqual([ru.recompensa.slug for ru in nuevas], ["capa"])
+        self.assertEqual(RecompensaUsuario.objects.filter(perfil=perfil).count(), 2)
+
+
+class RankingTests(TestCase):
+
+    def setUp(self):
+        # (nombre, apellido, actividades): Carla lidera; el resto empata en 3
+        self.perfiles = {}
+        for n, (nombre, apellido, completadas) in enumerate((
+            ("beto", "Soto", 3), ("Carla", "Díaz", 5), ("Beto", "Soto", 3), ("Ana", "Rojas", 3),
+        ), start=1):
+            usuario, _ = crear_estudiante(n)
+            usuario.first_name, usuario.last_name = nombre, apellido
+            usuario.save()
+            perfil = PerfilGamificacion.objects.get(usuario=usuario)
+            perfil.actividades_completadas = completadas
+            perfil.save(update_fields=["actividades_completadas"])
+            self.perfiles[n] = perfil
+
+    def _orden(self):
+        return [p.perfil_id for p in pagina_ranking(1, por_pagina=10)]
+
+    def test_orden_desempates_y_posicion(self):
+        # Empates: nombre sin distinguir mayúsculas y, si es igual, el perfil más antiguo
+        esperado = [self.perfiles[n].pk for n in (2, 4, 1, 3)]
+        self.assertEqual(self._orden(), esperado)
+        self.assertEqual([posicion_de(pk) for pk in esperado], [1, 2, 3, 4])
+        self.assertEqual([p.perfil_id for p in pagina_ranking(2, por_pagina=3)], esperado[3:])
+
+    def test_puesto_sigue_a_actividades_completadas(self):
+        beto = self.perfiles[3]
+        beto.actividades_completadas = 6
+        beto.save(update_fields=["actividades_completadas"])
+        self.assertEqual(posicion_de(beto.pk), 1)
+        self.assertEqual(posicion_de(self.perfiles[2].pk), 2)
+        self.assertEqual(self._orden()[:2], [beto.pk, self.perfiles[2].pk])
+
+
+class CurvaXPTests(TestCase):
+
+    def test_forma_cerrada_igual_al_recorrido(self):
+        for xp in range(0, 60000, 97):
+            nivel, resto, n = 0, xp, 0
+            while resto >= xp_para_subir(nivel):
+                resto -= xp_para_subir(nivel)
+                nivel += 1
+            self.assertEqual(progreso_para_xp(xp), (nivel, resto))
+
+            while xp >= (n + 1) * (n + 1) * 100:
+                n += 1
+            self.assertEqual(nivel_estudiante(xp), max(1, n))
+
+    def test_xp_enorme_en_una_llamada(self):
+        _, estudiante = crear_estudiante()
+        perfil = PerfilGamificacion.objects.get(usuario=estudiante.usuario)
+        res = perfil.agregar_xp(10 ** 12)
+        self.assertEqual(perfil.nivel, nivel_para_xp(10 ** 12))
+        self.assertEqual(res["niveles_subidos"], perfil.nivel)
+        self.assertLess(perfil.xp_actual, perfil.xp_para_siguiente_nivel)
+
+        estudiante.xp = 10 ** 12
+        self.assertEqual(estudiante.nivel_calculado(), 100000)
+
+
+class AsignacionMasivaTests(TestCase):
+
+    def setUp(self):
+        self.actividad, _ = crear_actividad(1)
+        self.curso_a = Curso.objects.create(nivel=4, letra="A")
+        self.curso_b = Curso.objects.create(nivel=4, letra="B")
+        self.estudiantes = []
+        for n in range(1, 7):
+            usuario, est = crear_estudiante(n)
+            Matricula.objects.create(estudiante=usuario, curso=self.curso_a if n <= 4 else self.curso_b)
+            self.estudiantes.append(est)
+
+    def test_resuelve_y_reconcilia_en_consultas_fijas(self):
+        suelto = self.estudiantes[4].pk
+        # Alumnos + actuales + INSERT + resumen de intentos + resumen de la
+        # actividad (2 agregados y un upsert), y el savepoint
+        with self.assertNumQueries(9):
+            res = asignar_actividad(self.actividad, [str(self.curso_a.pk)], [suelto, "x"])
+        self.assertEqual((res["creadas"], res["quitadas"], res["total"]), (5, 0, 5))
+
+        # Reemplazar por el curso B: entra 1 (el 6), salen los 4 del curso A
+        res = asignar_actividad(self.actividad, [self.curso_b.pk], quitar=True)
+        self.assertEqual((res["creadas"], res["quitadas"]), (1, 4))
+        self.assertEqual(
+            set(AsignacionActividad.objects.filter(actividad=self.actividad).values_list("estudiante_id", flat=True)),
+            {self.estudiantes[4].pk, self.estudiantes[5].pk},
+        )
+
+    def test_reasignar_recupera_resumen_de_intentos(self):
+        est = self.estudiantes[0]
+        asignar_actividad(self.actividad, usuarios_ids=[est.pk])
+        registrar_respuesta(est.usuario, self.actividad, est, self.actividad.items.first(), PAYLOAD_OK)
+        sincronizar_asignaciones(self.actividad, set())
+        sincronizar_asignaciones(self.actividad, {est.pk})
+        asign = AsignacionActividad.objects.get(actividad=self.actividad, estudiante=est)
+        self.assertEqual(asign.intentos_usados, 1)
+
+
+    def test_accion_del_admin(self):
+        admin = Usuario.objects.create_superuser(
+            username="root", password="password", rut="9000000-1", rol=Usuario.Rol.ADMINISTRADOR,
+        )
+        self.client.force_login(admin)
+        url = reverse("admin:LevelUp_actividad_changelist")
+        datos = {"action": "asignar_a_curso", "_selected_action": [self.actividad.pk], "curso": self.curso_b.pk}
+        self.assertEqual(self.client.post(url, datos).status_code, 302)
+        self.assertEqual(
+            set(AsignacionActividad.objects.filter(actividad=self.actividad).values_list("estudiante_id", flat=True)),
+            {self.estudiantes[4].pk, self.estudiantes[5].pk},
+        )
+
+
+class EditorItemsTests(TestCase):
+
+    def _post(self, filas):
+        data = QueryDict(mutable=True)
+        data["items-TOTAL_FORMS"] = str(len(filas))
+        for i, fila in enumerate(filas):
+            for campo, valor in fila.items():
+                data[f"items-{i}-{campo}"] = valor
+        return leer_items_post(data)
+
+    def test_diff_en_bloque_y_reorden(self):
+        act, items = crear_actividad(3)
+        version = act.version_contenido
+        filas = self._post([
+            {"id": str(items[2].pk), "enunciado": "Tercero primero", "puntaje": "5"},
+            {"id": str(items[1].pk), "DELETE": "on"},
+            {"id": "", "enunciado": "Nuevo", "puntaje": "7", "game_time_limit": "30"},
+            {"id": "", "enunciado": "", "puntaje": ""},
+        ])
+        # Existentes + UPDATE + INSERT + versión + savepoint; el DELETE
+        # suma las cascadas a Answer y AnalisisItem y la señal post_delete del ítem
+        with self.assertNumQueries(11):
+            res = guardar_items(act, filas)
+        self.assertEqual((res["nuevos"], res["actualizados"], res["eliminados"]), (1, 1, 1))
+
+        filas = list(act.items.order_by("orden").values_list("enunciado", "orden", "datos"))
+        self.assertEqual([f[0] for f in filas], ["Tercero primero", "Nuevo", "Ítem 1"])
+        self.assertEqual([f[1] for f in filas], [1, 2, 3])
+        self.assertEqual(filas[1][2]["timeLimit"], 30)
+        act.refresh_from_db()
+        self.assertNotEqual(act.version_contenido, version)
+
+
+class BenchmarkJuegoTests(TestCase):
+
+    def test_recorrido_completo_sin_errores(self):
+        # Las recompensas sembradas desaparecen con el rollback del test
+        self.addCleanup(registro_reglas.invalidar)
+        sembrar_colegio(cursos=1, alumnos_por_curso=4, actividades=6, asignadas_por_curso=3, items_por_actividad=2)
+        recorrido = recorrer_colegio(jugadores=2, partidas_por_jugador=1)
+
+        self.assertEqual(recorrido.errores, [])
+        resumen = recorrido.resumen()
+        self.assertEqual(list(resumen), [
+            "estudiante_lista", "actividad_play", "api_item_answer", "finalizar", "actividad_resultados", "ranking",
+            "tarea_cola",
+        ])
+        self.assertEqual(resumen["tarea_cola"]["llamadas"], 6)  # 4 respuestas + 2 cierres
+        self.assertEqual(resumen["api_item_answer"]["llamadas"], 4)
+        self.assertEqual(Submission.objects.filter(finalizado=False).count(), 0)
+
+
+@override_settings(LEVELUP_TAREAS_MODO="worker")
+class IntentosConcurrentesTests(TransactionTestCase):
+    """
+    Hilos con conexiones propias. La BD de pruebas de SQLite es en memoria
+    (caché compartida, locks por tabla); para tener conexiones y locks
+    reales, la clase copia el esquema a un archivo temporal y lo usa solo
+    mientras corre.
+    """
+
+    HILOS = 8
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        if connection.vendor != "sqlite" or not connection.is_in_memory_db():
+            return
+        cls._dir = tempfile.TemporaryDirectory()
+        ruta = f"{cls._dir.name}/concurrencia.sqlite3"
+        connection.ensure_connection()
+        destino = sqlite3.connect(ruta)
+        connection.connection.backup(destino)
+        destino.close()
+        # La conexión en memoria se guarda aparte (cerrarla borraría la BD)
+        cls._en_memoria = (connection.settings_dict["NAME"], connection.connection)
+        connection.connection = None
+        connection.settings_dict["NAME"] = ruta
+
+    @classmethod
+    def tearDownClass(cls):
+        if hasattr(cls, "_en_memoria"):
+            connection.close()
+            connection.settings_dict["NAME"], connection.connection = cls._en_memoria
+            cls._dir.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.usuario, self.estudiante = crear_estudiante()
+        self.actividad, self.items = crear_actividad(self.HILOS)
+        AsignacionActividad.objects.create(estudiante=self.estudiante, actividad=self.actividad)
+
+    def _en_paralelo(self, funcion):
+        barrera = threading.Barrier(self.HILOS)
+        resultados, errores = [], []
+
+        def correr(i):
+            try:
+                barrera.wait()
+                resultados.append(funcion(i))
+            except Exception as e:  # noqa: BLE001 - se informa en el assert
+                errores.append(e)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=correr, args=(i,)) for i in range(self.HILOS)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        self.assertEqual(errores, [])
+        return resultados
+
+    def test_abrir_a_la_vez_devuelve_el_mismo_intento(self):
+        subs = self._en_paralelo(lambda i: abrir_intento(self.actividad, self.estudiante).pk)
+
+        self.assertEqual(len(set(subs)), 1)
+        self.assertEqual(Submission.objects.count(), 1)
+        self.assertEqual(Submission.objects.get().intento, 1)
+
+    def test_respuestas_simultaneas_van_al_mismo_intento(self):
+        finalizar_intento(self.usuario, self.actividad, self.estudiante)
+
+        self._en_paralelo(lambda i: registrar_respuesta(
+            self.usuario, self.actividad, self.estudiante, self.items[i], PAYLOAD_OK,
+        ))
+
+        abierto = Submission.objects.get(finalizado=False)
+        self.assertEqual(abierto.intento, 2)
+        self.assertEqual(Answer.objects.filter(submission=abierto).count(), self.HILOS)
+
+
+class TareasTests(TestCase):
+
+    def setUp(self):
+        self.usuario, self.estudiante = crear_estudiante()
+        self.llamadas = 0
+
+        def sumar_puntos(estudiante_id, puntos):
+            # Escribe y falla en la primera llamada: la escritura debe revertirse
+            Estudiante.objects.filter(pk=estudiante_id).update(puntos=F("puntos") + puntos)
+            self.llamadas += 1
+            if self.llamadas == 1:
+                raise RuntimeError("caída a mitad de la tarea")
+
+        MANEJADORES["prueba_puntos"] = sumar_puntos
+        self.addCleanup(MANEJADORES.pop, "prueba_puntos")
+
+    def test_fallo_revierte_reintenta_y_no_duplica(self):
+        datos = {"estudiante_id": self.estudiante.pk, "puntos": 5}
+        encolar([("prueba_puntos", "prueba:1", datos), ("prueba_puntos", "prueba:1", datos)])
+        self.assertEqual(Tarea.objects.count(), 1)
+
+        with self.assertLogs("LevelUp.tareas", "WARNING") as cm:
+            self.assertEqual(procesar_pendientes(), 1)
+        self.assertIn("tareas.reintento", cm.output[0])
+        tarea = Tarea.objects.get()
+        self.assertEqual((tarea.estado, tarea.intentos), (Tarea.Estado.PENDIENTE, 1))
+        self.assertIn("caída", tarea.error)
+        self.estudiante.refresh_from_db()
+        self.assertEqual(self.estudiante.puntos, 0)
+
+        # Modo "hilos": queda un temporizador para cuando venza el reintento
+        with override_settings(LEVELUP_TAREAS_MODO="hilos"):
+            espera = tareas.programar_siguiente()
+        self.addCleanup(tareas.esperar_hilos)
+        self.assertTrue(0 < espera <= 2)
+        self.assertTrue(tareas._temporizador[1].is_alive())
+        tareas.esperar_hilos()
+        self.assertIsNone(tareas._temporizador)
+
+        # Todavía en espera; al vencer se reintenta y se aplica una sola vez
+        self.assertEqual(procesar_pendientes(), 0)
+        Tarea.objects.update(disponible_en=timezone.now())
+        self.assertEqual(procesar_pendientes(), 1)
+        encolar([("prueba_puntos", "prueba:1", datos)])
+        self.assertEqual(procesar_pendientes(), 0)
+        self.estudiante.refresh_from_db()
+        self.assertEqual(self.estudiante.puntos, 5)
+        self.assertEqual(Tarea.objects.get().estado, Tarea.Estado.HECHA)
+
+    def test_popup_muestra_desbloqueos_de_la_cola(self):
+        recompensa = Recompensa.objects.create(nombre="Medalla de prueba", slug="medalla-prueba")
+        perfil = PerfilGamificacion.objects.get(usuario=self.usuario)
+        ru = RecompensaUsuario.objects.create(perfil=perfil, recompensa=recompensa)
+
+        self.client.force_login(self.usuario)
+        r = self.client.get(reverse("estudiante_lista"))
+        self.assertContains(r, "Medalla de prueba")
+        ru.refresh_from_db()
+        self.assertTrue(ru.notificada)
+        self.assertNotContains(self.client.get(reverse("estudiante_lista")), "Medalla de prueba")
+
+
+class IdempotenciaTests(TestCase):
+
+    def setUp(self):
+        self.usuario, self.estudiante = crear_estudiante()
+        self.actividad, self.items = crear_actividad()
+        AsignacionActividad.objects.create(estudiante=self.estudiante, actividad=self.actividad)
+        self.client.force_login(self.usuario)
+
+    def _post(self, item_id, payload, clave, cabecera="Idempotency-Key"):
+        return self.client.post(
+            f"/api/actividades/{self.actividad.pk}/answer/{item_id}/",
+            data={"payload": payload}, content_type="application/json",
+            headers={cabecera: clave},
+        )
+
+    def test_repeticion_devuelve_la_respuesta_guardada(self):
+        primera = self._post(self.items[0].pk, PAYLOAD_OK, "envio-00000001")
+        self.assertEqual(primera.status_code, 200)
+
+        # Sesión + usuario + la clave guardada: ni Answer, ni intento, ni cola
+        self.assertEqual(ClaveIdempotencia.objects.get().estado, ClaveIdempotencia.Estado.HECHA)
+        with self.assertNumQueries(3):
+            repetida = self._post(self.items[0].pk, PAYLOAD_OK, "envio-00000001")
+        self.assertEqual(repetida.content, primera.content)
+        self.assertEqual(repetida["Idempotent-Replayed"], "true")
+        self.assertEqual(Tarea.objects.count(), 1)
+
+        otra = self._post(self.items[0].pk, {"completado": False}, "envio-00000001")
+        self.assertEqual(otra.status_code, 422)
+
+    def test_x_request_id_no_deduplica(self):
+        # Es el id de correlación de los logs: repetirlo no es un reintento
+        self._post(self.items[0].pk, PAYLOAD_OK, "traza-00000001", cabecera="X-Request-Id")
+        r = self._post(self.items[1].pk, PAYLOAD_OK, "traza-00000001", cabecera="X-Request-Id")
+        self.assertEqual(r.status_code, 200)
+        self.assertFalse(r.has_header("Idempotent-Replayed"))
+        self.assertFalse(ClaveIdempotencia.objects.exists())
+
+    def test_clave_vencida_se_vuelve_a_tomar(self):
+        self._post(self.items[0].pk, PAYLOAD_OK, "envio-00000003")
+        ClaveIdempotencia.objects.update(vence_en=timezone.now())
+        r = self._post(self.items[0].pk, {"completado": False}, "envio-00000003")
+        self.assertEqual(r.status_code, 200)
+        self.assertFalse(r.has_header("Idempotent-Replayed"))
+        self.assertEqual(ClaveIdempotencia.objects.count(), 1)
+
+    def test_cierre_repetido_cuenta_una_vez(self):
+        self._post(self.items[0].pk, PAYLOAD_OK, "envio-00000002")
+        for _ in range(3):
+            r = self._post(0, {"completado": True, "finalizar": True}, "cierre-00000001")
+            self.assertEqual(r.json()["intentos_usados"], 1)
+        procesar_pendientes()
+
+        self.assertEqual(Submission.objects.filter(estudiante=self.estudiante).count(), 1)
+        self.assertEqual(PerfilGamificacion.objects.get(usuario=self.usuario).actividades_completadas, 1)
+
+
+class TablerosTests(TestCase):
+
+    def setUp(self):
+        self.docente_u = Usuario.objects.create_user(
+            username="profe", password="password", rut="9000000-1", rol=Usuario.Rol.DOCENTE,
+        )
+        self.usuario, self.estudiante = crear_estudiante()
+        self.usuario.first_name, self.usuario.last_name = "Ana", "Rojas"
+        self.usuario.save()
+        self.actividad, self.items = crear_actividad()
+        self.actividad.docente_id = self.docente_u.pk
+        self.actividad.save()
+        sincronizar_asignaciones(self.actividad, [self.estudiante.pk])
+
+    def test_cierre_actualiza_resumenes_y_portada_no_recuenta(self):
+        self.client.force_login(self.docente_u)
+        r = self.client.get(reverse("dashboard"))
+        self.assertEqual((r.context["total_actividades"], r.context["total_estudiantes"]), (1, 0))
+        self.assertEqual(ResumenActividad.objects.get(pk=self.actividad.pk).asignados, 1)
+
+        registrar_respuesta(self.usuario, self.actividad, self.estudiante, self.items[0], PAYLOAD_OK)
+        sub = finalizar_intento(self.usuario, self.actividad, self.estudiante)["submission"]
+        procesar_pendientes()
+        registrar_cierre(Submission.objects.get(pk=sub.pk))  # repetir no duplica el evento
+
+        resumen = ResumenDocente.objects.get(pk=self.docente_u.pk)
+        self.assertEqual(resumen.total_estudiantes, 1)
+        self.assertEqual([e["submission"] for e in resumen.eventos], [sub.pk])
+        self.assertEqual(ResumenActividad.objects.get(pk=self.actividad.pk).completados, 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get(reverse("dashboard"))
+        self.assertContains(r, "Ana Rojas")
+        self.assertFalse([q for q in ctx.captured_queries if "levelup_submission" in q["sql"]])
+
+    def test_totales_globales_se_invalidan_con_altas(self):
+        self.assertEqual(resumen_global().alumnos, 1)
+        crear_estudiante(2)
+        totales = resumen_global()
+        self.assertEqual((totales.alumnos, totales.estudiantes, totales.profesores), (2, 2, 1))
+        with self.assertNumQueries(1):
+            self.assertEqual(resumen_global().actividades, 1)
+
+        # Editar el perfil no cambia ningún total
+        self.client.force_login(self.usuario)
+        self.client.post(reverse("perfil_editar"), {
+            "first_name": "Ana", "last_name": "Soto", "email": self.usuario.email,
+        })
+        self.assertEqual(Usuario.objects.get(pk=self.usuario.pk).last_name, "Soto")
+        with self.assertNumQueries(1):
+            resumen_global()
+
+
+class AnalisisItemsTests(TestCase):
+
+    def setUp(self):
+        self.actividad, self.items = crear_actividad(n_items=2)
+        for it in self.items:
+            it.datos = {"kind": "trivia", "questions": [{"q": "¿2 + 2?", "opts": ["3", "4", "5"], "ans": 1}]}
+            it.save()
+        self.estudiantes = [crear_estudiante(n)[1] for n in range(1, 5)]
+        # Último intento de cada uno: A = [1, 1, 0, 1], B = [1, 0, 0, 1]
+        self._intento(self.estudiantes[1], 1, [0, 0])   # el anterior no cuenta
+        for est, puntajes in zip(self.estudiantes, ([1, 1], [1, 0], [0, 0], [1, 1])):
+            self._intento(est, 2 if est == self.estudiantes[1] else 1, puntajes)
+        recalcular_actividades([self.actividad.pk])
+
+    def _intento(self, estudiante, n, puntajes):
+        sub = Submission.objects.create(
+            actividad=self.actividad, estudiante=estudiante, intento=n,
+            finalizado=True, enviado_en=timezone.now(),
+        )
+        for item, ok in zip(self.items, puntajes):
+            Answer.objects.create(submission=sub, item=item, es_correcta=bool(ok), respuesta={
+                "completado": True, "score": ok,
+                "meta": {"correctas": ok, "total": 1, "detail": [{"q": 0, "opcion": 1 if ok else 0}]},
+            })
+
+    def test_estadistica_distractores_e_incremental(self):
+        analisis, = analizar_pendientes(motor="python")
+        self.assertEqual((analisis.alumnos, analisis.respuestas), (4, 8))
+        self.assertAlmostEqual(analisis.confiabilidad, 0.7273, places=4)
+        a, b = analisis.items.all()
+        self.assertEqual((a.p_valor, b.p_valor), (0.75, 0.5))
+        self.assertAlmostEqual(a.discriminacion, 0.5774, places=4)
+        self.assertEqual([o["veces"] for o in a.distractores[0]["opciones"]], [1, 3, 0])
+
+        # Sin entregas nuevas no hay nada que recalcular
+        self.assertEqual(analizar_pendientes(motor="python"), [])
+        self._intento(self.estudiantes[2], 2, [1, 1])
+        recalcular_actividades([self.actividad.pk])
+        analisis, = analizar_pendientes(motor="python")
+        self.assertEqual(analisis.items.all()[0].p_valor, 1.0)
+        self.assertEqual(AnalisisActividad.objects.count(), 1)
+
+        docente = Usuario.objects.create_user(username="profe", password="password", rut="9000000-1", rol=Usuario.Rol.DOCENTE)
+        Actividad.objects.filter(pk=self.actividad.pk).update(docente_id=docente.pk)
+        self.client.force_login(docente)
+        r = self.client.get(reverse("reportes_docente"), {"actividad": self.actividad.pk})
+        self.assertEqual(r.context["analisis"].pk, analisis.pk)
+
+    @skipUnless(np is not None, "NumPy no instalado")
+    def test_motores_coinciden(self):
+        filas, columnas, puntajes = [0, 0, 1, 2, 2, 3], [0, 1, 0, 0, 1, 1], [1, 0.5, 0, 1, 1, 0]
+        self.assertEqual(
+            estadisticas_items(filas, columnas, puntajes, 4, 2, motor="numpy"),
+            estadisticas_items(filas, columnas, puntajes, 4, 2, motor="python"),
+        )
+
+
+class ExportacionNotasTests(TestCase):
+
+    def setUp(self):
+        self.docente = Usuario.objects.create_user(
+            username="profe", password="password", rut="9000000-1", rol=Usuario.Rol.DOCENTE,
+        )
+        self.curso = Curso.objects.create(nivel=6, letra="A")
+        self.actividades = []
+        for titulo in ("Sumas", "Restas"):
+            act, _ = crear_actividad(n_items=1)
+            Actividad.objects.filter(pk=act.pk).update(titulo=titulo, docente_id=self.docente.pk)
+            self.actividades.append(act)
+        ajena, _ = crear_actividad(n_items=1)  # de otro docente: no se exporta
+
+        estudiantes = []
+        for n, apellido in ((1, "Zúñiga"), (2, "Araya"), (3, "Fuera")):
+            usuario, est = crear_estudiante(n)
+            estudiantes.append(est)
+            Usuario.objects.filter(pk=usuario.pk).update(last_name=apellido, first_name=f"Nombre{n}")
+            if n < 3:
+                Matricula.objects.create(estudiante=usuario, curso=self.curso)
+            for act in self.actividades + [ajena]:
+                AsignacionActividad.objects.create(estudiante=est, actividad=act)
+        AsignacionActividad.objects.filter(estudiante=estudiantes[1], actividad=self.actividades[0]).update(
+            mejor_calificacion=6.5, intentos_usados=2, fecha_completada="2026-03-10",
+        )
+        self.client.force_login(self.docente)
+
+    def _get(self, formato):
+        r = self.client.get(reverse("exportar_notas"), {"curso": self.curso.pk, "formato": formato})
+        self.assertTrue(r.streaming)
+        return b"".join(r.streaming_content)
+
+    def test_csv_xlsx_y_comando(self):
+        contenido = self._get("csv")
+        filas = list(csv.reader(io.StringIO(contenido.decode("utf-8-sig"))))
+        self.assertEqual(len(filas[0]), 3 + 2 * 3)
+        self.assertEqual(filas[0][3], "Sumas · nota")
+        self.assertEqual([f[1] for f in filas[1:]], ["Araya", "Zúñiga"])
+        self.assertEqual(filas[1][3:6], ["6.5", "2", "2026-03-10"])
+
+        with zipfile.ZipFile(io.BytesIO(self._get("xlsx"))) as zf:
+            self.assertIsNone(zf.testzip())
+            hoja = zf.read("xl/worksheets/sheet1.xml").decode("utf-8")
+        self.assertIn('<c r="D2"><v>6.5</v></c>', hoja)
+        self.assertIn("Zúñiga", hoja)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            salida = f"{tmp}/notas.csv"
+            call_command("exportar_notas", curso=self.curso.pk, formato="csv", salida=salida, stdout=io.StringIO())
+            with open(salida, encoding="utf-8-sig") as f:
+                filas = list(csv.reader(f))
+        # Sin filtro de docente: también la actividad ajena
+        self.assertEqual((len(filas), len(filas[0])), (3, 3 + 3 * 3))
+
+    def test_parametros_invalidos(self):
+        url = reverse("exportar_notas")
+        for params in ({"curso": "abc"}, {"actividad": "1x"}, {"curso": self.curso.pk, "formato": "pdf"}, {}):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+
+    def test_texto_no_se_evalua_como_formula(self):
+        Actividad.objects.filter(pk=self.actividades[0].pk).update(titulo="=HYPERLINK(\"http://x\")")
+        Usuario.objects.filter(last_name="Araya").update(last_name="@SUM(A1)", first_name="-2+3")
+        filas = list(csv.reader(io.StringIO(self._get("csv").decode("utf-8-sig"))))
+        self.assertEqual(filas[0][3], "'=HYPERLINK(\"http://x\") · nota")
+        self.assertEqual(filas[1][1:3], ["'@SUM(A1)", "'-2+3"])
+        self.assertEqual(filas[1][3], "6.5")  # los números no se tocan
+
+        hoja = zipfile.ZipFile(io.BytesIO(self._get("xlsx"))).read("xl/worksheets/sheet1.xml").decode("utf-8")
+        self.assertIn("<t xml:space=\"preserve\">'@SUM(A1)</t>", hoja)
+
+
+class ImportacionAlumnosTests(TestCase):
+
+    NOMINA = (
+        "RUT;Nombres;Apellidos;Email;Curso;Password\n"
+        "12345678-5;Ana;Rojas;Ana@colegio.cl;5A;\n"
+        "11.111.111-1;Beto;Soto;beto@colegio.cl;5° Básico A;OtraClave2024\n"
+        "abc;Carla;Díaz;carla@colegio.cl;5A;\n"                  # RUT inválido
+        "12.345.678-5;Ana;Repetida;ana2@colegio.cl;5A;\n"        # RUT repetido en el archivo
+        "10000001-1;Dani;Lagos;dani@colegio.cl;5A;\n"            # RUT ya registrado
+        "22222222-2;Eva;Muñoz;eva@colegio.cl;9Z;\n"              # curso inexistente
+    )
+
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(
+            username="admin", password="password", rut="9000000-1", rol=Usuario.Rol.ADMINISTRADOR,
+        )
+        crear_estudiante(1)
+        self.curso = Curso.objects.create(nivel=5, letra="A")
+        Recompensa.objects.create(nombre="Bienvenido", slug="bienvenido-levelup")
+        self.client.force_login(self.admin)
+
+    def test_carga_web_con_errores_por_fila(self):
+        archivo = io.BytesIO(("\ufeff" + self.NOMINA).encode("utf-8"))
+        archivo.name = "nomina.csv"
+        r = self.client.post(reverse("adm_importar_alumnos"), {
+            "archivo": archivo, "password_inicial": "Inicial2024!",
+        })
+        self.assertEqual(r.status_code, 200)
+        res = r.context["resultado"]
+        self.assertEqual((res.filas, res.creados), (6, 2))
+        self.assertEqual([linea for linea, _ in res.errores], [4, 5, 6, 7])
+
+        ana = Usuario.objects.get(rut="12.345.678-5")
+        self.assertEqual((ana.email, ana.username, ana.rol), ("ana@colegio.cl", "ana", Usuario.Rol.ESTUDIANTE))
+        self.assertTrue(ana.check_password("Inicial2024!"))
+        self.assertTrue(Usuario.objects.get(rut="11.111.111-1").check_password("OtraClave2024"))
+        self.assertTrue(Estudiante.objects.filter(usuario=ana, curso=str(self.curso)).exists())
+        self.assertTrue(Matricula.objects.filter(estudiante=ana, curso=self.curso).exists())
+        # Lo que normalmente dejan las señales de gamificación
+        perfil = PerfilGamificacion.objects.get(usuario=ana)
+        self.assertTrue(RecompensaUsuario.objects.filter(perfil=perfil, recompensa__slug="bienvenido-levelup").exists())
+        self.assertEqual(PuestoRanking.objects.get(perfil=perfil).nombre, "Ana Rojas")
+        self.assertEqual(resumen_global().alumnos, 3)
+
+    def test_comando_y_pool_de_hash(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta = f"{tmp}/nomina.csv"
+            with open(ruta, "w", encoding="utf-8") as f:
+                f.write("rut,nombres,apellidos,email,curso\n33333333-3,Fran,Paz,alumno1@colegio.cl,5A\n")
+            call_command("importar_alumnos", ruta, password_inicial="Inicial2024!",
+                         stdout=io.StringIO(), stderr=io.StringIO())
+        # El username "alumno1" ya existe: se toma el siguiente libre
+        self.assertEqual(Usuario.objects.get(rut="33.333.333-3").username, "alumno11")
+
+        with self.settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"]):
+            claves = [f"clave{i}" for i in range(20)]
+            hashes = hashear(claves, procesos=2)
+        self.assertEqual(len(hashes), 20)
+        self.assertTrue(all(h.startswith("md5$") for h in hashes))
+
+
+class SesionSinEscriturasTests(TestCase):
+
+    def setUp(self):
+        registro_asignaturas.invalidar()
+        self.usuario, self.estudiante = crear_estudiante()
+        self.mate = Asignatura.objects.create(nombre="Matemáticas", slug="mate")
+        self.lenguaje = Asignatura.objects.create(nombre="Lenguaje")
+        resumen_global()  # la primera lectura crea la fila de totales
+        self.client.force_login(self.usuario)
+
+    def _get(self, nombre, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get(reverse(nombre), params)
+        self.assertEqual(contar_escrituras(ctx), (0, 0), nombre)
+        return r
+
+    def test_asignatura_en_cookie_y_mensajes_sin_sesion(self):
+        # Sin cookie: la primera del navbar (orden por nombre), sin escribir nada
+        r = self._get("estudiante_lista")
+        self.assertEqual(r.context["asignatura_filtro"], self.lenguaje)
+
+        r = self._get("estudiante_set_asignatura", slug="mate")
+        self.assertIn(COOKIE_ASIGNATURA, r.cookies)
+        self.assertEqual(self._get("estudiante_lista").context["asignatura_filtro"], self.mate)
+        # Elegir la misma no reenvía la cookie
+        self.assertNotIn(COOKIE_ASIGNATURA, self._get("estudiante_set_asignatura", slug="mate").cookies)
+
+        for nombre in ("dashboard", "ranking", "recompensas", "perfil"):
+            self._get(nombre)
+        self.client.post(reverse("perfil_editar"), {
+            "first_name": "Ana", "last_name": "Soto", "email": self.usuario.email,
+        })
+        r = self._get("estudiante_lista")
+        self.assertContains(r, "Perfil actualizado correctamente.")
+
+        r = self.client.get(reverse("logout"))
+        self.assertEqual(r.cookies[COOKIE_ASIGNATURA].value, "")
@@ -22,6 +22,7 @@ urlpatterns = [
     path("actividades/", views.actividades_view, name="actividades"),
     path("gamificacion/ranking/", views.ranking_view, name="ranking"),
     path("reportes/docente/", views.reportes_docente_view, name="reportes_docente"),
+    path("reportes/notas/exportar/", views.exportar_notas, name="exportar_notas"),
 
     # PERFIL
     path("perfil/", views.perfil_view, name="perfil"),
@@ -49,6 +50,7 @@ urlpatterns = [
 
     # APIs de juego
     path("api/actividades/<int:pk>/answer/<int:item_id>/", views.api_item_answer, name="api_item_answer"),
+    path("api/actividades/<int:pk>/answers/", views.api_item_answers_lote, name="api_item_answers_lote"),
     path("api/actividades/<int:pk>/hint/<int:item_id>/", views.api_item_hint, name="api_item_hint"),
 
     # Misiones / mapa (para jugar.html + play.js)
@@ -90,6 +92,7 @@ urlpatterns = [
     path("panel/admin/listas/alumnos/", views.adm_list_alumnos, name="adm_list_alumnos"),
     path("panel/admin/listas/alumnos/<int:pk>/editar/", views.adm_alumno_editar, name="adm_alumno_editar"),
     path("panel/admin/listas/alumnos/<int:pk>/borrar/", views.adm_alumno_borrar, name="adm_alumno_borrar"),
+    path("panel/admin/listas/alumnos/importar/", views.adm_importar_alumnos, name="adm_importar_alumnos"),
 
     # Alumnos por curso
     path("panel/admin/listas/alumnos-por-curso/", views.adm_list_alumnos_por_curso, name="adm_list_alumnos_por_curso"),
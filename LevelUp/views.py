@@ -3,7 +3,7 @@ from __future__ import annotations
 import json
 from django.views.decorators.clickjacking import xframe_options_exempt
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, Http404, HttpResponseForbidden, JsonResponse, HttpResponseBadRequest
+from django.http import HttpResponse, Http404, HttpResponseForbidden, JsonResponse, HttpResponseBadRequest, HttpResponseNotModified, StreamingHttpResponse
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout, update_session_auth_hash, get_user_model
 from django.contrib.auth.decorators import login_required
@@ -15,37 +15,47 @@ from django.utils.timesince import timesince
 import time
 from django.db import transaction, models, connection
 from django.core.cache import cache
-from django.db.models import Count, Q, Prefetch, ProtectedError, Max, F
-from django.db.models.functions import Coalesce
+from django.db.models import Prefetch, ProtectedError
 from django.forms import inlineformset_factory, BaseInlineFormSet
 from django import get_version as django_get_version
 from django.views.decorators.http import require_POST
 from django.templatetags.static import static
-from django.contrib.staticfiles import finders
 from django import forms
 
-from .forms import RegistrationForm, LoginForm, ProfileForm, ActividadForm, ItemForm, CursoForm, AsignaturaForm, AsignacionDocenteForm, MatriculaForm, AdminUsuarioForm
-from .rewards import compute_rewards, apply_rewards
+from .forms import RegistrationForm, LoginForm, ProfileForm, ActividadForm, ItemForm, CursoForm, AsignaturaForm, AsignacionDocenteForm, MatriculaForm, AdminUsuarioForm, ImportarAlumnosForm
+from .services import abrir_intento, registrar_respuesta, registrar_respuestas_lote, finalizar_intento, resumen_intentos
+from .diagnostico import obtener_logger
+from .metricas import metricas
+from .asignaturas import registro_asignaturas
+from .mapas import mapa_compilado
+from .resultados import resultados_de_intento
+from .asignaciones import asignar_actividad, resolver_estudiantes, sincronizar_asignaciones
+from .editor_items import guardar_items, leer_items_post
+from .idempotencia import idempotente
+from .tableros import actividad_reciente, resumen_docente, resumen_global
+from .analitica import analizar_actividad, esta_desfasado
+from .exportacion import FORMATOS as FORMATOS_EXPORTACION, exportar
+from .importacion import importar_alumnos
+from .preferencias import asignatura_activa, olvidar_preferencias, recordar_asignatura
 
-from gamificacion.services import registrar_actividad_completada
 from gamificacion.services import obtener_o_crear_perfil
 from gamificacion.models import PerfilGamificacion
+from gamificacion.ranking import pagina_ranking, posicion_de
 
 from gamificacion.models import Recompensa, RecompensaUsuario
 
-from gamificacion.services import evaluar_logros_por_actividad
-
-from django.db.models import Case, When, IntegerField
+from django.db.models import Case, When, IntegerField, F, JSONField, Subquery, Value
 
 
 # Modelos
 from .models import (
     Usuario, Asignatura, Estudiante, Docente, Actividad, AsignacionActividad,
-    ItemActividad, Submission, Answer, Matricula,
-    GrupoRefuerzoNivelAlumno, GrupoRefuerzoNivel, NIVELES, Curso, AsignacionDocente
+    ItemActividad, Submission, Matricula,
+    GrupoRefuerzoNivelAlumno, GrupoRefuerzoNivel, NIVELES, Curso, AsignacionDocente, AnalisisItem
 )
 
 User = get_user_model()
+log = obtener_logger(__name__)
 
 # -------------------------------------------------------------------
 # Helpers de rol
@@ -72,43 +82,35 @@ def actividades_view(request):
 
 @login_required
 def ranking_view(request):
-
-    perfiles_qs = (
-        PerfilGamificacion.objects
-        .select_related("usuario")
-        .filter(usuario__rol=Usuario.Rol.ESTUDIANTE)
-    )
-
-    perfiles = list(perfiles_qs)
-
-    # Ordenar en memoria porque rango_numero es @property
-    perfiles.sort(
-        key=lambda p: (
-            -p.rango_numero,              # rango más alto primero
-            -p.actividades_completadas,   # más actividades primero
-            (p.usuario.get_full_name() or p.usuario.username or "").lower(),
-        )
-    )
+    """
+    Ranking general leído desde la tabla materializada PuestoRanking
+    (ya ordenada por índice): un número fijo de consultas por página,
+    sin importar cuántos estudiantes tenga el colegio.
+    """
+    pagina = pagina_ranking(request.GET.get("pagina"))
 
     ranking_rows = []
-    mi_posicion = None
-
-    for idx, p in enumerate(perfiles, start=1):
-        # Buscar Estudiante para la foto (si existe)
-        est = Estudiante.objects.filter(usuario=p.usuario).first()
+    for idx, puesto in enumerate(pagina.object_list, start=pagina.start_index()):
+        p = puesto.perfil
+        est = getattr(p.usuario, "estudiante", None)
 
         ranking_rows.append({
             "posicion": idx,
             "usuario": p.usuario,
             "foto": getattr(est, "foto_perfil", None),
-            "nombre": p.usuario.get_full_name() or p.usuario.username,
+            "nombre": puesto.nombre,
             "iniciales": (p.usuario.first_name or p.usuario.username)[:2].upper(),
             "rango": p.rango_timo,
-            "actividades": p.actividades_completadas,
+            "actividades": puesto.actividades_completadas,
         })
 
-        if p.usuario_id == request.user.id:
-            mi_posicion = idx
+    perfil_id = (
+        PerfilGamificacion.objects
+        .filter(usuario=request.user)
+        .values_list("pk", flat=True)
+        .first()
+    )
+    mi_posicion = posicion_de(perfil_id) if perfil_id else None
 
     return render(
         request,
@@ -116,17 +118,111 @@ def ranking_view(request):
         {
             "ranking_rows": ranking_rows,
             "mi_posicion": mi_posicion,
+            "pagina": pagina,
         }
     )
 
+def _alcance_reportes(user):
+    """
+    docente_id al que se limitan los reportes: el propio para docentes,
+    None (todo) para administradores; 404 para el resto.
+    """
+    if es_docente(user):
+        return user.pk
+    if user.is_superuser or getattr(user, "rol", None) == Usuario.Rol.ADMINISTRADOR:
+        return None
+    raise Http404
+
+
 @login_required
 def reportes_docente_view(request):
-    total_estudiantes = Estudiante.objects.count()
-    total_actividades = Actividad.objects.count()
+    """
+    Totales y análisis de ítems (LevelUp/analitica.py) de la actividad
+    elegida, leído de AnalisisActividad / AnalisisItem. POST recalcula
+    ese análisis (el comando analizar_items lo hace en lote).
+    """
+    totales = resumen_global()
+
+    docente_id = _alcance_reportes(request.user)
+    actividades = Actividad.objects.select_related("resumen").order_by("-id")
+    if docente_id is not None:
+        actividades = actividades.filter(docente_id=docente_id)
+
+    actividad = None
+    actividad_id = request.GET.get("actividad") or request.POST.get("actividad")
+    if actividad_id:
+        actividad = get_object_or_404(actividades, pk=actividad_id)
+
+    curso_id = request.GET.get("curso") or request.POST.get("curso") or None
+    curso = get_object_or_404(Curso, pk=curso_id) if curso_id else None
+
+    if request.method == "POST" and actividad:
+        analizar_actividad(actividad, curso.pk if curso else None)
+        messages.success(request, "Análisis recalculado.")
+        url = f"{reverse('reportes_docente')}?actividad={actividad.pk}"
+        return redirect(url + (f"&curso={curso.pk}" if curso else ""))
+
+    analisis = None
+    if actividad:
+        analisis = (
+            actividad.analisis
+            .filter(curso=curso)
+            .prefetch_related(Prefetch("items", queryset=AnalisisItem.objects.select_related("item")))
+            .first()
+        )
+
     return render(request, "LevelUp/reportes_docente.html", {
-        "total_estudiantes": total_estudiantes,
-        "total_actividades": total_actividades
+        "total_estudiantes": totales.estudiantes,
+        "total_actividades": totales.actividades,
+        "actividades": actividades[:100],
+        "actividad": actividad,
+        "cursos": Curso.objects.only("id", "nivel", "letra").order_by("nivel", "letra"),
+        "curso": curso,
+        "analisis": analisis,
+        "desfasado": bool(analisis and esta_desfasado(analisis, actividad)),
     })
+
+
+@login_required
+def exportar_notas(request):
+    """
+    Libro de notas (?curso= y/o ?actividad=, ?formato=csv|xlsx) en
+    streaming; ver LevelUp/exportacion.py. Los docentes solo exportan sus
+    actividades.
+    """
+    docente_id = _alcance_reportes(request.user)
+
+    formato = request.GET.get("formato", "xlsx")
+    if formato not in FORMATOS_EXPORTACION:
+        return HttpResponseBadRequest("Formato no soportado")
+
+    curso_id = request.GET.get("curso") or None
+    actividad_id = request.GET.get("actividad") or None
+    if not all(v is None or v.isdigit() for v in (curso_id, actividad_id)):
+        return HttpResponseBadRequest("Curso o actividad inválidos")
+
+    curso = get_object_or_404(Curso, pk=curso_id) if curso_id else None
+    actividad = None
+    if actividad_id:
+        actividades = Actividad.objects.all()
+        if docente_id is not None:
+            actividades = actividades.filter(docente_id=docente_id)
+        actividad = get_object_or_404(actividades, pk=actividad_id)
+    if curso is None and actividad is None:
+        return HttpResponseBadRequest("Indica un curso o una actividad")
+
+    nombre = slugify(f"notas {curso or ''} {actividad.titulo if actividad else ''}")
+    respuesta = StreamingHttpResponse(
+        exportar(
+            formato,
+            curso_id=curso.pk if curso else None,
+            actividad_id=actividad.pk if actividad else None,
+            docente_id=docente_id,
+        ),
+        content_type=FORMATOS_EXPORTACION[formato],
+    )
+    respuesta["Content-Disposition"] = f'attachment; filename="{nombre}-{timezone.localdate():%Y%m%d}.{formato}"'
+    return respuesta
     
 @login_required
 def recompensas_view(request):
@@ -267,13 +363,11 @@ def login_view(request):
 
 @login_required
 def logout_view(request):
-    
-    # Limpiar asignatura activa del estudiante al cerrar sesión
-    for key in ("asignatura_activa_slug", "asignatura_activa_nombre", "asignatura_activa_icono"):
-        request.session.pop(key, None)
-
     logout(request)
-    return redirect("home")
+    respuesta = redirect("home")
+    # Limpiar asignatura activa del estudiante al cerrar sesión
+    olvidar_preferencias(respuesta)
+    return respuesta
 
 # -------------------------------------------------------------------
 # Portal por rol (/inicio/)
@@ -308,89 +402,23 @@ def home_view(request):
             })
         except Estudiante.DoesNotExist:
             ctx.update({"nivel": 1, "puntos": 0, "medallas": 0, "curso": "Sin curso"})
-        ctx["actividades_count"] = Actividad.objects.count()
+        ctx["actividades_count"] = resumen_global().actividades
         ctx["perfil"] = perfil 
 
     elif rol == Usuario.Rol.DOCENTE:
-        # ----- Docente actual -----
-        docente = Docente.objects.filter(usuario=request.user).first()
-
-        if docente:
-            actividades_docente = Actividad.objects.filter(docente=docente)
-        else:
-            actividades_docente = Actividad.objects.none()
-
-        total_actividades = actividades_docente.count()
-
-        subs_qs = (
-            Submission.objects
-            .filter(
-                actividad__in=actividades_docente,
-                finalizado=True,
-                actividad__asignacionactividad__estudiante=F("estudiante"),
-            )
-            # usa la fecha de envío, y si falta, la de inicio
-            .annotate(
-                fecha_evento=Coalesce("enviado_en", "iniciado_en")
-            )
-            .select_related("actividad", "estudiante__usuario")
-        )
-
-        total_estudiantes = subs_qs.values("estudiante_id").distinct().count()
-
-        # ----- Actividad reciente -----
-        # orden de más reciente a más antigua 
-        recientes = subs_qs.order_by("-fecha_evento", "-id")[:5]
-
-        actividad_reciente = []
-
-        for sub in recientes:
-            est = sub.estudiante
-            user_est = getattr(est, "usuario", None) or est
-
-            nombre = (
-                user_est.get_full_name()
-                or user_est.first_name
-                or user_est.username
-            )
-
-            # Iniciales para el avatar
-            partes = nombre.split()
-            if len(partes) >= 2:
-                iniciales = (partes[0][0] + partes[-1][0]).upper()
-            else:
-                iniciales = nombre[:2].upper()
-
-            # fecha a mostrar: enviado_en si existe, si no la anotada (fecha_evento)
-            fecha_evento = sub.enviado_en or getattr(sub, "fecha_evento", None) or sub.iniciado_en
-            if fecha_evento:
-                hace_str = fecha_evento.strftime("%d/%m/%Y %H:%M hrs")
-            else:
-                hace_str = "Sin fecha"
-
-            actividad_reciente.append({
-                "iniciales": iniciales,
-                "estudiante_nombre": nombre,
-                "actividad_titulo": sub.actividad.titulo,
-                "descripcion": "completó",
-                "hace": hace_str,
-                "badge_tipo": "completado",
-                "puntos": 0,
-                "badge_texto": "Completado",
-            })
+        # ----- Resumen del docente (LevelUp/tableros.py) -----
+        # Docente.pk == usuario_id
+        resumen = resumen_docente(request.user.pk)
 
         ctx.update({
-            "total_estudiantes": total_estudiantes,
-            "total_actividades": total_actividades,
-            "actividad_reciente": actividad_reciente,
+            "total_estudiantes": resumen.total_estudiantes if resumen else 0,
+            "total_actividades": resumen.total_actividades if resumen else 0,
+            "actividad_reciente": actividad_reciente(resumen, limite=5),
         })
 
     elif rol == Usuario.Rol.ADMINISTRADOR:
-        # --- KPIs ---
-        alumnos = User.objects.filter(rol=Usuario.Rol.ESTUDIANTE).count()
-        profesores = User.objects.filter(rol=Usuario.Rol.DOCENTE).count()
-        cursos = Curso.objects.count()
-        asignaturas = Asignatura.objects.count()
+        # --- KPIs (LevelUp/tableros.py) ---
+        totales = resumen_global()
 
         # --- Salud del sistema ---
         # Servidor
@@ -423,15 +451,16 @@ def home_view(request):
         latency_ms = int((time.perf_counter() - t0) * 1000)
 
         ctx.update({
-            "alumnos_total": alumnos,
-            "profesores_total": profesores,
-            "cursos_total": cursos,
-            "asignaturas_total": asignaturas,
+            "alumnos_total": totales.alumnos,
+            "profesores_total": totales.profesores,
+            "cursos_total": totales.cursos,
+            "asignaturas_total": totales.asignaturas,
 
             "health": {
                 "server": {"ok": server_ok, "time": server_time, "version": server_version},
                 "db": {"ok": db_ok, "vendor": db_vendor, "name": db_name},
                 "cache": {"ok": cache_ok, "backend": cache_backend, "latency_ms": latency_ms},
+                "vistas": metricas.resumen(limite=10),
             },
             "cursos_list": Curso.objects.only("id", "nivel", "letra").order_by("nivel", "letra"),
         })
@@ -451,7 +480,8 @@ def perfil_editar_view(request):
     if request.method == "POST":
         form = ProfileForm(request.POST, instance=request.user)
         if form.is_valid():
-            form.save()
+            # Solo los campos del formulario: no invalida los totales del portal
+            form.instance.save(update_fields=["first_name", "last_name", "email"])
             messages.success(request, "Perfil actualizado correctamente.")
             return redirect("perfil")
         messages.error(request, "Revisa los campos del formulario.")
@@ -807,6 +837,23 @@ def adm_alumno_borrar(request, pk):
 
     return redirect("adm_list_alumnos")
 
+# Carga masiva de alumnos desde CSV
+@admin_required
+def adm_importar_alumnos(request):
+    resultado = None
+    form = ImportarAlumnosForm(request.POST or None, request.FILES or None)
+    if request.method == "POST" and form.is_valid():
+        resultado = importar_alumnos(
+            form.cleaned_data["archivo"],
+            password_inicial=form.cleaned_data["password_inicial"] or None,
+        )
+        form = ImportarAlumnosForm()
+
+    return render(request, "LevelUp/admin/importar_alumnos.html", {
+        "form": form,
+        "resultado": resultado,
+    })
+
 # ===================================================================
 # Flujo de Actividades (Docente y Estudiante)
 # ===================================================================
@@ -817,7 +864,7 @@ def actividades_docente_lista(request):
         raise Http404
     docente = Docente.objects.filter(usuario=request.user).first()
 
-    qs = (Actividad.objects.select_related("docente", "asignatura").order_by("-id"))
+    qs = (Actividad.objects.select_related("docente", "asignatura", "resumen").order_by("-id"))
     if docente:
         qs = qs.filter(docente=docente)
 
@@ -902,10 +949,7 @@ def actividad_crear(request):
             actividad_tipo=tipo_norm,
         )
 
-        print("\n" + "=" * 60)
-        print("➕ CREAR ACTIVIDAD")
-        print(f"   request.POST.get('items-TOTAL_FORMS'): {request.POST.get('items-TOTAL_FORMS')}")
-        print("=" * 60)
+        log.debug("actividad_crear.inicio", total_forms=request.POST.get("items-TOTAL_FORMS"))
 
         if form.is_valid():
             with transaction.atomic():
@@ -917,122 +961,21 @@ def actividad_crear(request):
                 act.save()
                 form.save_m2m()
 
-                print(f"   ✅ Actividad creada (ID: {act.pk})")
-
-                # 2) Procesar ítems directamente desde request.POST
-                items_guardados = 0
-
-                total_forms_raw = request.POST.get("items-TOTAL_FORMS", "0")
-                try:
-                    total_forms = int(total_forms_raw)
-                except Exception:
-                    total_forms = 0
-
-                print("\n🔄 PROCESAMIENTO DIRECTO:")
-                print(f"   TOTAL_FORMS: {total_forms}")
-
-                for i in range(total_forms):
-                    delete_raw = request.POST.get(f"items-{i}-DELETE", "")
-                    enun = request.POST.get(f"items-{i}-enunciado", "").strip()
-                    punt_raw = request.POST.get(f"items-{i}-puntaje", "").strip()
-                    payload = request.POST.get(f"items-{i}-game_pairs", "").strip()
-                    item_kind = request.POST.get(f"items-{i}-item_kind", "trivia").strip()
-                    time_limit_raw = request.POST.get(f"items-{i}-game_time_limit", "")
-
-                    print(f"\n   📋 Form {i}:")
-                    print(f"      enunciado: '{enun[:30]}...'")
-                    print(f"      puntaje: '{punt_raw}'")
-                    print(f"      payload: {len(payload)} chars")
-
-                    # Ítem marcado para borrar -> ignorar
-                    if delete_raw in ("1", "true", "True", "on"):
-                        print("      ⏭️ Marcado DELETE, saltando")
-                        continue
-
-                    try:
-                        punt = int(punt_raw) if punt_raw else 0
-                    except Exception:
-                        punt = 0
-
-                    try:
-                        time_limit = int(time_limit_raw) if time_limit_raw else None
-                    except Exception:
-                        time_limit = None
-
-                    tiene_contenido = bool(payload or enun or punt)
-                    if not tiene_contenido:
-                        print("      ⏭️ Sin contenido, saltando")
-                        continue
-
-                    print("      ✅ Tiene contenido, creando ítem...")
-
-                    try:
-                        if payload:
-                            datos = json.loads(payload)
-                        else:
-                            datos = {"kind": item_kind, "questions": []}
-                    except Exception as e:
-                        print(f"         ⚠️ Error parseando JSON: {e}")
-                        datos = {"kind": item_kind, "questions": []}
-
-                    if time_limit:
-                        datos["timeLimit"] = time_limit
-
-                    max_orden = (
-                        ItemActividad.objects
-                        .filter(actividad=act)
-                        .aggregate(Max("orden"))["orden__max"] or 0
-                    )
+                log.debug("actividad_crear.creada", actividad=act.pk)
 
-                    try:
-                        item = ItemActividad.objects.create(
-                            actividad=act,
-                            enunciado=enun,
-                            puntaje=punt,
-                            datos=datos,
-                            tipo="game",
-                            orden=max_orden + 1,
-                        )
-                        items_guardados += 1
-                        print(f"         ✅ Ítem guardado (ID: {item.pk})")
-                    except Exception as e:
-                        print(f"         ❌ ERROR: {e}")
+                # 2) Ítems del builder en bloque (LevelUp/editor_items.py)
+                items_guardados = guardar_items(act, leer_items_post(request.POST))["guardados"]
 
                 # 3) Asignar a cursos / alumnos 
-                cursos_ids = [int(x) for x in request.POST.getlist("cursos") if str(x).strip()]
-                alumnos_usuario_ids = [int(x) for x in request.POST.getlist("alumnos") if str(x).strip()]
-
-                estudiantes_pks = set()
-
-                if cursos_ids:
-                    usuarios_de_cursos = Matricula.objects.filter(
-                        curso_id__in=cursos_ids
-                    ).values_list("estudiante_id", flat=True)
-
-                    est_from_cursos = Estudiante.objects.filter(
-                        usuario_id__in=usuarios_de_cursos
-                    ).values_list("pk", flat=True)
-
-                    estudiantes_pks.update(est_from_cursos)
-
-                if alumnos_usuario_ids:
-                    est_from_alumnos = Estudiante.objects.filter(
-                        usuario_id__in=alumnos_usuario_ids
-                    ).values_list("pk", flat=True)
-                    estudiantes_pks.update(est_from_alumnos)
-
-                creadas = 0
-                for est_pk in estudiantes_pks:
-                    _, created = AsignacionActividad.objects.get_or_create(
-                        actividad=act,
-                        estudiante_id=est_pk,
-                    )
-                    if created:
-                        creadas += 1
+                estudiantes_pks = resolver_estudiantes(
+                    request.POST.getlist("cursos"), request.POST.getlist("alumnos"),
+                )
+                creadas = sincronizar_asignaciones(act, estudiantes_pks, quitar=False)["creadas"]
 
-                print("\n💾 RESUMEN:")
-                print(f"   Ítems creados: {items_guardados}")
-                print(f"   Asignaciones: {creadas}")
+                log.info(
+                    "actividad_crear.resumen",
+                    actividad=act.pk, items=items_guardados, asignaciones=creadas,
+                )
 
                 if estudiantes_pks:
                     if creadas > 0:
@@ -1054,7 +997,7 @@ def actividad_crear(request):
             return redirect("docente_lista")
 
         # Form principal inválido: se muestran errores y se sigue hasta el render final con form + formset.
-        print(f"\n❌ Form inválido: {form.errors}")
+        log.info("actividad_crear.form_invalido", errores=lambda: form.errors.get_json_data())
         messages.error(request, "Revisa los errores en el formulario.")
     else:
         # GET inicial
@@ -1095,7 +1038,6 @@ def actividad_editar(request, pk):
 
     # Cargar TODOS los ítems existentes
     qs_items = ItemActividad.objects.filter(actividad=act).order_by("orden", "id")
-    items_iniciales = qs_items.count()
 
     if request.method == "POST":
         form = ActividadForm(request.POST, request.FILES, instance=act)
@@ -1110,12 +1052,12 @@ def actividad_editar(request, pk):
             actividad_tipo=tipo_norm,
         )
         
-        # DEBUG INICIAL
-        print("\n" + "="*60)
-        print(f"✏️ EDITAR ACTIVIDAD #{pk}")
-        print(f"   Ítems iniciales en BD: {items_iniciales}")
-        print(f"   request.POST.get('items-TOTAL_FORMS'): {request.POST.get('items-TOTAL_FORMS')}")
-        print("="*60)
+        log.debug(
+            "actividad_editar.inicio",
+            actividad=pk,
+            items_iniciales=lambda: qs_items.count(),
+            total_forms=request.POST.get("items-TOTAL_FORMS"),
+        )
 
         # Validar solo el form principal (actividad)
         if form.is_valid():
@@ -1129,184 +1071,23 @@ def actividad_editar(request, pk):
                 obj.save()
                 form.save_m2m()
 
-                # 2) Procesar ítems directamente desde request.POST
-                items_guardados = 0
-                items_actualizados = 0
-                items_nuevos = 0
-                items_eliminados = 0
-                
-                # Obtener TOTAL_FORMS del POST
-                total_forms_raw = request.POST.get("items-TOTAL_FORMS", "0")
-                try:
-                    total_forms = int(total_forms_raw)
-                except:
-                    total_forms = 0
-                
-                print(f"\n🔄 PROCESAMIENTO DIRECTO desde POST:")
-                print(f"   TOTAL_FORMS: {total_forms}")
-                print(f"   Ítems actuales en BD: {ItemActividad.objects.filter(actividad=obj).count()}")
-                
-                for i in range(total_forms):
-                    # Leer datos DIRECTOS del POST
-                    item_id_raw = request.POST.get(f"items-{i}-id", "").strip()
-                    delete_raw = request.POST.get(f"items-{i}-DELETE", "")
-                    enun = request.POST.get(f"items-{i}-enunciado", "").strip()
-                    punt_raw = request.POST.get(f"items-{i}-puntaje", "").strip()
-                    payload = request.POST.get(f"items-{i}-game_pairs", "").strip()
-                    item_kind = request.POST.get(f"items-{i}-item_kind", "trivia").strip()
-                    time_limit_raw = request.POST.get(f"items-{i}-game_time_limit", "")
-                    
-                    print(f"\n   📋 Form {i}:")
-                    print(f"      items-{i}-id: '{item_id_raw}'")
-                    print(f"      items-{i}-DELETE: '{delete_raw}'")
-                    print(f"      items-{i}-enunciado: '{enun[:30]}...'")
-                    print(f"      items-{i}-puntaje: '{punt_raw}'")
-                    print(f"      items-{i}-game_pairs: {len(payload)} chars")
-                    
-                    # Parsear valores
-                    try:
-                        item_id = int(item_id_raw) if item_id_raw and item_id_raw not in ("", "None", "none") else None
-                    except:
-                        item_id = None
-                    
-                    try:
-                        punt = int(punt_raw) if punt_raw else 0
-                    except:
-                        punt = 0
-                    
-                    try:
-                        time_limit = int(time_limit_raw) if time_limit_raw else None
-                    except:
-                        time_limit = None
-                    
-                    # Verificar DELETE
-                    if delete_raw in ("1", "true", "True", "on"):
-                        if item_id:
-                            try:
-                                ItemActividad.objects.filter(pk=item_id, actividad=obj).delete()
-                                items_eliminados += 1
-                                print(f"      🗑️ ELIMINADO (ID={item_id})")
-                            except Exception as e:
-                                print(f"      ⚠️ Error eliminando ID={item_id}: {e}")
-                        else:
-                            print(f"      ⏭️ DELETE sin ID, saltando")
-                        continue
-                    
-                    # Verificar contenido
-                    tiene_contenido = bool(payload or enun or punt)
-                    
-                    if not tiene_contenido:
-                        print(f"      ⏭️ Sin contenido, saltando")
-                        continue
-                    
-                    print(f"      ✅ Tiene contenido, procesando...")
-                    
-                    # Parsear datos JSON
-                    try:
-                        if payload:
-                            import json
-                            datos = json.loads(payload)
-                            print(f"         JSON parseado: kind={datos.get('kind')}")
-                        else:
-                            datos = {"kind": item_kind, "questions": []}
-                            print(f"         JSON default: kind={item_kind}")
-                    except Exception as e:
-                        print(f"         ⚠️ Error parseando JSON: {e}")
-                        datos = {"kind": item_kind, "questions": []}
-                    
-                    # Agregar time_limit si existe
-                    if time_limit:
-                        datos["timeLimit"] = time_limit
-                    
-                    # GUARDAR o ACTUALIZAR
-                    if item_id:
-                        # ACTUALIZAR existente
-                        try:
-                            item = ItemActividad.objects.get(pk=item_id, actividad=obj)
-                            item.enunciado = enun
-                            item.puntaje = punt
-                            item.datos = datos
-                            item.tipo = "game"
-                            item.save()
-                            items_actualizados += 1
-                            items_guardados += 1
-                            print(f"         ✅ ACTUALIZADO (ID: {item_id})")
-                        except ItemActividad.DoesNotExist:
-                            print(f"         ⚠️ ID {item_id} no encontrado en BD")
-                            item_id = None
-                    
-                    if not item_id:
-                        # CREAR nuevo
-                        max_orden = (ItemActividad.objects
-                                   .filter(actividad=obj)
-                                   .aggregate(Max('orden'))['orden__max'] or 0)
-                        
-                        print(f"         🆕 Creando nuevo ítem (orden={max_orden + 1})...")
-                        
-                        try:
-                            item = ItemActividad.objects.create(
-                                actividad=obj,
-                                enunciado=enun,
-                                puntaje=punt,
-                                datos=datos,
-                                tipo="game",
-                                orden=max_orden + 1
-                            )
-                            items_nuevos += 1
-                            items_guardados += 1
-                            print(f"         ✅ NUEVO guardado (ID: {item.pk}, orden: {item.orden})")
-                        except Exception as e:
-                            print(f"         ❌ ERROR creando ítem: {e}")
-                            import traceback
-                            traceback.print_exc()
+                # 2) Ítems: diff contra los existentes y escrituras en bloque
+                #    (LevelUp/editor_items.py)
+                res_items = guardar_items(obj, leer_items_post(request.POST))
+                items_guardados = res_items["guardados"]
+                items_actualizados = res_items["actualizados"]
+                items_nuevos = res_items["nuevos"]
+                items_eliminados = res_items["eliminados"]
 
                 # 3) --- ASIGNACIONES (cursos / alumnos) -------------------
-                cursos_ids = [int(x) for x in request.POST.getlist("cursos") if str(x).strip()]
-                alumnos_usuario_ids = [int(x) for x in request.POST.getlist("alumnos") if str(x).strip()]
-
-                estudiantes_pks = set()
-
-                # Estudiantes de los cursos marcados
-                if cursos_ids:
-                    usuarios_de_cursos = Matricula.objects.filter(
-                        curso_id__in=cursos_ids
-                    ).values_list("estudiante_id", flat=True)  # usuario.id
-
-                    est_from_cursos = Estudiante.objects.filter(
-                        usuario_id__in=usuarios_de_cursos
-                    ).values_list("pk", flat=True)            # estudiante.pk
-
-                    estudiantes_pks.update(est_from_cursos)
-
-                # Estudiantes marcados individualmente
-                if alumnos_usuario_ids:
-                    est_from_alumnos = Estudiante.objects.filter(
-                        usuario_id__in=alumnos_usuario_ids
-                    ).values_list("pk", flat=True)
-
-                    estudiantes_pks.update(est_from_alumnos)
-
-                # Conjunto actual en BD
-                asig_qs = AsignacionActividad.objects.filter(actividad=obj)
-                actuales = set(asig_qs.values_list("estudiante_id", flat=True))
-
-                # Determinar altas y bajas
-                to_delete = actuales - estudiantes_pks
-                to_add = estudiantes_pks - actuales
-
-                borradas = 0
-                if to_delete:
-                    borradas, _ = asig_qs.filter(estudiante_id__in=to_delete).delete()
-                    print(f"   🗑️ Asignaciones eliminadas: {borradas}")
-
-                creadas = 0
-                for est_pk in to_add:
-                    AsignacionActividad.objects.create(
-                        actividad=obj,
-                        estudiante_id=est_pk
-                    )
-                    creadas += 1
-                print(f"   ✅ Asignaciones creadas: {creadas}")
+                # Altas y bajas en bloque (LevelUp/asignaciones.py)
+                cambios = asignar_actividad(
+                    obj,
+                    request.POST.getlist("cursos"),
+                    request.POST.getlist("alumnos"),
+                    quitar=True,
+                )
+                creadas, borradas = cambios["creadas"], cambios["quitadas"]
                 # ---------------------------------------------------------
 
                 # Mensaje de éxito
@@ -1323,20 +1104,22 @@ def actividad_editar(request, pk):
                     msg_parts.append(f"{borradas} asignación(es) quitada(s)")
                 
                 messages.success(request, "✅ " + ", ".join(msg_parts) + ".")
-                
-                print(f"\n💾 RESUMEN FINAL:")
-                print(f"   Total guardados: {items_guardados}")
-                print(f"   Nuevos: {items_nuevos}")
-                print(f"   Actualizados: {items_actualizados}")
-                print(f"   Eliminados: {items_eliminados}")
-                print(f"   Ítems finales en BD: {ItemActividad.objects.filter(actividad=obj).count()}")
-                print(f"   Asignaciones finales: {AsignacionActividad.objects.filter(actividad=obj).count()}")
+
+                log.info(
+                    "actividad_editar.resumen",
+                    actividad=pk,
+                    guardados=items_guardados,
+                    nuevos=items_nuevos,
+                    actualizados=items_actualizados,
+                    eliminados=items_eliminados,
+                    asignaciones_creadas=creadas,
+                    asignaciones_quitadas=borradas,
+                )
             
             return redirect("docente_lista")
 
         else:
-            print(f"\n❌ Form de actividad inválido:")
-            print(f"   Errores: {form.errors}")
+            log.info("actividad_editar.form_invalido", actividad=pk, errores=lambda: form.errors.get_json_data())
             messages.error(request, "Revisa los errores en los datos de la actividad.")
     else:
         # GET request
@@ -1392,13 +1175,11 @@ def item_eliminar_ajax(request, item_id):
         if actividad.docente.usuario != request.user:
             return JsonResponse({"ok": False, "error": "No autorizado"}, status=403)
         
-        items_antes = ItemActividad.objects.filter(actividad=actividad).count()
         item_pk = item.pk
         item.delete()
         items_despues = ItemActividad.objects.filter(actividad=actividad).count()
-        
-        print(f"✅ Ítem #{item_pk} eliminado vía AJAX")
-        print(f"   Actividad #{actividad_id}: {items_antes} → {items_despues} ítems")
+
+        log.info("item_eliminar_ajax", actividad=actividad_id, item=item_pk, items_restantes=items_despues)
         
         return JsonResponse({
             "ok": True,
@@ -1408,9 +1189,7 @@ def item_eliminar_ajax(request, item_id):
         })
         
     except Exception as e:
-        print(f"❌ Error eliminando ítem: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("item_eliminar_ajax.error", item=item_id)
         return JsonResponse({"ok": False, "error": str(e)}, status=500)
 
 @login_required
@@ -1476,7 +1255,7 @@ def _grade_game(item, POST):
 # Actividades por asignatura
 @login_required
 def estudiante_set_asignatura(request):
-    """Guarda en sesión la asignatura activa del estudiante."""
+    """Guarda la asignatura activa del estudiante (cookie firmada, solo si cambia)."""
     if not es_estudiante(request.user):
         return JsonResponse({"ok": False, "error": "No autorizado"}, status=403)
 
@@ -1484,25 +1263,15 @@ def estudiante_set_asignatura(request):
     if not slug:
         return JsonResponse({"ok": False, "error": "Falta slug"}, status=400)
 
-    # 1) Buscar por slug
-    asig = Asignatura.objects.filter(slug=slug).first()
-
-    # 2) Fallback: slugify(nombre)
-    if not asig:
-        for cand in Asignatura.objects.all():
-            if slugify(cand.nombre) == slug:
-                asig = cand
-                break
+    # Por slug o slugify(nombre)
+    asig = registro_asignaturas.por_slug(slug)
 
     if not asig:
         return JsonResponse({"ok": False, "error": "Asignatura no encontrada"}, status=404)
 
-    session_slug = slugify(asig.nombre)
-    request.session["asignatura_activa_slug"] = session_slug
-    request.session["asignatura_activa_nombre"] = asig.nombre
-    request.session["asignatura_activa_icono"] = asig.icono 
-
-    return JsonResponse({"ok": True, "nombre": asig.nombre})
+    respuesta = JsonResponse({"ok": True, "nombre": asig.nombre})
+    recordar_asignatura(request, respuesta, asig)
+    return respuesta
 
 #Lista de actividades del estudiante
 @login_required
@@ -1512,113 +1281,37 @@ def estudiante_mis_actividades(request):
     
     estudiante = get_object_or_404(Estudiante, usuario=request.user)
 
-    # Si no hay asignatura en sesión, fijar la primera por defecto
-    _asegurar_asignatura_por_defecto(request)
-    
-    print(f"🔍 Buscando actividades para: {request.user.username}")
-    print(f"   Estudiante.pk: {estudiante.pk}")
-    print(f"   Usuario.id: {request.user.id}")
-
-    # -------- Asignatura activa (desde sesión) --------
-    asig_slug = (request.session.get("asignatura_activa_slug") or "").strip()
-    asignatura_filtro = None
+    # -------- Asignatura activa (cookie o, si no hay, la primera) --------
+    asignatura_filtro = asignatura_activa(request)
 
-    if asig_slug:
-        # 1) Intentar por campo slug
-        asignatura_filtro = Asignatura.objects.filter(slug=asig_slug).first()
-
-        # 2) Fallback: slugify(nombre) == asig_slug
-        if not asignatura_filtro:
-            for cand in Asignatura.objects.all():
-                if slugify(cand.nombre) == asig_slug:
-                    asignatura_filtro = cand
-                    break
-
-    if asignatura_filtro:
-        print(f"   🎯 Asignatura filtro: {asignatura_filtro.nombre} ({asig_slug})")
-    else:
-        print(f"   ⚠️ Sin filtro de asignatura. asig_slug en sesión = «{asig_slug}»")
-
-    # Filtrar por estudiante.pk
-    act_qs = (
-        Actividad.objects
-        .filter(
-            es_publicada=True,
-            asignacionactividad__estudiante_id=estudiante.pk
-        )
-        .distinct()
-        .select_related('docente', 'asignatura')
-        .order_by("-fecha_publicacion", "-id")
+    # Una consulta: la asignación ya trae el resumen de intentos
+    asig_qs = (
+        AsignacionActividad.objects
+        .filter(estudiante=estudiante, actividad__es_publicada=True)
+        .select_related('actividad__docente', 'actividad__asignatura')
+        .order_by("-actividad__fecha_publicacion", "-actividad_id")
     )
 
     # Aplicar filtro por asignatura si hay una activa
     if asignatura_filtro:
-        act_qs = act_qs.filter(asignatura=asignatura_filtro)
-
-    total_actividades = act_qs.count()
-    print(f"   ✅ Actividades encontradas: {total_actividades}")
-    
-    for act in act_qs:
-        print(f"      - {act.titulo} (ID: {act.id})")
-
-    # Contar intentos por actividad
-    subs_counts = (
-        Submission.objects
-        .filter(estudiante=estudiante, actividad__in=act_qs)
-        .values("actividad")
-        .annotate(
-            total=Count("id"),
-            abiertos=Count("id", filter=Q(finalizado=False)),
-            finalizados=Count("id", filter=Q(finalizado=True)),
-        )
-    )
-    counts_map = {row["actividad"]: row for row in subs_counts}
-
-    # Intentos personalizados
-    overrides = (
-        AsignacionActividad.objects
-        .filter(estudiante=estudiante, actividad__in=act_qs)
-        .values("actividad_id", "intentos_permitidos")
-    )
-    ov_map = {
-        r["actividad_id"]: r["intentos_permitidos"]
-        for r in overrides
-        if r["intentos_permitidos"] is not None
-    }
+        asig_qs = asig_qs.filter(actividad__asignatura=asignatura_filtro)
 
     now = timezone.now()
     rows, grupos = [], {}
     
-    for a in act_qs:
-        c = counts_map.get(a.id, {"total": 0, "abiertos": 0, "finalizados": 0})
-        usados = int(c["total"])
-        abiertos = int(c["abiertos"])
-        finalizados = int(c["finalizados"])
+    for asig in asig_qs:
+        a = asig.actividad
+        usados = asig.intentos_usados
         
         cerrada = bool(a.fecha_cierre and now > a.fecha_cierre)
 
-        # ---- lógica de intentos  ----
-        override_raw = ov_map.get(a.id)
-
-        if override_raw is not None:
-            try:
-                max_for_student = int(override_raw)
-            except (TypeError, ValueError):
-                max_for_student = 0
-        else:
-            if a.intentos_ilimitados:
-                max_for_student = 0  # 0 = ilimitado
-            else:
-                try:
-                    max_for_student = int(a.intentos_max or 0)
-                except (TypeError, ValueError):
-                    max_for_student = 0
-
+        # ---- lógica de intentos (override de la asignación o de la actividad) ----
+        max_for_student = asig.intentos_max_efectivo
         es_ilimitado = (max_for_student == 0)
 
         puede_intentar = (not cerrada) and (es_ilimitado or usados < max_for_student)
-        tiene_abierto = abiertos > 0
-        tiene_resultados = finalizados > 0
+        tiene_abierto = asig.intentos_abiertos > 0
+        tiene_resultados = asig.intentos_finalizados > 0
 
         # Nombre de asignatura (para agrupar en la vista)
         try:
@@ -1639,6 +1332,7 @@ def estudiante_mis_actividades(request):
             "tiene_abierto": tiene_abierto, 
             "puede_intentar": puede_intentar,
             "tiene_resultados": tiene_resultados, 
+            "mejor_calificacion": asig.mejor_calificacion,
             "cerrada": cerrada,
             "asignatura": asignatura_nombre,
         }
@@ -1646,9 +1340,13 @@ def estudiante_mis_actividades(request):
         rows.append(row)
         grupos.setdefault(asignatura_nombre, []).append(row)
 
-    print(f"\n📊 Resumen:")
-    print(f"   Total rows: {len(rows)}")
-    print(f"   Grupos: {list(grupos.keys())}")
+    log.debug(
+        "mis_actividades",
+        estudiante=estudiante.pk,
+        asignatura=asignatura_filtro.nombre if asignatura_filtro else None,
+        actividades=len(rows),
+        grupos=lambda: list(grupos),
+    )
 
     return render(
         request,
@@ -1683,7 +1381,8 @@ def actividad_resultados(request, pk):
     Resultados para una actividad tipo QUIZ
 
     - Sólo procesa ItemActividad con tipo="game".
-    - Usa Answer.respuesta.payload.meta.correctas / total / score.
+    - Usa Answer.respuesta.payload.meta.correctas / total / score
+      (desglose en LevelUp.resultados, cacheado en el Submission).
     - Muestra listado de intentos y permite elegir uno (?intento=N).
     - Permite filtrar ítems: todas / solo correctas / solo incorrectas.
     """
@@ -1694,13 +1393,27 @@ def actividad_resultados(request, pk):
     actividad = get_object_or_404(Actividad, pk=pk)
 
     # ---- Intentos finalizados ----
-    intento_qs = (
-        Submission.objects
-        .filter(actividad=actividad, estudiante=estudiante, finalizado=True)
+    # El resumen (JSON grande) se trae solo para el intento que se muestra:
+    # el pedido en ?intento=N o, por defecto, el último.
+    finalizados = Submission.objects.filter(actividad=actividad, estudiante=estudiante, finalizado=True)
+    intento_param = request.GET.get("intento")
+    elegido = int(intento_param) if intento_param and intento_param.isdigit() else None
+    intentos = list(
+        finalizados
+        .defer("resumen_resultados")
+        .annotate(resumen_elegido=Case(
+            When(
+                intento=elegido if elegido is not None
+                else Subquery(finalizados.order_by("-intento").values("intento")[:1]),
+                then=F("resumen_resultados"),
+            ),
+            default=Value(None),
+            output_field=JSONField(),
+        ))
         .order_by("-intento", "-id")
     )
 
-    if not intento_qs.exists():
+    if not intentos:
         # Si hay intento abierto, mandar a play
         if Submission.objects.filter(
             actividad=actividad,
@@ -1713,111 +1426,21 @@ def actividad_resultados(request, pk):
         return redirect("resolver_play", pk=actividad.pk)
 
     # ---- Intento seleccionado ----
-    intento_param = request.GET.get("intento")
-    if intento_param and intento_param.isdigit():
-        sub = intento_qs.filter(intento=int(intento_param)).first() or intento_qs.first()
+    sub = next((s for s in intentos if s.intento == elegido), None)
+    if sub is not None or elegido is None:
+        sub = sub or intentos[0]
+        sub.resumen_resultados = sub.resumen_elegido
     else:
-        sub = intento_qs.first()
+        sub = intentos[0]  # ?intento=N inexistente: su resumen se lee aparte
 
     # ---- Filtro de ítems ----
     filtro = (request.GET.get("ver") or "todo").lower()
     if filtro not in {"todo", "solo_buenas", "solo_malas"}:
         filtro = "todo"
 
-    items_data_all = []
-    total_buenas = 0
-    total_preguntas = 0
-
-    # Solo ítems tipo "game" 
-    items_qs = actividad.items.filter(tipo="game").order_by("orden", "id")
-
-    def _to_int_or_none(v):
-        try:
-            return int(v)
-        except (TypeError, ValueError):
-            return None
-
-    for item in items_qs:
-        ans = Answer.objects.filter(submission=sub, item=item).first()
-        respuesta = ans.respuesta if ans else {}
-
-        detalle = {
-            "correcto": False,
-            "kind": None,
-            "correctas": None,
-            "total": None,
-            "incorrectas": None,
-            "completado": False,
-            "respuesta_json": json.dumps(respuesta or {}, ensure_ascii=False, indent=2),
-        }
-
-        datos_item = item.datos or {}
-
-        # kind del minijuego
-        kind = None
-        if isinstance(respuesta, dict):
-            kind = respuesta.get("kind")
-        if not kind:
-            kind = datos_item.get("kind")
-        detalle["kind"] = (kind or "").lower()
-
-        # Meta (correctas / total / misses) 
-        meta = {}
-        if isinstance(respuesta, dict):
-            meta = respuesta.get("meta") or {}
-            if not isinstance(meta, dict):
-                meta = {}
-
-        # Compatibilidad por si vienen en la raíz
-        if not meta and isinstance(respuesta, dict):
-            meta = {
-                "correctas": respuesta.get("correctas"),
-                "total": respuesta.get("total"),
-                "misses": respuesta.get("incorrectas"),
-            }
-
-        corr = _to_int_or_none(meta.get("correctas"))
-        tot = _to_int_or_none(meta.get("total"))
-        misses = _to_int_or_none(meta.get("misses"))
-
-        # Score (0..1) para reconstruir correctas por si faltan
-        score = None
-        if isinstance(respuesta, dict):
-            try:
-                if "score" in respuesta:
-                    score = float(respuesta["score"])
-            except (TypeError, ValueError):
-                score = None
-
-        if corr is None and tot is not None and score is not None:
-            corr = int(round(score * tot))
-
-        if misses is None and corr is not None and tot is not None:
-            misses = max(0, tot - corr)
-
-        # Correcto a nivel de ÍTEM: todas las sub-preguntas correctas
-        if corr is not None and tot is not None and tot > 0:
-            correcto_item = (corr == tot)
-            total_buenas += corr
-            total_preguntas += tot
-        else:
-            # Fallback antiguo: se usa es_correcta booleano
-            correcto_item = bool(getattr(ans, "es_correcta", False)) if ans else False
-            total_preguntas += 1
-            if correcto_item:
-                total_buenas += 1
-
-        detalle.update({
-            "correcto": correcto_item,
-            "correctas": corr,
-            "total": tot,
-            "incorrectas": misses,
-            "completado": bool(
-                isinstance(respuesta, dict) and respuesta.get("completado", True)
-            ),
-        })
-
-        items_data_all.append({"item": item, "detalle": detalle})
+    # ---- Desglose (cacheado en el Submission) ----
+    resultados = resultados_de_intento(sub, actividad)
+    items_data_all = resultados["items"]
 
     # ---- Aplicar filtro (todas / solo buenas / solo malas) ----
     if filtro == "solo_buenas":
@@ -1827,13 +1450,8 @@ def actividad_resultados(request, pk):
     else:
         items_data = items_data_all
 
-    # ---- Resumen global ----
-    porcentaje_global = 0
-    if total_preguntas > 0:
-        porcentaje_global = int(round(total_buenas * 100.0 / float(total_preguntas)))
-
     # ---- Intentos y reintentos ----
-    intentos_usados = intento_qs.count()
+    intentos_usados = len(intentos)
 
     if actividad.intentos_ilimitados:
         intentos_max = 0  # 0 = ilimitado
@@ -1865,11 +1483,11 @@ def actividad_resultados(request, pk):
         "intentos_max": intentos_max,
         "es_intentos_ilimitados": es_intentos_ilimitados,
         "puede_reintentar": puede_reintentar,
-        "intentos": list(intento_qs),
+        "intentos": intentos,
         "celebration_video_url": static("LevelUp/video/Timo_celebrando_animado.mp4"),
-        "total_buenas": total_buenas,
-        "total_preguntas": total_preguntas,
-        "porcentaje_global": porcentaje_global,
+        "total_buenas": resultados["total_buenas"],
+        "total_preguntas": resultados["total_preguntas"],
+        "porcentaje_global": resultados["porcentaje_global"],
     }
 
     return render(request, "LevelUp/actividades/estudiante_resultados.html", ctx)
@@ -1879,39 +1497,27 @@ def actividad_resultados(request, pk):
 # =====================================================
 @login_required
 def actividad_play(request, pk):
-    """Vista de juego con diagnóstico completo"""
+    """Vista de juego de una actividad (quiz con minijuegos o misión)"""
     if not es_estudiante(request.user):
         raise Http404
     
     estudiante = get_object_or_404(Estudiante, usuario=request.user)
     act = get_object_or_404(Actividad, pk=pk, es_publicada=True)
     
-    print(f"\n{'='*60}")
-    print(f"🎮 ACTIVIDAD PLAY - ID: {pk}")
-    print(f"{'='*60}")
-    print(f"👤 Usuario: {request.user.username}")
-    print(f"🎯 Actividad: {act.titulo}")
-    print(f"📋 Tipo: {act.tipo}")
-    
     # Verificar asignación
     tiene_asignacion = AsignacionActividad.objects.filter(
         estudiante=estudiante, 
         actividad=act
     ).exists()
     
-    print(f"✅ Tiene asignación: {tiene_asignacion}")
-    
     if not tiene_asignacion:
-        print(f"❌ No tiene asignación, redirigiendo")
+        log.info("actividad_play.sin_asignacion", actividad=pk, estudiante=estudiante.pk)
         messages.error(request, "No tienes acceso a esta actividad.")
         return redirect("estudiante_lista")
     
     # Verificar cierre
     now = timezone.now()
     esta_cerrada = bool(act.fecha_cierre and now > act.fecha_cierre)
-    print(f"🔒 Fecha cierre: {act.fecha_cierre}")
-    print(f"🕐 Ahora: {now}")
-    print(f"❌ Cerrada: {esta_cerrada}")
     
     if esta_cerrada:
         messages.warning(request, "La actividad está cerrada.")
@@ -1937,101 +1543,58 @@ def actividad_play(request, pk):
 
     es_intentos_ilimitados = (intentos_max == 0)
 
-    print(f"🔢 Intentos usados: {intentos_usados}")
-    print(f"🔢 intentos_max (0 = ilimitado): {intentos_max}")
-    print(f"   es_intentos_ilimitados: {es_intentos_ilimitados}")
-    
     # Buscar submission abierto
     sub = (Submission.objects
            .filter(actividad=act, estudiante=estudiante, finalizado=False)
-           .order_by("-intento").first())
-    
-    print(f"📝 Submission existente: {sub is not None}")
+           .first())
     
     if not sub:
         if (not es_intentos_ilimitados) and intentos_usados >= intentos_max:
-            print(f"❌ Sin intentos disponibles (limitado)")
             messages.info(request, "Ya no tienes intentos disponibles.")
             return redirect("resolver_resultado", pk=act.pk)
         
-        sub = Submission.objects.create(
-            actividad=act,
-            estudiante=estudiante,
-            intento=intentos_usados + 1
-        )
-        print(f"✅ Nuevo submission creado: ID {sub.pk}")
-    
-    print(f"\n📦 PROCESANDO ÍTEMS:")
-    print(f"{'='*60}")
+        # Dos pestañas / doble clic: el asignador devuelve el mismo intento
+        sub = abrir_intento(act, estudiante)
+
+    log.debug(
+        "actividad_play.inicio",
+        actividad=pk,
+        tipo=act.tipo,
+        estudiante=estudiante.pk,
+        intento=sub.intento,
+        intentos_usados=intentos_usados,
+        intentos_max=intentos_max,
+    )
     
     # === DECISIÓN DE TEMPLATE SEGÚN TIPO ===
     if act.tipo == "game":
         # MISIÓN: Redirigir al motor de videojuego
-        print(f"🎮 Tipo GAME (misión) - Redirigiendo al motor")
         return redirect(f"{reverse('misiones_jugar', args=['bosque', 1])}?actividad={act.pk}")
     
     else:
         # QUIZ: Cargar ítems de minijuegos y usar play.html con loader
         items_qs = act.items.filter(tipo="game").order_by("orden", "id")
-        total_items = items_qs.count()
-        
-        print(f"📊 Total ítems tipo game: {total_items}")
         
         # Serializar items con sus datos JSON
         items = []
-        for idx, item in enumerate(items_qs, 1):
-            print(f"\n  📋 Ítem {idx}/{total_items}:")
-            print(f"     • ID: {item.id}")
-            print(f"     • Orden: {item.orden}")
-            print(f"     • Tipo: {item.tipo}")
-            print(f"     • Enunciado: {item.enunciado[:50]}...")
-            print(f"     • Puntaje: {item.puntaje}")
-            
+        for item in items_qs:
             # Obtener datos del ítem
             datos = item.datos or {}
             kind = datos.get('kind', 'trivia')
-            
-            print(f"     • Kind: {kind}")
-            print(f"     • Keys en datos: {list(datos.keys())}")
-            
-            # Diagnóstico específico por tipo
-            if kind == 'trivia':
-                questions = datos.get('questions', [])
-                trivia = datos.get('trivia', [])
-                print(f"     • questions: {len(questions) if isinstance(questions, list) else 'NO ES LISTA'}")
-                print(f"     • trivia: {len(trivia) if isinstance(trivia, list) else 'NO ES LISTA'}")
-                
-                if questions:
-                    print(f"     • Primera question: {questions[0]}")
-                if trivia:
-                    print(f"     • Primera trivia: {trivia[0]}")
-                    
-            elif kind in ('memory', 'dragmatch'):
-                pairs = datos.get('pairs', [])
-                print(f"     • pairs: {len(pairs) if isinstance(pairs, list) else 'NO ES LISTA'}")
-                if pairs:
-                    print(f"     • Primer par: {pairs[0]}")
-                    
-            elif kind == 'ordering':
-                items_data = datos.get('items', [])
-                correct = datos.get('correct_order', [])
-                print(f"     • items: {len(items_data) if isinstance(items_data, list) else 'NO ES LISTA'}")
-                print(f"     • correct_order: {len(correct) if isinstance(correct, list) else 'NO ES LISTA'}")
-                
-            elif kind == 'classify':
-                bins = datos.get('bins', [])
-                items_data = datos.get('items', [])
-                answers = datos.get('answers', {})
-                print(f"     • bins: {len(bins) if isinstance(bins, list) else 'NO ES LISTA'}")
-                print(f"     • items: {len(items_data) if isinstance(items_data, list) else 'NO ES LISTA'}")
-                print(f"     • answers: {len(answers) if isinstance(answers, dict) else 'NO ES DICT'}")
-            
+
+            log.debug(
+                "actividad_play.item",
+                actividad=act.pk,
+                item=item.id,
+                kind=kind,
+                claves=lambda: sorted(datos),
+            )
+
             # Preparar JSON para el template
             try:
                 datos_json = json.dumps(datos, ensure_ascii=False, indent=2)
-                print(f"     ✅ JSON serializado OK ({len(datos_json)} chars)")
             except Exception as e:
-                print(f"     ❌ Error serializando JSON: {e}")
+                log.warning("actividad_play.json_error", item=item.id, error=str(e))
                 datos_json = json.dumps({"kind": kind, "error": str(e)})
             
             items.append({
@@ -2043,10 +1606,6 @@ def actividad_play(request, pk):
                 "puntaje": item.puntaje
             })
         
-        print(f"\n{'='*60}")
-        print(f"✅ Procesamiento completo: {len(items)} ítems serializados")
-        print(f"{'='*60}\n")
-        
         ctx = {
             "actividad": act,
             "submission": sub,
@@ -2063,134 +1622,40 @@ def actividad_play(request, pk):
     
 @login_required
 @require_POST
+@idempotente
 def api_item_answer(request, pk, item_id):
     """
-    API para guardar respuesta de un ítem individual
+    API para guardar respuesta de un ítem individual.
+
+    item_id == 0 es el marcador de fin de intento. Toda la escritura
+    ocurre en LevelUp.services (una transacción por llamada). Los
+    reintentos con la misma Idempotency-Key reciben la respuesta guardada
+    (LevelUp/idempotencia.py). Los logros ya no vienen en la respuesta:
+    se evalúan en la cola y los muestra el popup global.
     """
-    print(f"\n{'='*60}")
-    print(f"📥 API ANSWER - Actividad: {pk}, Item: {item_id}")
-    print(f"{'='*60}")
-    
+    log.debug("api_item_answer", actividad=pk, item=item_id)
+
     try:
         body = json.loads(request.body.decode("utf-8"))
-        print(f"📦 Body recibido: {body}")
     except Exception as e:
-        print(f"❌ Error parseando body: {e}")
+        log.info("api_item_answer.json_invalido", actividad=pk, item=item_id, error=str(e))
         return HttpResponseBadRequest("JSON inválido")
 
     payload = body.get("payload") or {}
-    meta = payload.get("meta") or {}
-    completado = bool(payload.get("completado"))
-    kind = (payload.get("kind") or "").lower()
-    
-    print(f"📋 Payload procesado:")
-    print(f"   • completado: {completado}")
-    print(f"   • kind: {kind}")
-    print(f"   • meta: {meta}")
 
     actividad = get_object_or_404(Actividad, pk=pk)
     estudiante = get_object_or_404(Estudiante, usuario=request.user)
-    
-    print(f"✅ Actividad: {actividad.titulo}")
-    print(f"✅ Estudiante: {estudiante.usuario.username}")
-
-    # Buscar o crear submission
-    sub = Submission.objects.filter(
-        actividad=actividad,
-        estudiante=estudiante,
-        finalizado=False
-    ).order_by('-intento').first()
-    
-    if not sub:
-        intentos_count = Submission.objects.filter(
-            actividad=actividad,
-            estudiante=estudiante
-        ).count()
-        
-        sub = Submission.objects.create(
-            actividad=actividad,
-            estudiante=estudiante,
-            intento=intentos_count + 1,
-            iniciado_en=timezone.now(),
-        )
-        print(f"✅ Nuevo submission creado: #{sub.pk}")
-    else:
-        print(f"✅ Submission existente: #{sub.pk}")
 
     # -----------------------------
     # FIN DE LA ACTIVIDAD / JUEGO
     # -----------------------------
     if item_id == 0 or str(item_id) == "0":
-        print(f"🏁 Finalizando submission...")
-        sub.finalizado = True
-        sub.enviado_en = timezone.now()  
-        sub.save()
-        print(f"✅ Submission finalizado")
-
-        # Registrar actividad completada en perfil
-        try:
-            perfil = obtener_o_crear_perfil(request.user)
-            perfil.registrar_actividad_completada()
-            print(f"🎯 Actividades completadas ahora: {perfil.actividades_completadas}")
-        except Exception as e:
-            print(f"⚠️ Error registrando actividad completada en gamificación: {e}")
-
-        # Evaluar logros asociados a esta actividad
-        try:
-            nuevos_logros = evaluar_logros_por_actividad(
-                estudiante=estudiante,
-                actividad=actividad,
-                submission=sub,
-            )
-            if nuevos_logros:
-                print("🎖 Logros desbloqueados ahora:",
-                      [ru.recompensa.slug for ru in nuevos_logros])
-                nombres = [ru.recompensa.nombre for ru in nuevos_logros]
-
-                # guardar IDs en la sesión para el popup global
-                nuevas_ids = [ru.recompensa_id for ru in nuevos_logros]
-                ya_guardadas = request.session.get("nuevas_recompensas_ids", [])
-                merged = list({*ya_guardadas, *nuevas_ids})
-                request.session["nuevas_recompensas_ids"] = merged
-                print(f"💾 nuevas_recompensas_ids en sesión: {merged}")
-            else:
-                nombres = []
-        except Exception as e:
-            print(f"⚠️ Error evaluando logros especiales: {e}")
-            nombres = []
-
-        # ---- Cálculo de intentos usados / disponibles para esta actividad ----
-        intentos_usados = Submission.objects.filter(
-            actividad=actividad,
-            estudiante=estudiante,
-        ).count()
-
-        if actividad.intentos_ilimitados:
-            intentos_max = 0  # 0 = ilimitado
-        else:
-            raw_max = actividad.intentos_max or 0
-            try:
-                intentos_max = int(raw_max)
-            except (TypeError, ValueError):
-                intentos_max = 0
-
-        es_intentos_ilimitados = (intentos_max == 0)
-        ahora = timezone.now()
-
-        puede_reintentar = (
-            actividad.es_publicada
-            and (not actividad.fecha_cierre or ahora <= actividad.fecha_cierre)
-            and (es_intentos_ilimitados or intentos_usados < intentos_max)
-        )
+        finalizar_intento(request.user, actividad, estudiante)
 
         return JsonResponse({
             "ok": True,
             "message": "Intento finalizado",
-            "logros_nuevos": nombres,
-            "intentos_usados": intentos_usados,
-            "intentos_max": intentos_max,
-            "es_intentos_ilimitados": es_intentos_ilimitados,
-            "puede_reintentar": puede_reintentar,
+            **resumen_intentos(actividad, estudiante),
         })
 
     # -----------------------------
@@ -2198,134 +1663,63 @@ def api_item_answer(request, pk, item_id):
     # -----------------------------
     try:
         item = ItemActividad.objects.get(pk=item_id, actividad=actividad)
-        print(f"✅ Item encontrado: {item.enunciado[:30]}...")
     except ItemActividad.DoesNotExist:
-        print(f"❌ Item no encontrado")
         return JsonResponse({"ok": False, "error": "Item no encontrado"}, status=404)
 
-    # Crear o actualizar Answer
-    # ----------------------------------------------------
-    #   - Si el ítem está totalmente correcto.
-    #   - Cuántos puntos se obtienen (según item.puntaje).
-    corr = meta.get("correctas")
-    tot = meta.get("total")
-    ratio = payload.get("score")
-
-    # Normalizamos tipos
-    try:
-        if corr is not None:
-            corr = int(corr)
-    except Exception:
-        corr = None
-    try:
-        if tot is not None:
-            tot = int(tot)
-    except Exception:
-        tot = None
-
-    if not isinstance(ratio, (int, float)):
-        if corr is not None and tot not in (None, 0):
-            ratio = float(corr) / float(tot)
-        else:
-            ratio = 0.0
-    else:
-        ratio = float(ratio)
-
-    # Correcto a nivel de ítem = todas las subpreguntas buenas
-    if corr is not None and tot not in (None, 0):
-        es_correcta_item = (corr == tot)
-    else:
-        # fallback: usamos "completado"
-        es_correcta_item = completado
-
-    puntaje_max = getattr(item, "puntaje", 0) or 0
-    puntaje_item = int(round(ratio * puntaje_max))
-
-    answer, created = Answer.objects.get_or_create(
-        submission=sub,
-        item=item,
-        defaults={
-            "respuesta": payload,
-            "es_correcta": es_correcta_item,
-            "puntaje_obtenido": puntaje_item,
-        },
-    )
+    resultado = registrar_respuesta(request.user, actividad, estudiante, item, payload)
 
-    if not created:
-        answer.respuesta = payload
-        answer.es_correcta = es_correcta_item
-        answer.puntaje_obtenido = puntaje_item
-        answer.save()
-        print(f"✅ Answer actualizado: #{answer.pk}")
-    else:
-        print(f"✅ Answer creado: #{answer.pk}")
+    return JsonResponse({
+        "ok": True,
+        "submission_id": resultado["submission"].id,
+        "answer_id": resultado["answer_id"],
+        "reward": resultado["reward"],
+    })
 
-    total_correctas = meta.get('correctas', 0)
-    total_incorrectas = meta.get('misses', 0)
 
-    if hasattr(sub, 'score'):
-        sub.score = (sub.score or 0) + (total_correctas * 10)
-    if hasattr(sub, 'correctas'):
-        sub.correctas = (sub.correctas or 0) + total_correctas
-    if hasattr(sub, 'incorrectas'):
-        sub.incorrectas = (sub.incorrectas or 0) + total_incorrectas
 
-    sub.enviado_en = timezone.now()
-    sub.save()
+@login_required
+@require_POST
+@idempotente
+def api_item_answers_lote(request, pk):
+    """
+    API por lotes: todos los resultados de un intento en una petición.
 
-    print(f"✅ Submission actualizado")
+    Body JSON:
+        {"items": [{"item_id": 12, "payload": {...}}, ...], "finalizar": true}
 
-    # ----------------------------------
-    # RECOMPENSAS 
-    # ----------------------------------
+    Se procesa en una sola pasada (ver services.registrar_respuestas_lote).
+    """
     try:
-        # 1) Rewards propios del minijuego (coins, etc.)
-        outcome = compute_rewards(meta)
-        res = apply_rewards(estudiante, outcome)
-        
-        print(f"🎁 Recompensas aplicadas: XP={outcome.xp}, Coins={outcome.coins}")
+        body = json.loads(request.body.decode("utf-8"))
+    except Exception:
+        return HttpResponseBadRequest("JSON inválido")
+    if not isinstance(body, dict):
+        return HttpResponseBadRequest("JSON inválido")
 
-        # 2) XP -> PerfilGamificacion (barra y nivel)
-        try:
-            gamif_info = registrar_actividad_completada(
-                request.user,
-                xp_ganada=outcome.xp or 0,
-                origen="juego",
-                referencia_id=actividad.pk,
-            )
-            print(
-                f"🆙 Gamificación: +{outcome.xp or 0} XP, "
-                f"niveles_subidos={gamif_info['niveles_subidos']}, "
-                f"actividades_completadas={gamif_info['actividades_completadas']}"
-            )
-        except Exception as e:
-            print(f"⚠️ Error sumando XP / actividades en gamificación: {e}")
-            gamif_info = {
-                "nivel_actual": 0,
-                "niveles_subidos": 0,
-                "actividades_completadas": 0,
-            }
-
-        reward_data = {
-            "xp": outcome.xp,
-            "coins": outcome.coins,
-            "unlocks": outcome.unlocks,
-            **res,
-            "niveles_subidos": gamif_info.get("niveles_subidos", 0),
-        }
-    except Exception as e:
-        print(f"⚠️ Error en rewards (ignorado): {e}")
-        reward_data = {"xp": 0, "coins": 0, "unlocks": [], "niveles_subidos": 0}
+    resultados = body.get("items") or []
+    if not isinstance(resultados, list):
+        return HttpResponseBadRequest("'items' debe ser una lista")
 
-    print(f"{'='*60}\n")
+    actividad = get_object_or_404(Actividad, pk=pk)
+    estudiante = get_object_or_404(Estudiante, usuario=request.user)
 
-    return JsonResponse({
+    resultado = registrar_respuestas_lote(
+        request.user, actividad, estudiante, resultados,
+        finalizar=bool(body.get("finalizar")),
+    )
+
+    data = {
         "ok": True,
-        "submission_id": sub.id,
-        "answer_id": answer.id,
-        "reward": reward_data,
-    })
+        "submission_id": resultado["submission"].id,
+        "answer_ids": resultado["answer_ids"],
+        "ignorados": resultado["ignorados"],
+        "reward": resultado["reward"],
+    }
+
+    if resultado["submission"].finalizado:
+        data.update(resumen_intentos(actividad, estudiante))
 
+    return JsonResponse(data)
 
 
 @require_POST
@@ -2358,31 +1752,8 @@ def _nombre_docente(obj):
         return get_full() or getattr(obj, "username", None)
     return str(obj)
 
-def _asegurar_asignatura_por_defecto(request):
-    """
-    Si no hay asignatura activa en sesión, usa la MISMA primera asignatura
-    que el navbar (orden por nombre), para que nombre / icono / filtro coincidan.
-    """
-    # Si ya hay algo guardado en sesión, no tocar
-    if request.session.get("asignatura_activa_slug"):
-        return
-
-    # Importante: mismo orden que uses para rellenar 'asignaturas' en el navbar
-    primera = Asignatura.objects.order_by("nombre").first()
-    if not primera:
-        return
-
-    slug = primera.slug or slugify(primera.nombre)
-
-    request.session["asignatura_activa_slug"] = slug
-    request.session["asignatura_activa_nombre"] = primera.nombre
-    request.session["asignatura_activa_icono"] = primera.icono
-
 @login_required
 def portal_estudiante(request):
-    # Asegurar que haya una asignatura activa por defecto en la sesión
-    _asegurar_asignatura_por_defecto(request)
-    
     u = request.user
     perfil = obtener_o_crear_perfil(request.user)
     matricula = (Matricula.objects.select_related("curso").filter(estudiante=u).order_by("-fecha").first())
@@ -2423,87 +1794,21 @@ def portal_estudiante(request):
 # =============================================================
 # Misiones
 # =============================================================
-def _load_static_map(path):
-    try:
-        real = finders.find(path)
-        if real:
-            with open(real, "r", encoding="utf-8") as f:
-                return json.load(f)
-    except Exception:
-        pass
-    return {"name": "default", "questions": []}
-
 # Mapeo simple: (mundo, nivel) -> archivo de mapa (dentro de static)
 MAPS = {
     ("bosque", 1): "LevelUp/maps/escenario1.json",
 }
 
-def _fix_tileset_sources(map_data):
-    """
-    Ajusta los 'source' de los tilesets para que apunten a STATIC,
-    por ejemplo: /static/LevelUp/tilesets/bloques.xml
-    """
-    try:
-        tilesets = map_data.get("tilesets") or []
-    except AttributeError:
-        return map_data
-
-    for ts in tilesets:
-        source = (ts.get("source") or "").strip()
-        if not source:
-            continue
-
-        if source.startswith("http://") or source.startswith("https://") or source.startswith("/static/"):
-            continue
-
-        filename = source.split("/")[-1]
-
-        # Construir ruta estática absoluta
-        ts["source"] = static(f"LevelUp/tilesets/{filename}")
-
-    return map_data
-
-def _fix_image_layers(map_data):
-    """
-    Ajusta las 'image' de las capas tipo 'imagelayer'
-    para que apunten a /static/LevelUp/img/images_tiled/*.png
-    en vez de rutas relativas como 'img/images_tiled/...'
-    """
-    try:
-        layers = map_data.get("layers") or []
-    except AttributeError:
-        return map_data
-
-    for layer in layers:
-        if not isinstance(layer, dict):
-            continue
-
-        if layer.get("type") != "imagelayer":
-            continue
-
-        img = (layer.get("image") or "").strip()
-        if not img:
-            continue
-
-        if img.startswith("/static/") or img.startswith("http://") or img.startswith("https://"):
-            continue
-
-        filename = img.split("/")[-1]
-
-        # Construir ruta estática absoluta
-        layer["image"] = static(f"LevelUp/img/images_tiled/{filename}")
-
-    return map_data
-
 @xframe_options_exempt
 @login_required
 def misiones_mapa(request, actividad_pk=None, slug=None, nivel=None):
     """
     Devuelve el mapa Tiled con preguntas de la actividad.
 
-    - Loguea info del mapa y tilesets.
-    - Corrige los 'source' de tilesets para que apunten a /static/LevelUp/tilesets/*.xml
-      evitando 404 tipo /misiones/mapa/tilesets/bloques.xml.
+    - El mapa viene precompilado de LevelUp.mapas (rutas de tilesets /
+      imágenes corregidas a /static/..., preguntas y qid inyectados) y se
+      recompila solo si cambian el archivo base o los ítems.
+    - Responde 304 si el cliente ya tiene la misma versión (ETag).
     """
     # Permitir ?actividad=ID si no vino por URL
     if not actividad_pk:
@@ -2514,248 +1819,31 @@ def misiones_mapa(request, actividad_pk=None, slug=None, nivel=None):
             except (TypeError, ValueError):
                 actividad_pk = None
 
-    # -------- LOG INICIAL --------
-    print("\n" + "=" * 60)
-    print("🗺  misiones_mapa llamado")
-    print(f"   slug={slug!r}, nivel={nivel!r}, actividad_pk={actividad_pk!r}")
-
-    # Cargar mapa base
+    # Mapa base
     default_map = MAPS.get((slug, int(nivel))) if slug and nivel else next(iter(MAPS.values()))
-    print(f"   default_map (static path): {default_map!r}")
-
-    base = _load_static_map(default_map)
-
-    # Logs de capas y tilesets originales
-    try:
-        layer_names = [l.get("name") for l in base.get("layers", []) if isinstance(l, dict)]
-    except Exception:
-        layer_names = []
-    try:
-        tileset_sources = [ts.get("source") for ts in base.get("tilesets", []) if isinstance(ts, dict)]
-    except Exception:
-        tileset_sources = []
-
-    print(f"   Capas: {layer_names}")
-    print(f"   Tilesets (antes de fix): {tileset_sources}")
 
-    # Si viene actividad, inyectar preguntas
+    act = None
     if actividad_pk:
-        try:
-            act = Actividad.objects.get(pk=int(actividad_pk))
-        except Actividad.DoesNotExist:
-            print("   ❌ Actividad no encontrada")
+        act = (
+            Actividad.objects
+            .only("pk", "version_contenido")
+            .filter(pk=int(actividad_pk))
+            .first()
+        )
+        if act is None:
             return JsonResponse({"error": "Actividad no encontrada"}, status=404)
 
-        print(f"   ✅ Actividad encontrada: {act.pk} - {act.titulo!r}")
-
-        # Solo ítems tipo GAME (preguntas del minijuego)
-        items_qs = act.items.filter(tipo__iexact="game").order_by("orden", "id")
-        print(f"   Ítems tipo 'game' encontrados: {items_qs.count()}")
-
-        questions = []
-
-        def _to_trivia(it):
-            """
-            Normaliza ItemActividad(tipo='game') a formato trivia:
-            { id, q, options, correct }
-            """
-            datos = it.datos or {}
-            kind = str(datos.get("kind") or "").lower()
-
-            # === TRIVIA (formato array) ===
-            if kind == "trivia" and isinstance(datos.get("questions"), list):
-                qs_list = datos["questions"]
-                if qs_list:
-                    first = qs_list[0] or {}
-                    qtxt = (first.get("q") or it.enunciado or "Pregunta").strip()
-                    opts = list(first.get("opts") or first.get("options") or [])
-                    ans = first.get("ans", 0)
-
-                    if not opts or len(opts) < 2:
-                        opts = ["Opción 1", "Opción 2"]
-                    if not isinstance(ans, int) or ans < 0 or ans >= len(opts):
-                        ans = 0
-
-                    return {
-                        "id": it.pk,
-                        "q": qtxt,
-                        "options": opts,
-                        "correct": ans
-                    }
-
-            # === TRIVIA (formato plano) ===
-            if kind == "trivia":
-                qtxt = (datos.get("question") or it.enunciado or "Pregunta").strip()
-                opts = list(datos.get("options") or [])
-                ans = datos.get("answer", 0)
-
-                if not opts or len(opts) < 2:
-                    opts = ["Opción 1", "Opción 2"]
-                if not isinstance(ans, int) or ans < 0 or ans >= len(opts):
-                    ans = 0
-
-                return {
-                    "id": it.pk,
-                    "q": qtxt,
-                    "options": opts,
-                    "correct": ans
-                }
-
-            # === FALLBACK GENÉRICO ===
-            return {
-                "id": it.pk,
-                "q": it.enunciado or "¿Pregunta?",
-                "options": ["Opción A", "Opción B", "Opción C"],
-                "correct": 1
-            }
-
-        # Construir lista de preguntas
-        questions = []
-
-        for it in items_qs:
-            datos = it.datos or {}
-            kind = str(datos.get("kind") or "").lower()
-
-            # Paquete de preguntas normalizado
-            paquetes = []
-
-            # ====== TRIVIA con lista "questions" ======
-            if kind == "trivia" and isinstance(datos.get("questions"), list) and datos["questions"]:
-                for sub in datos["questions"]:
-                    sub = sub or {}
-                    qtxt = (sub.get("q") or it.enunciado or "Pregunta").strip()
-                    opts = list(sub.get("opts") or sub.get("options") or [])
-                    ans = sub.get("ans", 0)
-
-                    # Sanitizar
-                    if not opts or len(opts) < 2:
-                        opts = ["Opción 1", "Opción 2"]
-                    if not isinstance(ans, int) or ans < 0 or ans >= len(opts):
-                        ans = 0
-
-                    paquetes.append({
-                        "q": qtxt,
-                        "options": opts,
-                        "correct": ans,
-                    })
-
-            # ====== TRIVIA "plana" ======
-            elif kind == "trivia":
-                qtxt = (datos.get("question") or it.enunciado or "Pregunta").strip()
-                opts = list(datos.get("options") or [])
-                ans = datos.get("answer", 0)
-
-                if not opts or len(opts) < 2:
-                    opts = ["Opción 1", "Opción 2"]
-                if not isinstance(ans, int) or ans < 0 or ans >= len(opts):
-                    ans = 0
-
-                paquetes.append({
-                    "q": qtxt,
-                    "options": opts,
-                    "correct": ans,
-                })
-
-            # ====== FALLBACK genérico ======
-            else:
-                paquetes.append({
-                    "q": it.enunciado or "¿Pregunta?",
-                    "options": ["Opción A", "Opción B", "Opción C"],
-                    "correct": 1,
-                })
-
-            first = paquetes[0]
-
-            questions.append({
-                # id se asigna después
-                "item_pk": it.pk,
-                "kind": "trivia",
-                "questions": paquetes,      # todas las sub-preguntas
-                "q": first["q"],            # compatibilidad: una sola
-                "options": first["options"],
-                "correct": first["correct"],
-            })
-
-        # Renumerar con id secuencial 1..N (para mapear a qid de enemigos)
-        questions = [
-            {**q, "id": i + 1}
-            for i, q in enumerate(questions)
-        ]
-
-        # Inyectar en el mapa
-        new_map = dict(base)
-        new_map["questions"] = questions
-        new_map["actividad_id"] = act.pk
-
-        # Auto-asignar qid a enemigos sin ese property
-        idx = 1
-        for layer in new_map.get("layers", []) or []:
-            if not isinstance(layer, dict) or layer.get("type") != "objectgroup":
-                continue
-            for obj in layer.get("objects", []) or []:
-                if not isinstance(obj, dict):
-                    continue
-                name = (obj.get("name") or "").lower()
-                if name != "enemy":
-                    continue
-                props_list = obj.get("properties") or []
-                has_qid = any(p.get("name") == "qid" for p in props_list if isinstance(p, dict))
-                if not has_qid:
-                    props_list.append({"name": "qid", "type": "int", "value": idx})
-                    obj["properties"] = props_list
-                    idx += 1
-
-        # FIX: ajustar rutas de tilesets /static/LevelUp/tilesets/*.xml
-        _fix_tileset_sources(new_map)
-        # FIX: ajustar imágenes de capas de fondo /static/LevelUp/img/images_tiled/*.png
-        _fix_image_layers(new_map)
-
-        # Logs finales
-        try:
-            tileset_sources_after = [
-                ts.get("source") for ts in new_map.get("tilesets", []) if isinstance(ts, dict)
-            ]
-        except Exception:
-            tileset_sources_after = []
-
-        try:
-            img_layers_after = [
-                lyr.get("image") for lyr in new_map.get("layers", [])
-                if isinstance(lyr, dict) and lyr.get("type") == "imagelayer"
-            ]
-        except Exception:
-            img_layers_after = []
-
-        print(f"   Tilesets (después de fix): {tileset_sources_after}")
-        print(f"   Imagelayers (después de fix): {img_layers_after}")
-        print("=" * 60 + "\n")
-
-        return JsonResponse(new_map, safe=False)
-
-    # Sin actividad: mapa base con fix de tilesets también
-    new_map = _fix_tileset_sources(base)
-    new_map = _fix_image_layers(new_map)
-
-    try:
-        tileset_sources_after = [
-            ts.get("source") for ts in new_map.get("tilesets", []) if isinstance(ts, dict)
-        ]
-    except Exception:
-        tileset_sources_after = []
+    contenido, etag = mapa_compilado(default_map, act)
+    log.debug("misiones_mapa", slug=slug, nivel=nivel, actividad=actividad_pk, mapa=default_map, etag=etag)
 
-    try:
-        img_layers_after = [
-            lyr.get("image") for lyr in new_map.get("layers", [])
-            if isinstance(lyr, dict) and lyr.get("type") == "imagelayer"
-        ]
-    except Exception:
-        img_layers_after = []
-
-    print("   (Sin actividad) Tilesets después de fix:", tileset_sources_after)
-    print("   (Sin actividad) Imagelayers después de fix:", img_layers_after)
-    print("=" * 60 + "\n")
-
-    return JsonResponse(new_map, safe=False)
+    if etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(contenido, content_type="application/json")
+    response["ETag"] = etag
+    # El mapa depende del usuario autenticado: caché solo del navegador
+    response["Cache-Control"] = "private, no-cache"
+    return response
 
 
 try:
@@ -2863,8 +1951,8 @@ def actividad_crear_mision(request):
             },
         ]
 
-        for idx, qdata in enumerate(ejemplos, start=1):
-            ItemActividad.objects.create(
+        ItemActividad.objects.bulk_create([
+            ItemActividad(
                 actividad=act,
                 tipo="game",
                 enunciado=f"Pregunta {idx} (edítame)",
@@ -2874,7 +1962,10 @@ def actividad_crear_mision(request):
                     "timeLimit": 60,
                 },
                 puntaje=10,
+                orden=idx,
             )
+            for idx, qdata in enumerate(ejemplos, start=1)
+        ])
 
     # si viene ?preview=1, abre el editor con la vista previa automáticamente
     open_preview = "1" if request.GET.get("preview") == "1" else "0"
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'LevelUp.metricas.MetricasVistaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware', 
@@ -50,6 +52,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'LevelUp.errores.Custom404Middleware',
+    'LevelUp.diagnostico.ContextoPeticionMiddleware',
 ]
 
 ROOT_URLCONF = 'ProyectoLevelUP.urls'
@@ -64,11 +67,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'LevelUp.context_processors.user_home_url',
-                'LevelUp.context_processors.navbar_asignaturas',
-                'LevelUp.context_processors.estudiante_actual',
-                'LevelUp.context_processors.gamificacion_context',
-                'gamificacion.context_processors.recompensas_nuevas'
+                'LevelUp.context_processors.levelup_context',
             ],
         },
     },
@@ -84,6 +83,13 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Las transacciones toman el lock de escritura al empezar: dos
+            # peticiones que escriben se esperan (timeout) en vez de fallar
+            # con "database is locked" al intentar subir de lectura a escritura.
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -168,7 +174,69 @@ DEFAULT_FROM_EMAIL = "LevelUp <amcompanyMPH@gmail.com>"
 
 X_FRAME_OPTIONS = "SAMEORIGIN"
 
-MESSAGE_STORAGE = "django.contrib.messages.storage.session.SessionStorage"
+# --- Sesión y avisos (LevelUp/preferencias.py) ---
+# Los mensajes flash viajan en una cookie firmada: mostrarlos no escribe la
+# sesión. La sesión solo guarda el login; con una caché compartida (Redis)
+# se puede usar "django.contrib.sessions.backends.cached_db" para leerla
+# sin ir a la BD. Con la LocMemCache por proceso NO: un logout no se
+# vería en los demás procesos.
+MESSAGE_STORAGE = "django.contrib.messages.storage.cookie.CookieStorage"
+SESSION_ENGINE = os.environ.get("LEVELUP_SESSION_ENGINE", "django.contrib.sessions.backends.db")
+
+# --- Diagnóstico (LevelUp/diagnostico.py) ---
+# Desactivado por defecto (WARNING): con DEBUG/INFO se emiten eventos JSON.
+# LEVELUP_LOG_MUESTREO: fracción de eventos debug/info que se emite, por logger.
+LEVELUP_LOG_NIVEL = os.environ.get("LEVELUP_LOG_NIVEL", "WARNING")
+LEVELUP_LOG_MUESTREO = {
+    "LevelUp": 1.0,
+    "LevelUp.peticiones": 0.1,
+}
+
+# --- Métricas por vista (LevelUp/metricas.py) ---
+LEVELUP_PRESUPUESTO_CONSULTAS = 30
+LEVELUP_PRESUPUESTO_CONSULTAS_VISTA = {}
+LEVELUP_PRESUPUESTO_ESTRICTO = False
+
+# --- Cola de tareas de gamificación (LevelUp/tareas.py) ---
+# "hilos": pool del propio proceso; "worker": solo encola y la drena
+# `manage.py procesar_tareas`; "inmediato": en el mismo hilo al confirmar.
+LEVELUP_TAREAS_MODO = os.environ.get("LEVELUP_TAREAS_MODO", "hilos")
+LEVELUP_TAREAS_HILOS = 2
+
+# --- Idempotencia de las APIs de respuestas (LevelUp/idempotencia.py) ---
+# Segundos que se recuerda la respuesta de cada Idempotency-Key.
+LEVELUP_IDEMPOTENCIA_TTL = 24 * 3600
+
+# --- Registros en memoria: asignaturas y reglas de logros (LevelUp/registros.py) ---
+# Cada proceso compara su copia con la generación compartida en CACHES como
+# mucho cada REVISION segundos; sin caché compartida, la copia vence a los TTL.
+LEVELUP_REGISTROS_REVISION = 1.0
+LEVELUP_REGISTROS_TTL = 300
+
+# --- Carga masiva de alumnos (LevelUp/importacion.py) ---
+# Procesos para hashear contraseñas; None = os.cpu_count().
+LEVELUP_IMPORTACION_PROCESOS = None
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "levelup_json": {"()": "LevelUp.diagnostico.FormatoJSON"},
+    },
+    "handlers": {
+        "levelup_consola": {
+            "class": "logging.StreamHandler",
+            "formatter": "levelup_json",
+        },
+    },
+    "loggers": {
+        "LevelUp": {
+            "handlers": ["levelup_consola"],
+            "level": LEVELUP_LOG_NIVEL,
+            "propagate": False,
+        },
+    },
+}
 
 import mimetypes
 
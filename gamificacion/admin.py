@@ -1,6 +1,7 @@
 # Register your models here.
 from django.contrib import admin
-from .models import PerfilGamificacion, Recompensa, RecompensaUsuario
+from .models import PerfilGamificacion, PuestoRanking, Recompensa, RecompensaUsuario
+from .ranking import reconstruir_ranking
 
 
 @admin.register(PerfilGamificacion)
@@ -12,12 +13,25 @@ class PerfilGamificacionAdmin(admin.ModelAdmin):
 
 @admin.register(Recompensa)
 class RecompensaAdmin(admin.ModelAdmin):
-    list_display = ("nombre", "tipo", "nivel_requerido", "xp_requerida")
+    list_display = ("nombre", "tipo", "regla", "regla_asignatura", "regla_umbral", "nivel_requerido", "xp_requerida")
     prepopulated_fields = {"slug": ("nombre",)}
-    list_filter = ("tipo",)
+    list_filter = ("tipo", "regla")
 
 
 @admin.register(RecompensaUsuario)
 class RecompensaUsuarioAdmin(admin.ModelAdmin):
     list_display = ("perfil", "recompensa", "fecha_desbloqueo", "notificada")
     list_filter = ("recompensa__tipo", "notificada")
+
+
+@admin.register(PuestoRanking)
+class PuestoRankingAdmin(admin.ModelAdmin):
+    list_display = ("nombre", "actividades_completadas")
+    search_fields = ("nombre",)
+    readonly_fields = ("perfil", "actividades_completadas", "nombre", "nombre_orden")
+    actions = ["reconstruir"]
+
+    @admin.action(description="Reconstruir ranking completo")
+    def reconstruir(self, request, queryset):
+        total = reconstruir_ranking()
+        self.message_user(request, f"Ranking reconstruido: {total} estudiante(s).")
@@ -1,6 +1,11 @@
+from importlib import import_module
+
 from django.apps import AppConfig
 
 
 class GamificacionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gamificacion'
+
+    def ready(self):
+        import_module(f"{self.name}.signals")
@@ -0,0 +1,85 @@
+"""
+Curvas de nivel / XP en forma cerrada.
+
+Tres curvas conviven en el proyecto:
+
+- PerfilGamificacion: subir del nivel L al L+1 cuesta 100 + 50·L² XP
+  (nivel inicial 0). La XP acumulada para llegar al nivel L es
+  100·L + 50·(L-1)·L·(2L-1)/6.
+- Estudiante.nivel_calculado: nivel n cuando xp >= n²·100 (mínimo 1).
+- recalcular_nivel_por_puntos: 1 nivel cada PUNTOS_POR_NIVEL (mínimo 1).
+
+Todas se resuelven en tiempo constante (estimación con la inversa real y
+un ajuste de ±1 con aritmética entera), sin recorrer nivel por nivel.
+"""
+from math import isqrt
+
+XP_BASE_NIVEL = 100
+XP_EXTRA_NIVEL = 50
+
+XP_POR_NIVEL_ESTUDIANTE = 100
+PUNTOS_POR_NIVEL = 100           # 1 nivel cada 100 puntos
+
+
+# --------------------------------------------------------------------
+# PerfilGamificacion
+# --------------------------------------------------------------------
+
+def xp_para_subir(nivel: int) -> int:
+    """XP necesaria para subir desde `nivel` al siguiente."""
+    return XP_BASE_NIVEL + XP_EXTRA_NIVEL * nivel * nivel
+
+
+def xp_acumulada_para(nivel: int) -> int:
+    """XP total necesaria para llegar a `nivel` desde el nivel 0."""
+    if nivel <= 0:
+        return 0
+    return XP_BASE_NIVEL * nivel + XP_EXTRA_NIVEL * (nivel - 1) * nivel * (2 * nivel - 1) // 6
+
+
+def nivel_para_xp(xp_total: int) -> int:
+    """Mayor nivel L con xp_acumulada_para(L) <= xp_total."""
+    xp_total = max(0, int(xp_total))
+
+    # xp_acumulada_para(L) ≈ 50·L³/3: estimación por la raíz cúbica
+    # (float mientras sea exacto; si no, raíz entera)
+    if xp_total < 2 ** 52:
+        nivel = int((xp_total * 3 / XP_EXTRA_NIVEL) ** (1 / 3))
+    else:
+        nivel = _raiz_entera(xp_total * 3 // XP_EXTRA_NIVEL, 3)
+
+    while nivel > 0 and xp_acumulada_para(nivel) > xp_total:
+        nivel -= 1
+    while xp_acumulada_para(nivel + 1) <= xp_total:
+        nivel += 1
+    return nivel
+
+
+def progreso_para_xp(xp_total: int) -> tuple:
+    """(nivel, xp dentro del nivel) para una XP acumulada."""
+    nivel = nivel_para_xp(xp_total)
+    return nivel, max(0, int(xp_total)) - xp_acumulada_para(nivel)
+
+
+def _raiz_entera(n: int, k: int) -> int:
+    """⌊n^(1/k)⌋ exacta para enteros demasiado grandes para float."""
+    x = 1 << ((n.bit_length() + k - 1) // k)
+    while True:
+        y = ((k - 1) * x + n // x ** (k - 1)) // k
+        if y >= x:
+            return x
+        x = y
+
+
+# --------------------------------------------------------------------
+# Estudiante / puntos
+# --------------------------------------------------------------------
+
+def nivel_estudiante(xp: int) -> int:
+    """Nivel n cuando xp >= n²·100 (mínimo 1)."""
+    return max(1, isqrt(max(0, int(xp)) // XP_POR_NIVEL_ESTUDIANTE))
+
+
+def nivel_por_puntos(puntos: int) -> int:
+    """Nivel mínimo 1; sube 1 nivel cada PUNTOS_POR_NIVEL."""
+    return max(1, 1 + int(puntos) // PUNTOS_POR_NIVEL)
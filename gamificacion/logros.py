@@ -0,0 +1,244 @@
+"""
+Motor de logros declarativo.
+
+Cada logro especial es una fila de Recompensa con `regla` (ver
+Recompensa.REGLA_CHOICES), `regla_asignatura` y `regla_umbral`. Las reglas
+se cargan UNA vez por proceso y se invalidan con las señales post_save /
+post_delete de Recompensa (gamificacion/signals.py), también en los demás
+procesos (LevelUp/registros.py).
+
+Al cerrar un intento se actualizan los contadores del perfil
+(completadas_por_asignatura, racha_perfecta) y las reglas se evalúan contra
+ellos: las consultas no crecen con el número de logros ni con el historial
+del estudiante, y los nuevos se insertan en un solo bulk_create.
+
+Agregar un logro = crear la Recompensa con su regla desde el admin.
+
+Las recompensas sin regla (por nivel / XP / actividades) se desbloquean con
+desbloquear_por_umbrales contra la misma tabla en memoria.
+"""
+from django.core.cache import cache
+
+from django.db.models import Count, Q
+
+from LevelUp.asignaturas import registro_asignaturas
+from LevelUp.models import Answer, AsignacionActividad, Submission
+from LevelUp.registros import RegistroEnMemoria
+
+from .models import Recompensa, RecompensaUsuario
+
+
+# --------------------------------------------------------------------
+# Reglas (por proceso)
+# --------------------------------------------------------------------
+
+class RegistroReglas(RegistroEnMemoria):
+
+    clave_generacion = "levelup:registro:reglas"
+
+    def _construir(self):
+        todas = list(Recompensa.objects.all().order_by("id"))
+        return {
+            "reglas": [r for r in todas if r.regla],
+            "umbrales": sorted(
+                (
+                    r for r in todas
+                    if not r.regla and r.slug not in Recompensa.SLUGS_ESPECIALES
+                ),
+                key=lambda r: (r.nivel_requerido, r.xp_requerida, r.actividades_requeridas, r.pk),
+            ),
+        }
+
+    def reglas(self) -> list:
+        """Recompensas con regla, en orden de creación (solo lectura)."""
+        return self._cargar()["reglas"]
+
+    def umbrales(self) -> list:
+        """Recompensas por nivel / XP / actividades, ordenadas por nivel."""
+        return self._cargar()["umbrales"]
+
+    def version(self) -> str:
+        """Cambia cada vez que se invalida la tabla."""
+        return self.generacion()
+
+
+registro_reglas = RegistroReglas()
+
+
+# --------------------------------------------------------------------
+# Evaluadores
+# --------------------------------------------------------------------
+
+class ContextoCierre:
+    """
+    Lo que las reglas pueden mirar del intento recién cerrado. El total de
+    actividades asignadas de la asignatura solo se consulta si alguna
+    regla lo necesita.
+    """
+
+    def __init__(self, estudiante, asignatura, completadas_asignatura: int, racha_perfecta: int):
+        self.estudiante = estudiante
+        self.asignatura = asignatura
+        self.completadas_asignatura = completadas_asignatura
+        self.racha_perfecta = racha_perfecta
+        self._total_asignadas = None
+
+    def total_asignadas(self) -> int:
+        if self._total_asignadas is None:
+            self._total_asignadas = (
+                AsignacionActividad.objects
+                .filter(estudiante=self.estudiante, actividad__asignatura=self.asignatura)
+                .values("actividad")
+                .distinct()
+                .count()
+            )
+        return self._total_asignadas
+
+
+def _aplica_a_asignatura(regla, asignatura) -> bool:
+    patron = (regla.regla_asignatura or "").lower()
+    if not patron:
+        return True
+    return asignatura is not None and patron in (asignatura.nombre or "").lower()
+
+
+def _completadas_asignatura(regla, ctx: ContextoCierre) -> bool:
+    return ctx.asignatura is not None and ctx.completadas_asignatura >= regla.regla_umbral
+
+
+def _todas_asignatura(regla, ctx: ContextoCierre) -> bool:
+    if not _completadas_asignatura(regla, ctx):
+        return False
+    total = ctx.total_asignadas()
+    return total > 0 and ctx.completadas_asignatura >= total
+
+
+def _racha_perfecta(regla, ctx: ContextoCierre) -> bool:
+    return ctx.racha_perfecta >= regla.regla_umbral
+
+
+EVALUADORES = {
+    "COMPLETADAS_ASIGNATURA": _completadas_asignatura,
+    "TODAS_ASIGNATURA": _todas_asignatura,
+    "RACHA_PERFECTA": _racha_perfecta,
+}
+
+
+# --------------------------------------------------------------------
+# Contadores y evaluación
+# --------------------------------------------------------------------
+
+def intento_perfecto(submission) -> bool:
+    """Al menos una respuesta y todas correctas."""
+    r = Answer.objects.filter(submission=submission).aggregate(
+        respondidas=Count("id"),
+        malas=Count("id", filter=Q(es_correcta=False)),
+    )
+    return bool(r["respondidas"]) and not r["malas"]
+
+
+def actualizar_contadores(perfil, estudiante, actividad, submission) -> None:
+    """
+    Suma el intento `submission` (ya finalizado) a los contadores del perfil.
+
+    La actividad cuenta como completada en el primer intento finalizado;
+    se compara por número de intento y no con "algún otro finalizado"
+    porque la tarea de cierre puede correr cuando ya se cerró otro.
+    """
+    primera_vez = not (
+        Submission.objects
+        .filter(estudiante=estudiante, actividad=actividad, finalizado=True, intento__lt=submission.intento)
+        .exists()
+    )
+    if primera_vez and actividad.asignatura_id is not None:
+        clave = str(actividad.asignatura_id)
+        por_asig = dict(perfil.completadas_por_asignatura or {})
+        por_asig[clave] = por_asig.get(clave, 0) + 1
+        perfil.completadas_por_asignatura = por_asig
+
+    perfil.racha_perfecta = perfil.racha_perfecta + 1 if intento_perfecto(submission) else 0
+    perfil.save(update_fields=["completadas_por_asignatura", "racha_perfecta"])
+
+
+def evaluar_reglas(perfil, estudiante, actividad) -> list:
+    """
+    Crea (bulk_create) los RecompensaUsuario de las reglas que se cumplen
+    con los contadores actuales del perfil y devuelve los nuevos.
+    """
+    reglas = registro_reglas.reglas()
+    if not reglas:
+        return []
+
+    ya_tiene = set(
+        RecompensaUsuario.objects
+        .filter(perfil=perfil, recompensa_id__in=[r.pk for r in reglas])
+        .values_list("recompensa_id", flat=True)
+    )
+
+    asignatura = registro_asignaturas.por_id(actividad.asignatura_id)
+    ctx = ContextoCierre(
+        estudiante=estudiante,
+        asignatura=asignatura,
+        completadas_asignatura=(perfil.completadas_por_asignatura or {}).get(str(actividad.asignatura_id), 0),
+        racha_perfecta=perfil.racha_perfecta,
+    )
+
+    nuevos = []
+    for regla in reglas:
+        if regla.pk in ya_tiene or not _aplica_a_asignatura(regla, asignatura):
+            continue
+        evaluar = EVALUADORES.get(regla.regla)
+        if evaluar and evaluar(regla, ctx):
+            nuevos.append(RecompensaUsuario(perfil=perfil, recompensa=regla))
+
+    if nuevos:
+        RecompensaUsuario.objects.bulk_create(nuevos, ignore_conflicts=True)
+    return nuevos
+
+
+# --------------------------------------------------------------------
+# Desbloqueo por umbrales (nivel / XP / actividades)
+# --------------------------------------------------------------------
+
+def _clave_revision(perfil) -> str:
+    return f"levelup:umbrales:perfil{perfil.pk}"
+
+
+def desbloquear_por_umbrales(perfil) -> list:
+    """
+    Crea los RecompensaUsuario de las recompensas sin regla que el perfil
+    ya alcanza y devuelve los nuevos.
+
+    Lo alcanzable se calcula contra la tabla en memoria. Como nivel, XP y
+    actividades solo suben, si la tabla es la misma y el perfil alcanza las
+    mismas recompensas que en la revisión anterior no hay nada nuevo y se
+    sale sin consultar la BD.
+    """
+    umbrales = registro_reglas.umbrales()
+    alcanzables = [
+        r.pk for r in umbrales
+        if r.nivel_requerido <= perfil.nivel
+        and r.xp_requerida <= perfil.xp_total
+        and r.actividades_requeridas <= perfil.actividades_completadas
+    ]
+    revision = (registro_reglas.version(), len(alcanzables))
+    clave = _clave_revision(perfil)
+    if not alcanzables or cache.get(clave) == revision:
+        return []
+
+    ya_tiene = set(
+        RecompensaUsuario.objects
+        .filter(perfil=perfil, recompensa_id__in=alcanzables)
+        .values_list("recompensa_id", flat=True)
+    )
+    por_id = {r.pk: r for r in umbrales}
+    nuevos = [
+        RecompensaUsuario(perfil=perfil, recompensa=por_id[pk])
+        for pk in alcanzables
+        if pk not in ya_tiene
+    ]
+    if nuevos:
+        RecompensaUsuario.objects.bulk_create(nuevos, ignore_conflicts=True)
+
+    cache.set(clave, revision, None)
+    return nuevos
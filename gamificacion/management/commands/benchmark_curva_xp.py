@@ -0,0 +1,26 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from gamificacion.curvas import nivel_estudiante, nivel_para_xp, progreso_para_xp
+
+
+class Command(BaseCommand):
+    help = "Mide el cálculo de nivel / XP (gamificacion/curvas.py) para XP de distinto tamaño."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticiones", type=int, default=20000)
+
+    def handle(self, *args, **options):
+        repeticiones = options["repeticiones"]
+        casos = [10 ** e for e in (2, 4, 6, 9, 12, 15, 18, 30, 60)]
+
+        self.stdout.write(f"{'xp':>10}  {'nivel_para_xp':>14}  {'progreso':>10}  {'estudiante':>10}  (µs/llamada)")
+        for xp in casos:
+            tiempos = [
+                timeit.timeit(lambda f=f: f(xp), number=repeticiones) / repeticiones * 1e6
+                for f in (nivel_para_xp, progreso_para_xp, nivel_estudiante)
+            ]
+            self.stdout.write(
+                f"{'1e%d' % len(str(xp)[1:]):>10}  {tiempos[0]:>14.2f}  {tiempos[1]:>10.2f}  {tiempos[2]:>10.2f}"
+            )
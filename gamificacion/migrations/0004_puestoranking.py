@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def poblar_ranking(apps, schema_editor):
+    PerfilGamificacion = apps.get_model("gamificacion", "PerfilGamificacion")
+    PuestoRanking = apps.get_model("gamificacion", "PuestoRanking")
+
+    filas = []
+    perfiles = PerfilGamificacion.objects.select_related("usuario").filter(usuario__rol="ESTUDIANTE")
+    for perfil in perfiles.iterator(chunk_size=2000):
+        u = perfil.usuario
+        nombre = f"{u.first_name} {u.last_name}".strip() or u.username or ""
+        filas.append(PuestoRanking(
+            perfil_id=perfil.pk,
+            actividades_completadas=perfil.actividades_completadas,
+            nombre=nombre,
+            nombre_orden=nombre.lower(),
+        ))
+    PuestoRanking.objects.bulk_create(filas, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamificacion', '0003_alter_recompensa_actividades_requeridas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PuestoRanking',
+            fields=[
+                ('perfil', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='puesto_ranking', serialize=False, to='gamificacion.perfilgamificacion')),
+                ('actividades_completadas', models.PositiveIntegerField(default=0)),
+                ('nombre', models.CharField(max_length=301)),
+                ('nombre_orden', models.CharField(max_length=301)),
+            ],
+            options={
+                'verbose_name': 'Puesto en el ranking',
+                'verbose_name_plural': 'Puestos en el ranking',
+                'ordering': ['-actividades_completadas', 'nombre_orden', 'perfil_id'],
+                'indexes': [models.Index(fields=['-actividades_completadas', 'nombre_orden', 'perfil'], name='ranking_orden_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_ranking, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:27
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+# Los 10 logros especiales que antes estaban escritos en services.py
+REGLAS = {
+    "primer-paso-matematicas": ("COMPLETADAS_ASIGNATURA", "mate", 1),
+    "primer-cuento-lenguaje": ("COMPLETADAS_ASIGNATURA", "lengua", 1),
+    "primer-viaje-historia": ("COMPLETADAS_ASIGNATURA", "hist", 1),
+    "primer-experimento-ciencias": ("COMPLETADAS_ASIGNATURA", "cien", 1),
+    "maestro-matematicas": ("TODAS_ASIGNATURA", "mate", 1),
+    "guardian-palabras": ("TODAS_ASIGNATURA", "lengua", 1),
+    "cronista-tiempo": ("TODAS_ASIGNATURA", "hist", 1),
+    "cientifico-estrella": ("TODAS_ASIGNATURA", "cien", 1),
+    "respuesta-perfecta": ("RACHA_PERFECTA", "", 1),
+    "racha-genio": ("RACHA_PERFECTA", "", 3),
+}
+
+
+def poblar_reglas_y_contadores(apps, schema_editor):
+    Recompensa = apps.get_model("gamificacion", "Recompensa")
+    PerfilGamificacion = apps.get_model("gamificacion", "PerfilGamificacion")
+    Submission = apps.get_model("LevelUp", "Submission")
+
+    for slug, (regla, asignatura, umbral) in REGLAS.items():
+        Recompensa.objects.filter(slug=slug).update(
+            regla=regla, regla_asignatura=asignatura, regla_umbral=umbral,
+        )
+
+    # Contadores por usuario a partir de los intentos finalizados
+    completadas = {}
+    rachas = {}
+    intentos = (
+        Submission.objects
+        .filter(finalizado=True)
+        .annotate(
+            respondidas=Count("answers"),
+            malas=Count("answers", filter=Q(answers__es_correcta=False)),
+        )
+        .order_by("estudiante_id", "-enviado_en", "-id")
+        .values_list(
+            "estudiante__usuario_id", "actividad_id", "actividad__asignatura_id",
+            "respondidas", "malas",
+        )
+    )
+    cerradas = set()
+    for usuario_id, actividad_id, asignatura_id, respondidas, malas in intentos.iterator(chunk_size=2000):
+        if asignatura_id is not None and (usuario_id, actividad_id) not in cerradas:
+            cerradas.add((usuario_id, actividad_id))
+            por_asig = completadas.setdefault(usuario_id, {})
+            por_asig[str(asignatura_id)] = por_asig.get(str(asignatura_id), 0) + 1
+
+        # Racha: intentos perfectos seguidos desde el más reciente
+        racha = rachas.setdefault(usuario_id, [0, True])
+        if racha[1]:
+            if respondidas and not malas:
+                racha[0] += 1
+            else:
+                racha[1] = False
+
+    cambios = []
+    for perfil in PerfilGamificacion.objects.only("id", "usuario_id").iterator(chunk_size=2000):
+        if perfil.usuario_id not in completadas and perfil.usuario_id not in rachas:
+            continue
+        perfil.completadas_por_asignatura = completadas.get(perfil.usuario_id, {})
+        perfil.racha_perfecta = rachas.get(perfil.usuario_id, [0])[0]
+        cambios.append(perfil)
+    PerfilGamificacion.objects.bulk_update(
+        cambios, ["completadas_por_asignatura", "racha_perfecta"], batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamificacion', '0004_puestoranking'),
+        ('LevelUp', '0025_submission_resumen_resultados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='perfilgamificacion',
+            name='completadas_por_asignatura',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='perfilgamificacion',
+            name='racha_perfecta',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recompensa',
+            name='regla',
+            field=models.CharField(blank=True, choices=[('', 'Sin regla (nivel / XP / actividades)'), ('COMPLETADAS_ASIGNATURA', 'Actividades completadas en la asignatura'), ('TODAS_ASIGNATURA', 'Todas las actividades asignadas de la asignatura'), ('RACHA_PERFECTA', 'Intentos perfectos seguidos')], default='', max_length=30),
+        ),
+        migrations.AddField(
+            model_name='recompensa',
+            name='regla_asignatura',
+            field=models.CharField(blank=True, help_text="Texto que debe contener el nombre de la asignatura, ej: 'mate'. Vacío = cualquiera.", max_length=50),
+        ),
+        migrations.AddField(
+            model_name='recompensa',
+            name='regla_umbral',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(poblar_reglas_y_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamificacion', '0005_reglas_logros'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recompensausuario',
+            index=models.Index(condition=models.Q(('notificada', False)), fields=['perfil'], name='recusr_sin_notificar_idx'),
+        ),
+    ]
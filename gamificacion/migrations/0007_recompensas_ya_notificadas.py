@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:10
+
+from django.db import migrations
+
+
+def marcar_notificadas(apps, schema_editor):
+    """
+    El popup global ahora también muestra las RecompensaUsuario con
+    notificada=False (desbloqueos de la cola de tareas). Las existentes
+    ya se mostraron por la sesión o nunca se iban a mostrar.
+    """
+    RecompensaUsuario = apps.get_model("gamificacion", "RecompensaUsuario")
+    RecompensaUsuario.objects.filter(notificada=False).update(notificada=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamificacion', '0006_indices_consultas_frecuentes'),
+    ]
+
+    operations = [
+        migrations.RunPython(marcar_notificadas, migrations.RunPython.noop),
+    ]
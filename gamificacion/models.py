@@ -2,6 +2,8 @@ from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+from .curvas import progreso_para_xp, xp_acumulada_para, xp_para_subir
+
 USER_MODEL = settings.AUTH_USER_MODEL
 
 
@@ -21,6 +23,12 @@ class PerfilGamificacion(models.Model):
     # Conteo de actividades completadas (para el rango Timo)
     actividades_completadas = models.PositiveIntegerField(default=0)
 
+    # Contadores de logros (gamificacion/logros.py), al día en cada cierre:
+    # {"<asignatura_id>": actividades distintas completadas} y la racha
+    # actual de intentos perfectos.
+    completadas_por_asignatura = models.JSONField(default=dict, blank=True, editable=False)
+    racha_perfecta = models.PositiveIntegerField(default=0, editable=False)
+
     class Meta:
         verbose_name = "Perfil de gamificación"
         verbose_name_plural = "Perfiles de gamificación"
@@ -34,11 +42,9 @@ class PerfilGamificacion(models.Model):
         """
         XP necesaria para subir desde 'nivel' al siguiente.
         Nivel 0 → 100 XP, y luego crece con una curva cuadrática.
-        Ajustable si quieres que suba más rápido o más lento.
+        Ajustable en gamificacion/curvas.py.
         """
-        base = 100
-        extra = 50 * (nivel ** 2)
-        return base + extra
+        return xp_para_subir(nivel)
 
     @property
     def xp_para_siguiente_nivel(self) -> int:
@@ -69,17 +75,15 @@ class PerfilGamificacion(models.Model):
             }
 
         self.xp_total += cantidad
-        self.xp_actual += cantidad
-
-        niveles_subidos = 0
 
-        # Subir de nivel todas las veces necesarias
-        while self.xp_actual >= self.xp_para_siguiente_nivel:
-            self.xp_actual -= self.xp_para_siguiente_nivel
-            self.nivel += 1
-            niveles_subidos += 1
+        # Subir de nivel todas las veces necesarias (forma cerrada, sin
+        # recorrer nivel por nivel)
+        posicion = xp_acumulada_para(self.nivel) + self.xp_actual + cantidad
+        nivel, self.xp_actual = progreso_para_xp(posicion)
+        niveles_subidos = nivel - self.nivel
+        self.nivel = nivel
 
-        self.save()
+        self.save(update_fields=["nivel", "xp_actual", "xp_total"])
 
         # Ver qué recompensas nuevas se desbloquean
         recompensas_nuevas = Recompensa.desbloquear_para_perfil(self)
@@ -99,7 +103,7 @@ class PerfilGamificacion(models.Model):
         """
         if incrementar_veces:
             self.actividades_completadas += 1
-            self.save()
+            self.save(update_fields=["actividades_completadas"])
 
     # ---------- RANGOS TIMO (POR ACTIVIDADES) ----------
 
@@ -185,6 +189,14 @@ class Recompensa(models.Model):
         ("OTRO", "Otro"),
     ]
 
+    # Reglas de los logros especiales (gamificacion/logros.py)
+    REGLA_CHOICES = [
+        ("", "Sin regla (nivel / XP / actividades)"),
+        ("COMPLETADAS_ASIGNATURA", "Actividades completadas en la asignatura"),
+        ("TODAS_ASIGNATURA", "Todas las actividades asignadas de la asignatura"),
+        ("RACHA_PERFECTA", "Intentos perfectos seguidos"),
+    ]
+
     SLUGS_ESPECIALES = [
         "maestro-matematicas",
         "guardian-palabras",
@@ -214,6 +226,14 @@ class Recompensa(models.Model):
     xp_requerida = models.PositiveIntegerField(default=0)
     actividades_requeridas = models.PositiveIntegerField(default=0)
 
+    regla = models.CharField(max_length=30, choices=REGLA_CHOICES, blank=True, default="")
+    regla_asignatura = models.CharField(
+        max_length=50,
+        blank=True,
+        help_text="Texto que debe contener el nombre de la asignatura, ej: 'mate'. Vacío = cualquiera.",
+    )
+    regla_umbral = models.PositiveIntegerField(default=1)
+
     class Meta:
         verbose_name = "Recompensa"
         verbose_name_plural = "Recompensas"
@@ -225,35 +245,13 @@ class Recompensa(models.Model):
     def desbloquear_para_perfil(perfil: "PerfilGamificacion"):
         """
         Desbloqueo genérico por nivel / XP / actividades.
-        NO incluye los logros especiales (que se manejan aparte).
+        NO incluye los logros especiales ni los que tienen regla
+        (esos los evalúa gamificacion/logros.py). Un solo bulk_create y
+        salida temprana si el perfil no cruzó ningún umbral nuevo.
         """
-        disponibles = (
-            Recompensa.objects
-            .filter(
-                nivel_requerido__lte=perfil.nivel,
-                xp_requerida__lte=perfil.xp_total,
-                actividades_requeridas__lte=perfil.actividades_completadas,
-            )
-            .exclude(slug__in=Recompensa.SLUGS_ESPECIALES) 
-        )
-
-        ya_tiene_ids = set(
-            RecompensaUsuario.objects
-            .filter(perfil=perfil)
-            .values_list("recompensa_id", flat=True)
-        )
-
-        nuevas = []
-        for recomp in disponibles:
-            if recomp.id in ya_tiene_ids:
-                continue
-            nuevas.append(
-                RecompensaUsuario.objects.create(
-                    perfil=perfil,
-                    recompensa=recomp,
-                )
-            )
-        return nuevas
+        from .logros import desbloquear_por_umbrales
+
+        return desbloquear_por_umbrales(perfil)
 
 class RecompensaUsuario(models.Model):
     perfil = models.ForeignKey(
@@ -273,6 +271,48 @@ class RecompensaUsuario(models.Model):
         verbose_name = "Recompensa de usuario"
         verbose_name_plural = "Recompensas de usuarios"
         unique_together = ("perfil", "recompensa")
+        indexes = [
+            # Popup de recompensas sin notificar (parcial: solo las pendientes)
+            models.Index(
+                fields=["perfil"],
+                condition=models.Q(notificada=False),
+                name="recusr_sin_notificar_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.perfil.usuario} → {self.recompensa}"
+
+
+class PuestoRanking(models.Model):
+    """
+    Fila materializada del ranking general (una por perfil de estudiante).
+
+    Se mantiene desde signals cada vez que cambia `actividades_completadas`
+    o el nombre del usuario. El índice compuesto replica el orden del
+    ranking, así el top-N paginado y la posición de un estudiante se
+    resuelven con consultas indexadas en vez de ordenar en Python.
+    """
+    perfil = models.OneToOneField(
+        PerfilGamificacion,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="puesto_ranking",
+    )
+    actividades_completadas = models.PositiveIntegerField(default=0)
+    nombre = models.CharField(max_length=301)
+    nombre_orden = models.CharField(max_length=301)
+
+    class Meta:
+        verbose_name = "Puesto en el ranking"
+        verbose_name_plural = "Puestos en el ranking"
+        ordering = ["-actividades_completadas", "nombre_orden", "perfil_id"]
+        indexes = [
+            models.Index(
+                fields=["-actividades_completadas", "nombre_orden", "perfil"],
+                name="ranking_orden_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.nombre} ({self.actividades_completadas})"
@@ -0,0 +1,103 @@
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+from .models import PerfilGamificacion, PuestoRanking
+
+ROL_ESTUDIANTE = "ESTUDIANTE"
+
+# Filas por página en /gamificacion/ranking/
+POR_PAGINA = 50
+
+
+def nombre_para_ranking(usuario) -> tuple[str, str]:
+    """
+    Devuelve (nombre visible, clave de orden) igual que el ranking original:
+    nombre completo o, si no hay, el username; el desempate es alfabético
+    sin distinguir mayúsculas.
+    """
+    nombre = usuario.get_full_name() or usuario.username or ""
+    return nombre, nombre.lower()
+
+
+def sincronizar_puesto(perfil: PerfilGamificacion):
+    """
+    Crea / actualiza / elimina la fila del ranking para un perfil.
+
+    Solo los estudiantes aparecen en el ranking; si el usuario dejó de
+    serlo se borra su fila.
+    """
+    usuario = perfil.usuario
+    if getattr(usuario, "rol", None) != ROL_ESTUDIANTE:
+        PuestoRanking.objects.filter(perfil_id=perfil.pk).delete()
+        return None
+
+    nombre, nombre_orden = nombre_para_ranking(usuario)
+    valores = {
+        "actividades_completadas": perfil.actividades_completadas,
+        "nombre": nombre,
+        "nombre_orden": nombre_orden,
+    }
+    # Camino rápido: un solo UPDATE cuando la fila ya existe
+    if PuestoRanking.objects.filter(perfil_id=perfil.pk).update(**valores):
+        return None
+    puesto, _ = PuestoRanking.objects.update_or_create(perfil_id=perfil.pk, defaults=valores)
+    return puesto
+
+
+def reconstruir_ranking() -> int:
+    """
+    Regenera la tabla completa desde PerfilGamificacion (uso manual / admin).
+    Devuelve cuántas filas quedaron.
+    """
+    perfiles = (
+        PerfilGamificacion.objects
+        .select_related("usuario")
+        .filter(usuario__rol=ROL_ESTUDIANTE)
+    )
+    filas = []
+    for perfil in perfiles.iterator(chunk_size=2000):
+        nombre, nombre_orden = nombre_para_ranking(perfil.usuario)
+        filas.append(PuestoRanking(
+            perfil_id=perfil.pk,
+            actividades_completadas=perfil.actividades_completadas,
+            nombre=nombre,
+            nombre_orden=nombre_orden,
+        ))
+
+    PuestoRanking.objects.all().delete()
+    PuestoRanking.objects.bulk_create(filas, batch_size=1000)
+    return len(filas)
+
+
+def posicion_de(perfil_id) -> int | None:
+    """
+    Posición (1-based) de un perfil: 1 + cuántas filas van antes que él
+    según el orden del índice. Son dos consultas indexadas, sin importar
+    el tamaño del colegio.
+    """
+    puesto = (
+        PuestoRanking.objects
+        .filter(perfil_id=perfil_id)
+        .values("actividades_completadas", "nombre_orden")
+        .first()
+    )
+    if puesto is None:
+        return None
+
+    act = puesto["actividades_completadas"]
+    nom = puesto["nombre_orden"]
+    antes = PuestoRanking.objects.filter(
+        Q(actividades_completadas__gt=act)
+        | Q(actividades_completadas=act, nombre_orden__lt=nom)
+        | Q(actividades_completadas=act, nombre_orden=nom, perfil_id__lt=perfil_id)
+    ).count()
+    return antes + 1
+
+
+def pagina_ranking(numero_pagina, por_pagina: int = POR_PAGINA):
+    """
+    Página del ranking ya ordenada por el índice, con usuario y estudiante
+    precargados (COUNT + 1 SELECT por página).
+    """
+    qs = PuestoRanking.objects.select_related("perfil__usuario__estudiante")
+    return Paginator(qs, por_pagina).get_page(numero_pagina)
@@ -1,8 +1,11 @@
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from .models import PerfilGamificacion
+from .logros import registro_reglas
+from .models import PerfilGamificacion, PuestoRanking, Recompensa
+from .ranking import nombre_para_ranking, sincronizar_puesto
+from .services import obtener_o_crear_perfil
 
 User = get_user_model()
 
@@ -16,4 +19,47 @@ def crear_perfil_gamificacion(sender, instance, created, **kwargs):
     # if getattr(instance, "rol", None) != "ESTUDIANTE":
     #     return
 
-    PerfilGamificacion.objects.get_or_create(usuario=instance)
+    # Vía services para no perder el logro de bienvenida
+    obtener_o_crear_perfil(instance)
+
+
+@receiver(post_save, sender=User)
+def actualizar_nombre_en_ranking(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Mantiene nombre / rol del ranking materializado al editar el usuario.
+    """
+    if created:
+        return
+    if update_fields is not None and not {"first_name", "last_name", "username", "rol"} & set(update_fields):
+        return
+
+    if getattr(instance, "rol", None) != "ESTUDIANTE":
+        PuestoRanking.objects.filter(perfil__usuario=instance).delete()
+        return
+
+    nombre, nombre_orden = nombre_para_ranking(instance)
+    actualizadas = PuestoRanking.objects.filter(perfil__usuario=instance).update(
+        nombre=nombre, nombre_orden=nombre_orden,
+    )
+    if not actualizadas:
+        # Recién pasó a estudiante: crear su fila si ya tiene perfil
+        perfil = PerfilGamificacion.objects.filter(usuario=instance).first()
+        if perfil:
+            sincronizar_puesto(perfil)
+
+
+@receiver(post_save, sender=PerfilGamificacion)
+def actualizar_puesto_ranking(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Refleja `actividades_completadas` en el ranking materializado.
+    """
+    if update_fields is not None and "actividades_completadas" not in update_fields:
+        return
+    sincronizar_puesto(instance)
+
+
+@receiver(post_save, sender=Recompensa)
+@receiver(post_delete, sender=Recompensa)
+def recompensa_cambiada(sender, **kwargs):
+    """Las reglas de logros se recargan en el próximo cierre de intento."""
+    registro_reglas.invalidar()